@@ -0,0 +1,178 @@
+"""
+Cache of chatbot answers that also matches near-identical questions.
+
+A question is reduced to its set of content words ("what causes headache?" and
+"headache causes" both become {cause, headache}), and a cached answer is reused
+when the Jaccard similarity of the two sets reaches CHAT_CACHE_SIMILARITY and
+the language and dialect match. Numbers and negations must match exactly: "250 mg"
+is never answered with "2500 mg", nor "can't I take X" with "can I take X".
+MinHash signatures split into LSH bands find the candidate entries without
+comparing against every cached question.
+"""
+import re
+import time
+import zlib
+import threading
+from collections import OrderedDict
+from typing import Any, Dict, FrozenSet, List, Optional, Tuple
+from app.chatbot.local_classifier import tokenize # type: ignore
+from app.config import CHAT_CACHE_SIZE, CHAT_CACHE_TTL, CHAT_CACHE_SIMILARITY # type: ignore
+
+# Words that don't change what is being asked. Negations ("not", "without", "مش", the "t"
+# of "don t") are deliberately kept: "can I take X" and "can't I take X" are different questions.
+STOPWORDS = {
+    "a", "an", "the", "is", "are", "was", "were", "be", "been", "am", "i", "im", "me", "my", "mine", "you", "your",
+    "we", "our", "it", "its", "this", "that", "these", "those", "what", "whats", "which", "who", "how", "why", "when",
+    "where", "do", "does", "did", "can", "could", "should", "would", "will", "shall", "may", "might", "must", "have",
+    "has", "had", "of", "to", "in", "on", "at", "for", "from", "by", "about", "and", "or", "so", "if", "then", "there",
+    "please", "tell", "know", "want", "need", "get", "some", "any", "s", "hi", "hello", "hey", "thanks",
+    "ما", "ماذا", "هل", "هي", "هو", "في", "من", "علي", "الي", "عن", "او", "و", "انا", "ايه", "اي", "ازاي", "كيف", "لماذا",
+    "ليه", "عايز", "عايزه", "اريد", "ممكن", "يا", "لو", "اللي", "الذي", "التي", "ده", "دي", "هذا", "هذه",
+}
+
+NUM_PERMUTATIONS = 32
+BANDS = 8  # NUM_PERMUTATIONS / BANDS rows per band
+_PRIME = (1 << 61) - 1
+_MAX_HASH = (1 << 32) - 1
+# Fixed (seeded) permutation parameters so signatures are stable across restarts
+_PERMUTATIONS = [((1103515245 * (i + 1)) % _PRIME | 1, (12345 * (i + 7)) % _PRIME) for i in range(NUM_PERMUTATIONS)]
+
+
+def _stem(token: str) -> str:
+    # Fold English plurals ("causes" -> "cause"); enough to match rephrasings of short questions
+    if token.isascii() and len(token) > 4 and token.endswith("s") and not token.endswith("ss"):
+        return token[:-1]
+    return token
+
+
+# Contracted negations: "can't", "cannot" and "won't" become "not" (can/will are stopwords),
+# "don't" becomes "do not"
+_NEGATED_MODAL = re.compile(r"\b(?:can['’]?t|cannot|won['’]t)\b", re.IGNORECASE)
+_CONTRACTED_NOT = re.compile(r"n['’]t\b", re.IGNORECASE)
+# A number followed by a unit ("250mg") is split so it matches "250 mg"
+_NUMBER_UNIT = re.compile(r"(\d)(?=[^\W\d_])")
+
+
+def normalize_question(text: str) -> FrozenSet[str]:
+    """The content words of a question, stemmed and without stopwords."""
+    text = _CONTRACTED_NOT.sub(" not", _NEGATED_MODAL.sub(" not ", text))
+    text = _NUMBER_UNIT.sub(r"\1 ", text)
+    return frozenset(_stem(token) for token in tokenize(text) if token not in STOPWORDS)
+
+
+NEGATIONS = {"not", "no", "never", "without", "t", "مش", "لا", "بدون", "غير"}
+
+
+def _exact_tokens(tokens: FrozenSet[str]) -> FrozenSet[str]:
+    """The negations and the tokens holding digits (doses, ages, durations), which must match exactly."""
+    return frozenset(token for token in tokens if token in NEGATIONS or any(char.isdigit() for char in token))
+
+
+def _minhash(tokens: FrozenSet[str]) -> Tuple[int, ...]:
+    hashes = [zlib.crc32(token.encode("utf-8")) for token in tokens]
+    return tuple(min(((a * h + b) % _PRIME) & _MAX_HASH for h in hashes) for a, b in _PERMUTATIONS)
+
+
+def _bands(signature: Tuple[int, ...]) -> List[Tuple[int, Tuple[int, ...]]]:
+    rows = NUM_PERMUTATIONS // BANDS
+    return [(band, signature[band * rows:(band + 1) * rows]) for band in range(BANDS)]
+
+
+class AnswerCache:
+    """LRU cache of chatbot answers with TTL expiry and near-duplicate lookup (see module docstring)."""
+
+    def __init__(self, max_entries: int = CHAT_CACHE_SIZE, ttl: float = CHAT_CACHE_TTL,
+                 similarity: float = CHAT_CACHE_SIMILARITY):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.similarity = similarity
+        # key -> (tokens, answer, stored_at); key is (language, dialect, tokens)
+        self._entries: "OrderedDict[tuple, Tuple[FrozenSet[str], Dict[str, Any], float]]" = OrderedDict()
+        self._buckets: Dict[tuple, set] = {}
+        self._lock = threading.Lock()
+        self._counters = {"lookups": 0, "exact_hits": 0, "near_hits": 0, "misses": 0, "skipped": 0,
+                          "stores": 0, "evictions": 0, "expired": 0}
+
+    def _bucket_keys(self, key: tuple, tokens: FrozenSet[str]) -> List[tuple]:
+        language, dialect = key[0], key[1]
+        return [(language, dialect, band, rows) for band, rows in _bands(_minhash(tokens))]
+
+    def _remove(self, key: tuple) -> None:
+        tokens, _, _ = self._entries.pop(key)
+        for bucket_key in self._bucket_keys(key, tokens):
+            bucket = self._buckets.get(bucket_key)
+            if bucket is not None:
+                bucket.discard(key)
+                if not bucket:
+                    del self._buckets[bucket_key]
+
+    def _cache_key(self, question: str, language: Optional[str], dialect: Optional[str]) -> Optional[tuple]:
+        if self.max_entries <= 0 or not language:
+            return None
+        tokens = normalize_question(question)
+        return (language, dialect, tokens) if tokens else None
+
+    def get(self, question: str, language: Optional[str], dialect: Optional[str]) -> Optional[Dict[str, Any]]:
+        """Return the cached answer for this question or a near-identical one, or None."""
+        key = self._cache_key(question, language, dialect)
+        with self._lock:
+            if key is None:
+                self._counters["skipped"] += 1
+                return None
+            self._counters["lookups"] += 1
+            now = time.time()
+            tokens = key[2]
+            if key in self._entries:
+                candidates, counter = [key], "exact_hits"
+            else:
+                candidates, counter = set(), "near_hits"
+                for bucket_key in self._bucket_keys(key, tokens):
+                    candidates |= self._buckets.get(bucket_key, set())
+
+            best, best_similarity = None, 0.0
+            exact_tokens = _exact_tokens(tokens)
+            for candidate in list(candidates):
+                candidate_tokens, _, stored_at = self._entries[candidate]
+                if now - stored_at >= self.ttl:
+                    self._remove(candidate)
+                    self._counters["expired"] += 1
+                    continue
+                if _exact_tokens(candidate_tokens) != exact_tokens:
+                    continue
+                similarity = len(tokens & candidate_tokens) / len(tokens | candidate_tokens)
+                if similarity >= self.similarity and similarity > best_similarity:
+                    best, best_similarity = candidate, similarity
+
+            if best is None:
+                self._counters["misses"] += 1
+                return None
+            self._entries.move_to_end(best)
+            self._counters[counter] += 1
+            return dict(self._entries[best][1])
+
+    def put(self, question: str, language: Optional[str], dialect: Optional[str], answer: Dict[str, Any]) -> None:
+        key = self._cache_key(question, language, dialect)
+        if key is None:
+            return
+        with self._lock:
+            if key in self._entries:
+                self._remove(key)
+            self._entries[key] = (key[2], dict(answer), time.time())
+            for bucket_key in self._bucket_keys(key, key[2]):
+                self._buckets.setdefault(bucket_key, set()).add(key)
+            self._counters["stores"] += 1
+            while len(self._entries) > self.max_entries:
+                self._remove(next(iter(self._entries)))
+                self._counters["evictions"] += 1
+
+    def stats(self) -> Dict[str, Any]:
+        """Hit/miss counters plus the current size and hit rate."""
+        with self._lock:
+            stats = dict(self._counters)
+            stats["entries"] = len(self._entries)
+        hits = stats["exact_hits"] + stats["near_hits"]
+        stats["hit_rate"] = round(hits / stats["lookups"], 4) if stats["lookups"] else 0.0
+        return stats
+
+
+answer_cache = AnswerCache()
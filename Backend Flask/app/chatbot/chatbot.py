@@ -2,9 +2,14 @@ import re
 import json
 import logging
 import unicodedata
-from typing import Tuple, Dict, Any, Union, List
+from typing import Tuple, Dict, Any, Union, List, Optional, Iterator
 from app.utils.gemini_utils import get_gemini_model
 from app.models.medical_models import MedicalResponse
+from app.config import CHAT_SINGLE_CALL # type: ignore
+from app.chatbot.local_classifier import Classification, local_classifier # type: ignore
+from app.chatbot.json_stream import JsonFieldExtractor # type: ignore
+from app.chatbot.answer_cache import answer_cache # type: ignore
+from app.chatbot.sessions import ConversationSession, SessionStore, format_turns # type: ignore
 
 # Set up logging
 logging.basicConfig(level=logging.INFO)
@@ -13,6 +18,9 @@ logger = logging.getLogger(__name__)
 # Cache model instance (reduces unnecessary calls)
 gemini_model = get_gemini_model()
 
+# Reply to a non-medical message when the AI call for it fails
+FRIENDLY_FALLBACK = "I apologize, but I couldn't generate a proper response. Can you please ask a medical question?"
+
 
 def clean_response_text(response_text: str) -> str:
     """Clean AI response by removing JSON markers and control characters."""
@@ -67,18 +75,22 @@ def is_medical_question(prompt: str) -> bool:
     return response.get("message", "").strip().lower() == "yes"
 
 
-def is_medical_context(chat_history: List[Dict[str, str]], user_message: str) -> bool:
+def format_history(chat_history: Optional[List[Dict[str, str]]]) -> str:
+    """Prompt text for a client-sent chat history (only the last 5 messages, for efficiency)."""
+    return format_turns(chat_history[-5:]) if chat_history else ""
+
+
+def is_medical_context(chat_history: List[Dict[str, str]], user_message: str, history_text: Optional[str] = None) -> bool:
     """Determine if the conversation context is medical based on chat history and the current message."""
-    if not chat_history:
+    # Check last few messages (or the preformatted session history) to see if the discussion has been medical
+    recent_history = format_history(chat_history) if history_text is None else history_text
+    if not recent_history:
         return is_medical_question(user_message)
 
-    # Check last few messages to see if the discussion has been medical
-    recent_history = "\n".join(f"{msg['type'].upper()}: {msg['content']}" for msg in chat_history[-5:])
-    
     prompt = f"""
     You are a medical AI. Determine if the **overall conversation context** (including past messages) is medical. Consider the previous messages and the user's latest input.
 
-    **Conversation History (Last {len(chat_history)} Messages):**
+    **Conversation History:**
     {recent_history}
 
     **Current User Message:**
@@ -90,9 +102,8 @@ def is_medical_context(chat_history: List[Dict[str, str]], user_message: str) ->
     return response.get("message", "").strip().lower() == "yes"
 
 
-def generate_friendly_response(user_message: str, language: str, dialect: str) -> str:
-    """Generate a friendly response for non-medical queries."""
-    prompt = f"""
+def _friendly_prompt(user_message: str, language: str, dialect: str) -> str:
+    return f"""
     You are a friendly assistant specializing in medical topics. When a user asks a non-medical question, respond in a single line, warmly and politely in their dialect, guiding them towards asking medical questions instead.
 
     Response format:
@@ -103,19 +114,20 @@ def generate_friendly_response(user_message: str, language: str, dialect: str) -
 
     User Message: "{user_message}"
     """
-    response_data = generate_ai_response(prompt)
-    return response_data.get("message", "I apologize, but I couldn't generate a proper response. Can you please ask a medical question?")
 
 
-def handle_chat_message(prompt: str, language: str, dialect: str, chat_history: List[Dict[str, str]] = None) -> Union[MedicalResponse, Dict[str, str]]:
-    """Handle chat messages with context-aware AI response generation."""
-    chat_history = chat_history[-5:] if chat_history else []  # Keep only last 5 messages for efficiency
-    formatted_history = "\n".join(f"{msg['type'].upper()}: {msg['content']}" for msg in chat_history)
+def generate_friendly_response(user_message: str, language: str, dialect: str) -> Optional[str]:
+    """Generate a friendly response for non-medical queries, or None if the AI call failed."""
+    response_data = generate_ai_response(_friendly_prompt(user_message, language, dialect))
+    message = response_data.get("message")
+    return message.strip() if isinstance(message, str) and message.strip() else None
+
 
+def _medical_prompt(prompt: str, language: str, dialect: str, formatted_history: str) -> str:
     structured_prompt = f"""
     You are a friendly and helpful AI assistant specializing in medical topics. Respond to the user's health-related question in a concise, reassuring, and empathetic manner, considering the conversation history.
 
-    **Conversation History (Last {len(chat_history)} Turns):**
+    **Conversation History:**
     {formatted_history}
 
     **Current User Question:**
@@ -131,8 +143,14 @@ def handle_chat_message(prompt: str, language: str, dialect: str, chat_history:
     ### Response Format:
     {{"message": "A concise, empathetic response explaining possible causes and next steps."}}
     """
+    return structured_prompt
 
-    response_data = generate_ai_response(structured_prompt)
+
+def handle_chat_message(prompt: str, language: str, dialect: str, chat_history: List[Dict[str, str]] = None,
+                        history_text: Optional[str] = None) -> Union[MedicalResponse, Dict[str, str]]:
+    """Handle chat messages with context-aware AI response generation."""
+    formatted_history = format_history(chat_history) if history_text is None else history_text
+    response_data = generate_ai_response(_medical_prompt(prompt, language, dialect, formatted_history))
 
     if "message" in response_data:
         return MedicalResponse(is_medical=True, message=response_data["message"])
@@ -141,11 +159,209 @@ def handle_chat_message(prompt: str, language: str, dialect: str, chat_history:
         return {"error": "Unexpected AI response format", "raw_response": response_data}
 
 
-def chat(user_message: str, chat_history: List[Dict[str, str]] = None) -> Union[MedicalResponse, Dict[str, str]]:
-    """Main chat function to process user messages and generate responses."""
-    language, dialect = detect_language_and_dialect(user_message)
+def _combined_prompt(user_message: str, formatted_history: str) -> str:
+    structured_prompt = f"""
+    You are a friendly and helpful AI assistant specializing in medical topics. For the user's latest message, do all of the following:
+
+    1. Identify the language and dialect of the user's message.
+    2. Decide whether the **overall conversation context** (the previous messages and the latest message) is related to a medical condition, symptoms, treatment, or diagnosis.
+    3. Write your reply in that language and dialect:
+       - If it is medical: respond in a concise, reassuring, and empathetic manner. Explain the potential causes briefly and suggest next steps. If the condition is mild, suggest home remedies or OTC (over-the-counter) medications. If the condition is severe, advise seeking medical attention.
+       - If it is not medical: respond in a single line, warmly and politely, guiding the user towards asking medical questions instead.
+
+    **Conversation History:**
+    {formatted_history}
+
+    **Current User Message:**
+    "{user_message}"
+
+    ### Response Format (JSON only, with "message" as the last field):
+    {{"language": "Language Name", "dialect": "Dialect Name", "is_medical": true, "message": "Your reply here"}}
+    """
+    return structured_prompt
+
+
+def _parse_is_medical(value: Any) -> Optional[bool]:
+    if isinstance(value, str) and value.strip().lower() in ("yes", "no", "true", "false"):
+        return value.strip().lower() in ("yes", "true")
+    return value if isinstance(value, bool) else None
+
 
-    if is_medical_context(chat_history, user_message):
-        return handle_chat_message(user_message, language, dialect, chat_history)
+def generate_combined_response(user_message: str, chat_history: List[Dict[str, str]] = None,
+                               history_text: Optional[str] = None) -> Optional[MedicalResponse]:
+    """
+    Detect the language and dialect, decide whether the conversation is medical and write
+    the reply, all in one structured AI call. Returns None if the reply can't be parsed.
+    """
+    formatted_history = format_history(chat_history) if history_text is None else history_text
+    response_data = generate_ai_response(_combined_prompt(user_message, formatted_history))
+    is_medical = _parse_is_medical(response_data.get("is_medical"))
+    message = response_data.get("message")
+    if is_medical is None or not isinstance(message, str) or not message.strip():
+        logger.warning(f"Single-call response could not be used, falling back to multi-call: {response_data}")
+        return None
+    return MedicalResponse(is_medical=is_medical, message=message.strip())
+
+
+def summarize_conversation(summary: str, turns: List[Dict[str, str]]) -> str:
+    """Fold older turns into a session's rolling summary (runs in the background)."""
+    prompt = f"""
+    You keep a running summary of a conversation between a user and a medical assistant.
+    Update the summary with the new messages below. Keep the medically relevant details (symptoms,
+    conditions, medications, allergies, age, advice already given) and drop small talk.
+    Use at most 120 words, in the language of the conversation.
+
+    **Current Summary:**
+    {summary or "(none)"}
+
+    **New Messages:**
+    {format_turns(turns)}
+
+    Response format:
+    {{"summary": "The updated summary"}}
+    """
+    response_data = generate_ai_response(prompt)
+    if not isinstance(response_data.get("summary"), str):
+        raise ValueError(f"Unexpected AI response format: {response_data}")
+    return response_data["summary"].strip()
+
+
+session_store = SessionStore(summarize=summarize_conversation)
+
+
+def _history_for(chat_history: Optional[List[Dict[str, str]]], session: Optional[ConversationSession]) -> Tuple[bool, str]:
+    # Format the history once per turn; a session keeps its formatted history between turns
+    if session is not None:
+        return session.has_history(), session.history_text()
+    return bool(chat_history), format_history(chat_history)
+
+
+def _record_turn(session: Optional[ConversationSession], user_message: str, reply: str) -> None:
+    if session is not None:
+        session_store.add_turns(session, [{"type": "user", "content": user_message}, {"type": "bot", "content": reply}])
+
+
+def chat(user_message: str, chat_history: List[Dict[str, str]] = None,
+         session: Optional[ConversationSession] = None) -> Union[MedicalResponse, Dict[str, str]]:
+    """
+    Main chat function to process user messages and generate responses.
+
+    With a `session`, the conversation history comes from (and the new turn is added to)
+    the server-side session instead of `chat_history`. Replies to failed AI calls are
+    neither cached nor added to the session.
+    """
+    has_history, history_text = _history_for(chat_history, session)
+    # Settle language and the medical check locally when the classifier is confident
+    local = local_classifier.classify(user_message, has_history=has_history)
+
+    # Answers that depend on earlier turns are never cached
+    cached = answer_cache.get(user_message, local.language, local.dialect) if not has_history else None
+    if cached is not None:
+        response = MedicalResponse(**cached)
     else:
-        return MedicalResponse(is_medical=False, message=generate_friendly_response(user_message, language, dialect))
+        response, answered = _answer(user_message, history_text, local)
+        if not answered:
+            return response
+        if not has_history and isinstance(response, MedicalResponse):
+            answer_cache.put(user_message, local.language, local.dialect, response.dict())
+    if isinstance(response, MedicalResponse):
+        _record_turn(session, user_message, response.message)
+    return response
+
+
+def _answer(user_message: str, history_text: str,
+            local: Classification) -> Tuple[Union[MedicalResponse, Dict[str, str]], bool]:
+    """
+    Generate the reply with as few AI calls as the local classification allows.
+
+    Returns the reply and whether it is the model's answer (False for the fallback
+    reply or error of a failed AI call).
+    """
+    if CHAT_SINGLE_CALL and (local.language is None or local.is_medical is None):
+        response = generate_combined_response(user_message, history_text=history_text)
+        if response is not None:
+            return response, True
+
+    # Multi-call path: reply call, plus language detection and medical check when not settled locally
+    if local.language is not None:
+        language, dialect = local.language, local.dialect
+    else:
+        language, dialect = detect_language_and_dialect(user_message)
+
+    is_medical = local.is_medical if local.is_medical is not None else is_medical_context(None, user_message, history_text)
+    if is_medical:
+        response = handle_chat_message(user_message, language, dialect, history_text=history_text)
+        return response, isinstance(response, MedicalResponse)
+    message = generate_friendly_response(user_message, language, dialect)
+    if message is None:
+        return MedicalResponse(is_medical=False, message=FRIENDLY_FALLBACK), False
+    return MedicalResponse(is_medical=False, message=message), True
+
+
+def stream_chat(user_message: str, chat_history: List[Dict[str, str]] = None,
+                session: Optional[ConversationSession] = None) -> Iterator[Dict[str, Any]]:
+    """
+    Streaming variant of `chat` that makes a single streamed AI call.
+
+    Yields {"event": "token", "text": ...} for each piece of the reply's "message" field as
+    soon as it is generated, then {"event": "done", "is_medical": ..., "message": ...} with
+    the full reply, or {"event": "error", "error": ...} if the AI call fails. Like `chat`,
+    only complete replies are cached and added to the session.
+    """
+    has_history, history_text = _history_for(chat_history, session)
+    local = local_classifier.classify(user_message, has_history=has_history)
+    if not has_history:
+        cached = answer_cache.get(user_message, local.language, local.dialect)
+        if cached is not None:
+            _record_turn(session, user_message, cached["message"])
+            yield {"event": "token", "text": cached["message"]}
+            yield {"event": "done", **cached}
+            return
+
+    if local.language is not None and local.is_medical is not None:
+        is_medical = local.is_medical
+        if is_medical:
+            prompt = _medical_prompt(user_message, local.language, local.dialect, history_text)
+        else:
+            prompt = _friendly_prompt(user_message, local.language, local.dialect)
+    else:
+        is_medical = None  # Comes from the combined reply once it is complete
+        prompt = _combined_prompt(user_message, history_text)
+
+    extractor = JsonFieldExtractor("message")
+    raw_text = []
+    try:
+        for chunk in gemini_model.generate_content(prompt, stream=True):
+            raw_text.append(chunk.text)
+            text = extractor.feed(chunk.text)
+            if text:
+                yield {"event": "token", "text": text}
+    except Exception as e:
+        logger.error(f"AI streaming error: {e}")
+        yield {"event": "error", "error": "AI generation failed"}
+        return
+
+    message = extractor.value.strip()
+    # A reply cut off before its message ended is sent, but not cached or kept in the session
+    answered = extractor.complete
+    if is_medical is None or not message:
+        try:
+            response_data = json.loads(clean_response_text("".join(raw_text)))
+        except json.JSONDecodeError:
+            response_data = {}
+        if not isinstance(response_data, dict):
+            response_data = {}
+        if is_medical is None:
+            is_medical = _parse_is_medical(response_data.get("is_medical"))
+        if not message and isinstance(response_data.get("message"), str):
+            message = response_data["message"].strip()
+            answered = True
+    if not message:
+        logger.error(f"Unexpected AI response format: {''.join(raw_text)}")
+        yield {"event": "error", "error": "Unexpected AI response format"}
+        return
+    if answered:
+        if not has_history and is_medical is not None:
+            answer_cache.put(user_message, local.language, local.dialect, {"is_medical": is_medical, "message": message})
+        _record_turn(session, user_message, message)
+    yield {"event": "done", "is_medical": is_medical, "message": message}
@@ -0,0 +1,81 @@
+import re
+
+_ESCAPES = {'"': '"', "\\": "\\", "/": "/", "b": "\b", "f": "\f", "n": "\n", "r": "\r", "t": "\t"}
+
+
+class JsonFieldExtractor:
+    """
+    Decode one string field of a JSON object while the object is still being streamed.
+
+    Feed the raw chunks as they arrive; each call returns the part of the field's value
+    that became available, so it can be forwarded before the object is complete.
+    Escapes split across chunk boundaries are held back until they are complete.
+    """
+
+    def __init__(self, field: str = "message"):
+        self._key = re.compile(r'"%s"\s*:\s*"' % re.escape(field))
+        self._buffer = ""
+        self._position = None  # Where decoding continues once the field's value has started
+        self._parts = []
+        self.complete = False
+
+    @property
+    def value(self) -> str:
+        """Everything decoded so far."""
+        return "".join(self._parts)
+
+    def feed(self, chunk: str) -> str:
+        self._buffer += chunk
+        if self.complete:
+            return ""
+        if self._position is None:
+            match = self._key.search(self._buffer)
+            if not match:
+                return ""
+            self._position = match.end()
+
+        buffer, i, out = self._buffer, self._position, []
+        while i < len(buffer):
+            char = buffer[i]
+            if char == '"':
+                self.complete = True
+                i += 1
+                break
+            if char != "\\":
+                out.append(char)
+                i += 1
+                continue
+            if i + 1 >= len(buffer):
+                break
+            escape = buffer[i + 1]
+            if escape != "u":
+                out.append(_ESCAPES.get(escape, escape))
+                i += 2
+                continue
+            if i + 6 > len(buffer):
+                break
+            try:
+                code = int(buffer[i + 2:i + 6], 16)
+            except ValueError:
+                code = 0xFFFD
+            if 0xD800 <= code < 0xDC00:
+                # A high surrogate needs the following \uXXXX low surrogate to form one character
+                if i + 12 > len(buffer):
+                    break
+                try:
+                    low = int(buffer[i + 8:i + 12], 16) if buffer[i + 6:i + 8] == "\\u" else None
+                except ValueError:
+                    low = None
+                if low is not None and 0xDC00 <= low < 0xE000:
+                    out.append(chr(0x10000 + ((code - 0xD800) << 10) + (low - 0xDC00)))
+                    i += 12
+                    continue
+            if 0xD800 <= code < 0xE000:
+                code = 0xFFFD  # Unpaired surrogate
+            out.append(chr(code))
+            i += 6
+
+        self._position = i
+        text = "".join(out)
+        self._parts.append(text)
+        return text
@@ -0,0 +1,225 @@
+"""
+Local, CPU-only fast path for the chatbot's classification steps.
+
+Language and dialect come from the script of the message plus function-word and
+dialect-marker counts. Word lists are used instead of character n-gram profiles:
+chat messages are often only a few words long, too short for n-gram statistics to
+separate Latin-script languages reliably, and the lists need no training data.
+
+The medical verdict comes from a vocabulary of medical terms, extended with the
+Uses/SIDEEFFECT words and brand names of the medicine catalog once it is loaded.
+Catalog words in data/common_words.txt are skipped, so brands named after everyday
+words ("Active", "Happy") don't make small talk look medical, and a message whose
+only medical term is also an everyday word ("cold", "heart") is left to the LLM.
+Each answer carries a confidence, and the chatbot only asks the LLM when the
+confidence is below CHAT_CLASSIFIER_THRESHOLD.
+"""
+import os
+import re
+import logging
+import threading
+from typing import Dict, List, NamedTuple, Optional
+from app.config import CHAT_CLASSIFIER_THRESHOLD # type: ignore
+
+logger = logging.getLogger(__name__)
+
+WORD = re.compile(r"\w+", re.UNICODE)
+ARABIC_CHAR = re.compile(r"[\u0600-\u06FF\u0750-\u077F\uFB50-\uFDFF\uFE70-\uFEFF]")
+ARABIC_DIACRITICS = re.compile(r"[\u064B-\u0652\u0640]")
+# Arabic written in Latin letters ("Franco"/Arabizi) uses digits for Arabic sounds, e.g. "3ayez"
+ARABIZI_WORD = re.compile(r"^(?=.*[a-z])(?=.*[2375]).+$")
+
+FUNCTION_WORDS = {
+    "English": {"the", "a", "an", "is", "are", "was", "i", "my", "me", "you", "what", "how", "why", "when", "can", "should",
+                "do", "does", "have", "has", "and", "or", "of", "to", "in", "for", "with", "it", "this", "that", "about", "after",
+                "hi", "hello", "hey", "thanks", "thank", "bye", "please"},
+    "French": {"le", "la", "les", "est", "je", "mon", "ma", "vous", "quoi", "comment", "pourquoi", "avec", "pour", "dans", "des", "une", "et"},
+    "Spanish": {"el", "los", "las", "es", "yo", "mi", "usted", "que", "como", "por", "para", "con", "una", "del", "tengo", "y"},
+    "German": {"der", "die", "das", "ist", "ich", "mein", "sie", "was", "wie", "warum", "mit", "und", "ein", "eine", "nicht", "habe"},
+}
+
+# Dialect markers, matched after Arabic normalization (see _normalize_arabic)
+ARABIC_DIALECT_MARKERS = {
+    "Egyptian Arabic": {"ايه", "ازاي", "عايز", "عايزه", "عاوز", "عاوزه", "مش", "كده", "دلوقتي", "بتاع", "اوي", "خالص", "بردو", "امبارح", "النهارده", "ليه", "حاجه", "فين", "بقي"},
+    "Gulf Arabic": {"وش", "شلون", "ابي", "ابغي", "زين", "وايد", "شنو", "الحين"},
+    "Levantine Arabic": {"شو", "هيك", "كتير", "هلق", "بدي", "منيح", "ليش", "هلا"},
+    "Maghrebi Arabic": {"واش", "بزاف", "ديال", "كيفاش", "علاش", "دابا", "بغيت"},
+}
+MSA_MARKERS = {"ما", "هي", "هو", "ماذا", "لماذا", "كيف", "هل", "اريد", "الذي", "التي", "هذا", "هذه", "لدي", "عندما", "يجب"}
+
+MEDICAL_TERMS = {
+    # English
+    "pain", "ache", "aches", "headache", "migraine", "fever", "cough", "cold", "flu", "nausea", "vomiting", "vomit",
+    "diarrhea", "constipation", "rash", "itching", "infection", "blood", "pressure", "hypertension", "diabetes",
+    "insulin", "glucose", "dose", "dosage", "tablet", "tablets", "pill", "pills", "medicine", "medicines", "medication",
+    "medications", "drug", "drugs", "doctor", "hospital", "symptom", "symptoms", "treatment", "disease", "allergy",
+    "allergic", "injury", "pregnant", "pregnancy", "surgery", "cancer", "tumor", "heart", "asthma", "covid", "virus",
+    "bacteria", "antibiotic", "antibiotics", "prescription", "cholesterol", "stomach", "dizzy", "dizziness", "fatigue",
+    "sore", "throat", "swelling", "bleeding", "anxiety", "depression", "insomnia", "vitamin", "diagnosis", "chest",
+    "breathing", "kidney", "liver", "thyroid", "anemia", "arthritis", "ulcer", "sick", "illness", "painkiller",
+    "paracetamol", "ibuprofen", "aspirin", "hemoglobin", "cbc", "xray",
+    # Arabic (normalized)
+    "صداع", "الم", "وجع", "حراره", "سخونيه", "كحه", "سعال", "برد", "انفلونزا", "دوا", "دواء", "علاج", "دكتور",
+    "طبيب", "مستشفي", "ضغط", "سكر", "قلب", "معده", "بطن", "اسهال", "ترجيع", "قيء", "حساسيه", "التهاب", "حبوب",
+    "برشام", "جرعه", "اعراض", "حامل", "حمل", "دوخه", "تعب", "كورونا", "فيروس", "ورم", "سرطان", "جرح", "نزيف",
+    "كسر", "اكتئاب", "قلق", "ارق", "مرض", "مريض", "تحليل", "اشعه", "صدر", "كلي", "كبد", "ضهري", "ظهر", "مغص",
+}
+
+# Medical terms that are also everyday words ("it's cold outside", "a sore loser"). One of
+# these alone is not enough to call a message medical; the LLM decides
+AMBIGUOUS_TERMS = {
+    "cold", "heart", "pressure", "chest", "sore", "sick", "blood", "throat", "tablet", "tablets", "virus", "drug",
+    "drugs", "dose", "stomach", "fatigue",
+    "برد", "ضغط", "قلب", "صدر", "تعب", "سكر", "حمل", "كسر", "قلق", "جرح",
+}
+
+# Messages made only of these words are greetings or small talk
+SMALL_TALK = {
+    "hi", "hello", "hey", "thanks", "thank", "you", "ok", "okay", "bye", "good", "morning", "evening", "night", "how",
+    "are", "who", "your", "name", "what", "is", "fine", "great", "nice", "yes", "no", "welcome", "lol", "cool", "joke",
+    "tell", "me", "a", "the",
+    "اهلا", "مرحبا", "السلام", "عليكم", "وعليكم", "ازيك", "ازيكم", "شكرا", "تمام", "صباح", "مساء", "الخير", "النور",
+    "اخبارك", "انت", "مين", "عامل", "عامله", "ايه", "اسمك", "باي", "سلام", "ماشي", "اه", "لا", "ايوه", "كويس", "الحمد", "لله",
+}
+
+# Common English words (many of which are also medicine brand names, e.g. "Active", "Forte"),
+# never taken from the catalog as medical terms
+COMMON_WORDS_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "data", "common_words.txt")
+with open(COMMON_WORDS_PATH, encoding="utf-8") as f:
+    COMMON_WORDS = {line.strip() for line in f if line.strip() and not line.startswith("#")}
+
+
+def _normalize_arabic(word: str) -> str:
+    word = ARABIC_DIACRITICS.sub("", word)
+    return word.translate(str.maketrans("أإآةى", "اااهي"))
+
+
+def tokenize(text: str) -> List[str]:
+    """Lowercased word tokens, with Arabic spelling variants normalized."""
+    return [_normalize_arabic(word) for word in WORD.findall(text.lower())]
+
+
+class Classification(NamedTuple):
+    language: Optional[str]  # None when the local guess isn't confident
+    dialect: Optional[str]
+    language_confidence: float
+    is_medical: Optional[bool]  # None when the local guess isn't confident
+    medical_confidence: float
+
+
+class LocalClassifier:
+    def __init__(self, threshold: float = CHAT_CLASSIFIER_THRESHOLD):
+        self.threshold = threshold
+        self.medical_terms = set(MEDICAL_TERMS)
+        self._seeded = False
+        self._lock = threading.Lock()
+        self._counters = {"messages": 0, "language_local": 0, "language_llm": 0, "medical_local": 0, "medical_llm": 0}
+
+    def _seed_from_catalog(self) -> None:
+        """Add the medicine catalog's use/side-effect words and brand names once it is loaded."""
+        if self._seeded:
+            return
+        try:
+            from app.medicines.medicines_db import get_catalog # type: ignore
+            import pyarrow.compute as pc # type: ignore
+        except ImportError:
+            return
+        catalog = get_catalog()
+        if catalog is None:
+            return
+        with self._lock:
+            if self._seeded:
+                return
+            terms = set()
+            side_effects = pc.unique(pc.list_flatten(catalog.store.list_column("SIDEEFFECT"))).to_pylist()
+            for phrase in catalog.use_index.values + side_effects:
+                terms.update(word for word in tokenize(phrase) if len(word) >= 4)
+            brands = pc.unique(pc.list_element(pc.utf8_split_whitespace(catalog.store.name_lower), 0)).to_pylist()
+            terms.update(brand for brand in brands if brand and len(brand) >= 5 and brand.isalpha())
+            terms -= set().union(*FUNCTION_WORDS.values(), SMALL_TALK, COMMON_WORDS)
+            self.medical_terms |= terms
+            self._seeded = True
+            logger.info("Local medical vocabulary seeded with %d catalog terms", len(terms))
+
+    def detect_language(self, text: str, tokens: List[str]):
+        """Return (language, dialect, confidence) from the script and word evidence."""
+        letters = [char for char in text if char.isalpha()]
+        if not letters:
+            return None, None, 0.0
+        arabic_ratio = sum(1 for char in letters if ARABIC_CHAR.match(char)) / len(letters)
+
+        if arabic_ratio >= 0.8:
+            counts = {dialect: sum(1 for token in tokens if token in markers) for dialect, markers in ARABIC_DIALECT_MARKERS.items()}
+            dialect, hits = max(counts.items(), key=lambda item: item[1])
+            if hits and hits > sum(counts.values()) - hits:
+                return "Arabic", dialect, arabic_ratio * min(1.0, 0.7 + 0.15 * hits)
+            if not hits and any(token in MSA_MARKERS for token in tokens):
+                return "Arabic", "Modern Standard Arabic", arabic_ratio * 0.85
+            return "Arabic", None, arabic_ratio * 0.5
+
+        if arabic_ratio > 0.2 or any(ARABIZI_WORD.match(token) for token in tokens):
+            return None, None, 0.0  # Mixed script or Arabizi: leave it to the LLM
+
+        evidence = {language: sum(1 for token in tokens if token in words) for language, words in FUNCTION_WORDS.items()}
+        # English medical vocabulary (including the catalog terms) also counts as English evidence
+        evidence["English"] += sum(1 for token in tokens if token in self.medical_terms and token.isascii())
+        if any(not char.isascii() for char in letters):
+            evidence["English"] = max(0, evidence["English"] - 1)
+        language, hits = max(evidence.items(), key=lambda item: item[1])
+        if not hits:
+            return None, None, 0.0
+        share = hits / sum(evidence.values())
+        confidence = share * min(1.0, 0.6 + 0.2 * hits)
+        dialect = "Standard English" if language == "English" else f"Standard {language}"
+        return language, dialect, confidence
+
+    def score_medical(self, tokens: List[str]):
+        """Return (is_medical, confidence) from medical-term hits; a lone AMBIGUOUS_TERMS hit is not confident."""
+        normalized = " ".join(tokens)
+        hits = {token for token in tokens if token in self.medical_terms}
+        hits |= {term for term in ("side effect", "blood pressure", "مضاد حيوي") if term in normalized}
+        if len(hits) >= 2:
+            return True, 0.95
+        if len(hits) == 1 and hits <= AMBIGUOUS_TERMS:
+            return True, 0.5
+        if len(hits) == 1:
+            return True, 0.85 if len(tokens) <= 8 else 0.7
+        if tokens and all(token in SMALL_TALK for token in tokens):
+            return False, 0.9
+        return False, 0.5
+
+    def classify(self, text: str, has_history: bool = False) -> Classification:
+        """
+        Classify a message locally. A field is None when its confidence is below the threshold.
+
+        With chat history, a message without medical terms may still be a medical follow-up
+        ("what about for kids?"), so only confident *medical* verdicts are returned.
+        """
+        self._seed_from_catalog()
+        tokens = tokenize(text)
+        language, dialect, language_confidence = self.detect_language(text, tokens)
+        is_medical, medical_confidence = self.score_medical(tokens)
+
+        if language_confidence < self.threshold or dialect is None:
+            language = dialect = None
+        if medical_confidence < self.threshold or (has_history and not is_medical):
+            is_medical = None
+
+        with self._lock:
+            self._counters["messages"] += 1
+            self._counters["language_local" if language else "language_llm"] += 1
+            self._counters["medical_local" if is_medical is not None else "medical_llm"] += 1
+        return Classification(language, dialect, language_confidence, is_medical, medical_confidence)
+
+    def stats(self) -> Dict[str, float]:
+        """How often each classification was answered locally instead of by the LLM."""
+        with self._lock:
+            stats = dict(self._counters)
+        messages = stats["messages"]
+        stats["language_skip_rate"] = round(stats["language_local"] / messages, 4) if messages else 0.0
+        stats["medical_skip_rate"] = round(stats["medical_local"] / messages, 4) if messages else 0.0
+        stats["vocabulary_size"] = len(self.medical_terms)
+        return stats
+
+
+local_classifier = LocalClassifier()
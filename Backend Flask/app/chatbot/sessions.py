@@ -0,0 +1,174 @@
+"""
+Server-side chat sessions, so clients only send the new message each turn.
+
+A session keeps the most recent turns verbatim and folds older turns into a
+rolling summary. The summary is updated by a background worker after the reply
+has been sent, so the prompt size stays fixed without adding latency to a turn.
+"""
+import time
+import secrets
+import logging
+import threading
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, Dict, List, Optional
+from app.config import CHAT_SESSION_MAX, CHAT_SESSION_IDLE_TTL, CHAT_SESSION_RECENT_TURNS # type: ignore
+
+logger = logging.getLogger(__name__)
+
+# Older turns waiting to be summarized are still sent verbatim; past this many the oldest are dropped
+MAX_PENDING_TURNS = 4 * CHAT_SESSION_RECENT_TURNS
+
+
+def format_turns(turns: List[Dict[str, str]]) -> str:
+    return "\n".join(f"{msg['type'].upper()}: {msg['content']}" for msg in turns)
+
+
+class ConversationSession:
+    def __init__(self, session_id: str, recent_turns: int = CHAT_SESSION_RECENT_TURNS):
+        self.id = session_id
+        self.recent_turns = recent_turns
+        self.summary = ""
+        self.last_access = time.time()
+        self._turns: List[Dict[str, str]] = []  # Most recent turns, oldest first
+        self._pending: List[Dict[str, str]] = []  # Turns pushed out of `_turns` but not yet summarized
+        self._history_text: Optional[str] = None
+        self._summarizing = False
+        self._lock = threading.Lock()
+
+    def history(self) -> List[Dict[str, str]]:
+        """The recent turns, in the same shape as a client-sent chat_history."""
+        with self._lock:
+            return list(self._turns)
+
+    def has_history(self) -> bool:
+        with self._lock:
+            return bool(self._turns or self._pending or self.summary)
+
+    def history_text(self) -> str:
+        """Summary, unsummarized older turns and recent turns as prompt text, formatted once per change."""
+        with self._lock:
+            if self._history_text is None:
+                parts = []
+                if self.summary:
+                    parts.append(f"Summary of the earlier conversation: {self.summary}")
+                parts.append(format_turns(self._pending + self._turns))
+                self._history_text = "\n".join(part for part in parts if part)
+            return self._history_text
+
+    def add_turns(self, turns: List[Dict[str, str]]) -> bool:
+        """Append turns; returns True when older turns are waiting for the summarizer."""
+        with self._lock:
+            self._turns.extend(turns)
+            overflow = len(self._turns) - self.recent_turns
+            if overflow > 0:
+                self._pending.extend(self._turns[:overflow])
+                del self._turns[:overflow]
+            if len(self._pending) > MAX_PENDING_TURNS:
+                logger.warning("Chat session %s: dropping %d unsummarized turns", self.id, len(self._pending) - MAX_PENDING_TURNS)
+                del self._pending[:len(self._pending) - MAX_PENDING_TURNS]
+            self._history_text = None
+            return bool(self._pending)
+
+
+class SessionStore:
+    """
+    Bounded store of conversation sessions keyed by id.
+
+    Sessions idle for longer than `idle_ttl` seconds are evicted, and the least
+    recently used ones are evicted once there are more than `max_sessions`.
+    `summarize(summary, turns)` returns the summary updated with `turns`; it runs on
+    a background worker and may raise, in which case the turns stay verbatim and
+    are retried with the next update.
+    """
+
+    def __init__(self, summarize: Callable[[str, List[Dict[str, str]]], str], max_sessions: int = CHAT_SESSION_MAX,
+                 idle_ttl: float = CHAT_SESSION_IDLE_TTL, recent_turns: int = CHAT_SESSION_RECENT_TURNS):
+        self.summarize = summarize
+        self.max_sessions = max_sessions
+        self.idle_ttl = idle_ttl
+        self.recent_turns = recent_turns
+        self._sessions: "OrderedDict[str, ConversationSession]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._executor = ThreadPoolExecutor(max_workers=2, thread_name_prefix="chat-summary")
+        self._counters = {"created": 0, "resumed": 0, "expired": 0, "evicted_idle": 0, "evicted_capacity": 0,
+                          "summaries": 0, "summary_errors": 0}
+
+    def _count(self, counter: str) -> None:
+        with self._lock:
+            self._counters[counter] += 1
+
+    def _evict_idle(self, now: float) -> None:
+        # Sessions are kept in access order, so the idle ones are at the front
+        while self._sessions:
+            session = next(iter(self._sessions.values()))
+            if now - session.last_access < self.idle_ttl:
+                break
+            del self._sessions[session.id]
+            self._counters["evicted_idle"] += 1
+
+    def get(self, session_id: str) -> Optional[ConversationSession]:
+        """Return the session and mark it used, or None if it doesn't exist or has expired."""
+        now = time.time()
+        with self._lock:
+            self._evict_idle(now)
+            session = self._sessions.get(session_id)
+            if session is None:
+                self._counters["expired"] += 1
+                return None
+            session.last_access = now
+            self._sessions.move_to_end(session_id)
+            self._counters["resumed"] += 1
+            return session
+
+    def create(self, chat_history: Optional[List[Dict[str, str]]] = None) -> ConversationSession:
+        """Start a session, optionally seeded with a client-sent chat_history."""
+        session = ConversationSession(secrets.token_urlsafe(16), self.recent_turns)
+        with self._lock:
+            self._evict_idle(session.last_access)
+            self._sessions[session.id] = session
+            while len(self._sessions) > self.max_sessions:
+                self._sessions.popitem(last=False)
+                self._counters["evicted_capacity"] += 1
+            self._counters["created"] += 1
+        if chat_history:
+            self.add_turns(session, [{"type": msg["type"], "content": msg["content"]} for msg in chat_history])
+        return session
+
+    def add_turns(self, session: ConversationSession, turns: List[Dict[str, str]]) -> None:
+        """Record turns and, if older turns overflowed, update the summary in the background."""
+        if session.add_turns(turns):
+            with session._lock:
+                if session._summarizing:
+                    return
+                session._summarizing = True
+            self._executor.submit(self._summarize, session)
+
+    def _summarize(self, session: ConversationSession) -> None:
+        while True:
+            with session._lock:
+                summary, turns = session.summary, list(session._pending)
+                if not turns:
+                    session._summarizing = False
+                    return
+            try:
+                new_summary = self.summarize(summary, turns)
+            except Exception as e:
+                logger.warning("Chat session %s: summary update failed: %s", session.id, e)
+                self._count("summary_errors")
+                with session._lock:
+                    session._summarizing = False
+                return
+            self._count("summaries")
+            with session._lock:
+                session.summary = new_summary
+                # Turns added while the summary was being written stay pending for the next round
+                summarized = {id(turn) for turn in turns}
+                session._pending = [turn for turn in session._pending if id(turn) not in summarized]
+                session._history_text = None
+
+    def stats(self) -> Dict[str, int]:
+        with self._lock:
+            stats = dict(self._counters)
+            stats["active"] = len(self._sessions)
+        return stats
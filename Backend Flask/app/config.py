@@ -7,5 +7,92 @@ GENAI_API_KEY = os.getenv("GEMINI_API_KEY")
 HUGGINGFACE_TOKEN = os.getenv("HUGGINGFACE_TOKEN")
 MY_MODEL_NAME = "gemini-1.5-flash" # Define model name here
 
-if not GENAI_API_KEY:
+# Shared LLM client (app/utils/llm_client.py)
+LLM_BACKEND = os.getenv("LLM_BACKEND", "gemini").lower()  # "gemini", or "stub" for offline tests and benchmarks
+LLM_RATE_LIMIT = float(os.getenv("LLM_RATE_LIMIT", "60"))  # Requests per minute across the process
+LLM_BURST = int(os.getenv("LLM_BURST", "10"))  # Requests allowed back to back before rate limiting kicks in
+LLM_MAX_CONCURRENCY = int(os.getenv("LLM_MAX_CONCURRENCY", "8"))  # Requests in flight at once
+LLM_TIMEOUT = float(os.getenv("LLM_TIMEOUT", "30"))  # Seconds per attempt
+LLM_DEADLINE = float(os.getenv("LLM_DEADLINE", "60"))  # Seconds per call, including waits and retries
+LLM_MAX_RETRIES = int(os.getenv("LLM_MAX_RETRIES", "4"))  # Retries of rate-limit, timeout and server errors
+LLM_STUB_LATENCY = float(os.getenv("LLM_STUB_LATENCY", "0"))  # Simulated seconds per call of the stub backend
+
+# Lab report interpretations: tests interpreted per AI call, and batches sent at once
+LAB_INTERPRETATION_BATCH_SIZE = int(os.getenv("LAB_INTERPRETATION_BATCH_SIZE", "15"))
+LAB_INTERPRETATION_WORKERS = int(os.getenv("LAB_INTERPRETATION_WORKERS", "4"))
+LAB_INTERPRETATION_CACHE_SIZE = int(os.getenv("LAB_INTERPRETATION_CACHE_SIZE", "4096"))  # Interpretations kept in memory; all are kept on disk
+LAB_INTERPRETATION_CACHE_TTL = int(os.getenv("LAB_INTERPRETATION_CACHE_TTL", str(30 * 24 * 3600)))  # Seconds a generated interpretation is reused
+# Answer common analytes from the built-in templates instead of the AI
+LAB_INTERPRETATION_TEMPLATES = os.getenv("LAB_INTERPRETATION_TEMPLATES", "true").lower() in ("1", "true", "yes")
+# Read "Name Value Unit Range" lines of lab reports with the rule-based parser, asking the AI
+# only about the lines it can't read; reports it reads with less confidence go to the AI whole
+LAB_PARSER = os.getenv("LAB_PARSER", "true").lower() in ("1", "true", "yes")
+LAB_PARSER_MIN_CONFIDENCE = float(os.getenv("LAB_PARSER_MIN_CONFIDENCE", "0.75"))
+# Parsed lines below this confidence (no range, and no unit or no known test name, e.g. "Room 204")
+# are handed to the AI with the other unparsed lines
+LAB_PARSER_MIN_LINE_CONFIDENCE = float(os.getenv("LAB_PARSER_MIN_LINE_CONFIDENCE", "0.7"))
+
+# OCR image preprocessing: "adaptive" measures noise, contrast and skew and runs only the stages an
+# image needs; "full" always runs the denoise/CLAHE/blur/threshold/deskew/sharpen chain
+OCR_PREPROCESS = os.getenv("OCR_PREPROCESS", "adaptive").lower()
+OCR_IMAGE_SIZE = int(os.getenv("OCR_IMAGE_SIZE", "1024"))  # Longest side (px) images are scaled to before OCR
+OCR_NOISE_THRESHOLD = float(os.getenv("OCR_NOISE_THRESHOLD", "15"))  # Noise std (gray levels, after resizing) above which an image is denoised
+OCR_CONTRAST_THRESHOLD = float(os.getenv("OCR_CONTRAST_THRESHOLD", "30"))  # Paper/ink gray-level difference below which CLAHE is applied
+OCR_SKEW_THRESHOLD = float(os.getenv("OCR_SKEW_THRESHOLD", "0.5"))  # Degrees of skew above which an image is rotated
+# PDF pages are rasterized and preprocessed one at a time in a pool of worker processes
+OCR_PDF_DPI = int(os.getenv("OCR_PDF_DPI", "150"))  # Pages are scaled to OCR_IMAGE_SIZE anyway; an A4 page at 150 dpi is ~1750px
+OCR_PDF_MAX_PAGES = int(os.getenv("OCR_PDF_MAX_PAGES", "20"))  # Pages after this are ignored
+OCR_PDF_WORKERS = int(os.getenv("OCR_PDF_WORKERS", str(min(4, os.cpu_count() or 1))))  # Processes rasterizing and preprocessing pages
+# Read pages of digitally generated PDFs from their embedded text (pdftotext) and OCR only pages without usable text
+OCR_PDF_TEXT_LAYER = os.getenv("OCR_PDF_TEXT_LAYER", "true").lower() in ("1", "true", "yes")
+OCR_PDF_MIN_TEXT_CHARS = int(os.getenv("OCR_PDF_MIN_TEXT_CHARS", "100"))  # Pages with less embedded text than this are OCR'd
+# OCR service: engine threads, each with its own PaddleOCR model, fed by a queue shared by all requests
+OCR_WORKERS = int(os.getenv("OCR_WORKERS", str(min(4, os.cpu_count() or 1))))  # Each worker holds a model in memory
+OCR_DEADLINE = float(os.getenv("OCR_DEADLINE", "60"))  # Seconds per request for OCR, including queueing
+
+# Chatbot: answer each message with one structured AI call (language, medical check and reply
+# together), falling back to the separate calls if the combined reply can't be parsed
+CHAT_SINGLE_CALL = os.getenv("CHAT_SINGLE_CALL", "true").lower() in ("1", "true", "yes")
+# Confidence (0-1) the local language/medical classifier needs before its answer replaces an AI call
+CHAT_CLASSIFIER_THRESHOLD = float(os.getenv("CHAT_CLASSIFIER_THRESHOLD", "0.8"))
+# Cache of answers to first-turn questions, also reused for near-identical rephrasings
+CHAT_CACHE_SIZE = int(os.getenv("CHAT_CACHE_SIZE", "2048"))  # Answers kept in memory (0 disables the cache)
+CHAT_CACHE_TTL = int(os.getenv("CHAT_CACHE_TTL", str(24 * 3600)))  # Seconds an answer is reused
+CHAT_CACHE_SIMILARITY = float(os.getenv("CHAT_CACHE_SIMILARITY", "0.8"))  # Jaccard similarity of content words needed to reuse an answer
+# Server-side chat sessions (requests that send a conversation_id)
+CHAT_SESSION_MAX = int(os.getenv("CHAT_SESSION_MAX", "1000"))  # Sessions kept in memory
+CHAT_SESSION_IDLE_TTL = int(os.getenv("CHAT_SESSION_IDLE_TTL", "3600"))  # Seconds an unused session is kept
+CHAT_SESSION_RECENT_TURNS = int(os.getenv("CHAT_SESSION_RECENT_TURNS", "6"))  # Messages kept verbatim; older ones are summarized
+
+# Directory for files derived from downloaded datasets (e.g. the medicine catalog snapshot)
+CACHE_DIR = os.getenv("MEDIMATE_CACHE_DIR", os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "cache"))
+MEDICINES_SNAPSHOT_DIR = os.getenv("MEDICINES_SNAPSHOT_DIR", os.path.join(CACHE_DIR, "medicines"))
+# Load the medicine catalog and OCR model in background threads so startup doesn't block on them
+BACKGROUND_LOAD = os.getenv("BACKGROUND_LOAD", "true").lower() in ("1", "true", "yes")
+
+# Results of /extract-medical-tests and /extract-prescriptions per uploaded file, so a re-upload skips OCR and AI calls
+UPLOAD_CACHE_SIZE = int(os.getenv("UPLOAD_CACHE_SIZE", "256"))  # Entries kept in memory
+UPLOAD_CACHE_MAX_BYTES = int(os.getenv("UPLOAD_CACHE_MAX_BYTES", str(256 * 1024 * 1024)))  # Size of the on-disk store; least recently used entries are evicted
+UPLOAD_CACHE_TTL = int(os.getenv("UPLOAD_CACHE_TTL", str(30 * 24 * 3600)))  # Seconds a result is reused
+
+# openFDA drug-label lookups (point FDA_API_URL at a local stub server for testing)
+FDA_API_URL = os.getenv("FDA_API_URL", "https://api.fda.gov/drug/label.json")
+FDA_CACHE_SIZE = int(os.getenv("FDA_CACHE_SIZE", "2048"))  # Labels kept in memory; all are kept on disk
+FDA_CACHE_TTL = int(os.getenv("FDA_CACHE_TTL", str(7 * 24 * 3600)))  # Seconds a label stays fresh
+FDA_CACHE_STALE_TTL = int(os.getenv("FDA_CACHE_STALE_TTL", str(30 * 24 * 3600)))  # Extra seconds a stale label is served while refreshing
+FDA_CACHE_NEGATIVE_TTL = int(os.getenv("FDA_CACHE_NEGATIVE_TTL", "3600"))  # Seconds a "no results" answer is cached
+FDA_MAX_CONCURRENCY = int(os.getenv("FDA_MAX_CONCURRENCY", "8"))  # Concurrent openFDA requests (and pooled connections)
+FDA_MATRIX_MAX_DRUGS = int(os.getenv("FDA_MATRIX_MAX_DRUGS", "20"))  # Largest regimen /drug-interactions/matrix accepts
+
+# Where drug interaction text comes from: "fda" (live openFDA API, cached) or "offline"
+# (the local label database built with `python -m app.medicines.label_db`)
+INTERACTIONS_SOURCE = os.getenv("INTERACTIONS_SOURCE", "fda").lower()
+LABEL_DB_PATH = os.getenv("LABEL_DB_PATH", os.path.join(CACHE_DIR, "drug_labels.sqlite3"))
+
+# /medicines response caching
+MEDICINES_CACHE_SIZE = int(os.getenv("MEDICINES_CACHE_SIZE", "1024"))  # Serialized responses kept in memory
+MEDICINES_CACHE_MAX_AGE = int(os.getenv("MEDICINES_CACHE_MAX_AGE", "3600"))  # Seconds clients may reuse a response
+MEDICINES_LOAD_RETRY = int(os.getenv("MEDICINES_LOAD_RETRY", "60"))  # Seconds after a failed catalog load before a request starts another
+
+if LLM_BACKEND == "gemini" and not GENAI_API_KEY:
     raise ValueError("GEMAI_API_KEY is missing from environment variables")
\ No newline at end of file
@@ -1,5 +1,8 @@
 import sys
 import os
+import json
+import datetime
+import multiprocessing
 from pathlib import Path
 
 # Fix Python path when running this file directly
@@ -9,26 +12,47 @@ if __name__ == "__main__":
     parent_dir = current_file.parent.parent
     sys.path.insert(0, str(parent_dir))
 
-from flask import Flask, request, jsonify
+from flask import Flask, Response, request, jsonify, stream_with_context
 from flask_cors import CORS # type: ignore
 from app.ocr.medical_test_ocr import extract_medical_tests, extract_text_medical_test # type: ignore
 from app.ocr.prescription_ocr import extract_prescriptions, extract_text_prescription # type: ignore
-from app.medicines.medicines_db import get_medicines_data # type: ignore
-from app.medicines.drug_interactions import get_drug_interactions, format_interaction_response # type: ignore
-from app.chatbot.chatbot import chat # type: ignore
+from app.medicines.medicines_db import parse_medicines_query, get_medicines_json, medicines_etag, get_catalog, get_catalog_status, load_catalog, start_background_load, retry_failed_load # type: ignore
+from app.medicines.drug_interactions import get_drug_interactions, get_interaction_matrix, format_interaction_response, label_cache, normalize_drug_name # type: ignore
+from app.chatbot.chatbot import chat, stream_chat, session_store # type: ignore
+from app.chatbot.local_classifier import local_classifier # type: ignore
+from app.chatbot.answer_cache import answer_cache # type: ignore
 from app.models.medical_models import MedicalResponse # type: ignore # Import MedicalResponse model
-from huggingface_hub import login # type: ignore
-from app.config import HUGGINGFACE_TOKEN # type: ignore
+from app.utils.ocr_utils import get_ocr_service, OCRDeadlineExceeded # type: ignore
+from app.utils.llm_client import get_llm_client # type: ignore
+from app.ocr.lab_interpretation import interpretation_stats # type: ignore
+from app.ocr.lab_parser import parser_stats # type: ignore
+from app.ocr.common_ocr import preprocess_stats # type: ignore
+from app.ocr.upload_cache import upload_cache, upload_digest, cached_text, cached_result # type: ignore
+from app.config import BACKGROUND_LOAD, MEDICINES_CACHE_MAX_AGE, MEDICINES_LOAD_RETRY, FDA_MATRIX_MAX_DRUGS # type: ignore
 
-if HUGGINGFACE_TOKEN:
-    login(token=HUGGINGFACE_TOKEN)
-else:
-    print("Warning: HUGGINGFACE_TOKEN is missing from .env file. Medicine database and chatbot features might be limited.")
+# The medicine catalog and the OCR models are slow to load; warm them in the background
+# so the other endpoints can serve immediately. The PDF pool's spawned workers import
+# this module again (through run.py) but only rasterize pages, so they skip it. They
+# are told apart by name: parent_process() is only set after the re-import
+if multiprocessing.current_process().name == "MainProcess":
+    if BACKGROUND_LOAD:
+        start_background_load()
+        get_ocr_service()  # Its workers load their models in their own threads
+    else:
+        load_catalog()
 
 
 app = Flask(__name__)
 CORS(app)
 
+@app.errorhandler(OCRDeadlineExceeded)
+def ocr_deadline_exceeded(error):
+    # The OCR queue is too long to read the upload in time; ask the client to retry
+    response = jsonify({"error": "Text recognition is busy, please retry shortly."})
+    response.status_code = 503
+    response.headers["Retry-After"] = "5"
+    return response
+
 @app.route("/extract-medical-tests", methods=["POST"])
 def extract_medical_tests_endpoint():
     if "file" not in request.files:
@@ -43,8 +67,16 @@ def extract_medical_tests_endpoint():
     if file_type not in ["application/pdf", "image/jpeg", "image/png"]:
         return jsonify({"error": "Unsupported file format"}), 400
 
-    extracted_text = extract_text_medical_test(file_bytes, file_type) # Use medical test specific extraction
-    test_results = extract_medical_tests(extracted_text)
+    # A re-upload of the same file is answered from the upload cache
+    digest = upload_digest(file_bytes)
+
+    def extract():
+        extracted_text = cached_text(digest, file_type, lambda: extract_text_medical_test(file_bytes, file_type)) # Use medical test specific extraction
+        return extract_medical_tests(extracted_text)
+
+    # A cached result is served as of now, like a fresh one
+    now = datetime.datetime.now().isoformat()
+    test_results = [dict(test, lastUpdated=now) for test in cached_result("medical_tests", digest, file_type, extract)]
     return jsonify({"medical_tests": test_results})
 
 @app.route("/extract-prescriptions", methods=["POST"])
@@ -61,8 +93,14 @@ def extract_prescriptions_endpoint():
     if file_type not in ["application/pdf", "image/jpeg", "image/png"]:
         return jsonify({"error": "Unsupported file format"}), 400
 
-    extracted_text = extract_text_prescription(file_bytes, file_type) # Use prescription specific extraction
-    prescription_details_raw = extract_prescriptions(extracted_text)
+    # A re-upload of the same file is answered from the upload cache
+    digest = upload_digest(file_bytes)
+
+    def extract():
+        extracted_text = cached_text(digest, file_type, lambda: extract_text_prescription(file_bytes, file_type)) # Use prescription specific extraction
+        return extract_prescriptions(extracted_text)
+
+    prescription_details_raw = cached_result("prescriptions", digest, file_type, extract)
 
     if "error" in prescription_details_raw:
         return jsonify({"prescriptions": prescription_details_raw}), 200
@@ -82,8 +120,28 @@ def extract_prescriptions_endpoint():
 
 @app.route('/medicines', methods=['GET'])
 def get_medicines_endpoint():
-    medicines_response = get_medicines_data()
-    return jsonify(medicines_response)
+    if get_catalog() is None:
+        status = get_catalog_status()
+        if status["status"] == "failed" and not retry_failed_load():
+            response = jsonify({"status": "failed", "error": "Medicine database is unavailable."})
+            response.status_code = 503
+            response.headers["Retry-After"] = str(MEDICINES_LOAD_RETRY)
+            return response
+        response = jsonify({"status": "warming", "message": "Medicine database is loading, please retry shortly."})
+        response.status_code = 503
+        response.headers["Retry-After"] = "5"
+        return response
+
+    query = parse_medicines_query(request.args)
+    etag = medicines_etag(query)
+    if request.if_none_match.contains(etag):
+        response = Response(status=304)
+    else:
+        response = Response(get_medicines_json(query), mimetype="application/json")
+    response.set_etag(etag)
+    response.cache_control.public = True
+    response.cache_control.max_age = MEDICINES_CACHE_MAX_AGE
+    return response
 
 @app.route('/drug-interactions', methods=['POST'])
 def drug_interactions_endpoint():
@@ -121,6 +179,47 @@ def drug_interactions_endpoint():
     
     return jsonify(formatted_response)
 
+@app.route('/drug-interactions/matrix', methods=['POST'])
+def drug_interaction_matrix_endpoint():
+    """
+    Check every pair of drugs in a regimen for interactions.
+
+    Expected JSON payload:
+    {
+        "drugs": ["Simvastatin", "Clarithromycin", "Warfarin", "Aspirin"]
+    }
+    """
+    data = request.json
+    if not data:
+        return jsonify({"error": "No JSON data provided"}), 400
+
+    drugs = data.get("drugs", [])
+    if not isinstance(drugs, list):
+        return jsonify({"error": "drugs must be a list"}), 400
+
+    # Filter out empty drug names
+    drugs = [drug.strip() for drug in drugs if isinstance(drug, str) and drug.strip()]
+
+    distinct = len({normalize_drug_name(drug) for drug in drugs})
+    if distinct < 2:
+        return jsonify({"error": "At least two different drugs are required"}), 400
+    if distinct > FDA_MATRIX_MAX_DRUGS:
+        return jsonify({"error": f"At most {FDA_MATRIX_MAX_DRUGS} drugs can be checked at once"}), 400
+
+    return jsonify(get_interaction_matrix(drugs))
+
+def get_chat_session(data):
+    """
+    The server-side session of a request that sends a conversation_id (null to start one).
+    An unknown or expired id starts a new session, seeded with chat_history if it was sent.
+    """
+    if "conversation_id" not in data:
+        return None
+    conversation_id = data.get("conversation_id")
+    session = session_store.get(conversation_id) if conversation_id else None
+    return session or session_store.create(data.get("chat_history"))
+
+
 @app.route("/chat", methods=["POST"])
 def chat_endpoint():
     data = request.json
@@ -129,12 +228,62 @@ def chat_endpoint():
     if not prompt:
         return jsonify({"error": "Message is required"}), 400
 
-    chat_response = chat(prompt, chat_history) # Pass chat_history to chat function
+    session = get_chat_session(data)
+    chat_response = chat(prompt, chat_history, session=session) # Pass chat_history to chat function
 
+    # Errors carry the conversation_id too, so a client can retry in a session this request created
     if isinstance(chat_response, MedicalResponse):
-        return jsonify(chat_response.dict())
+        body, status = chat_response.dict(), 200
     else:
-        return jsonify(chat_response), 500
+        body, status = dict(chat_response), 500
+    if session is not None:
+        body["conversation_id"] = session.id
+    return jsonify(body), status
+
+
+@app.route("/chat/stream", methods=["POST"])
+def chat_stream_endpoint():
+    """
+    Same request as /chat, but the reply is streamed as Server-Sent Events:
+    "token" events carry pieces of the message as they are generated, followed
+    by a "done" event with the full reply (or an "error" event). Both carry the
+    conversation_id of a session request.
+    """
+    data = request.json
+    prompt = data.get("message", "").strip()
+    chat_history = data.get("chat_history", [])
+    if not prompt:
+        return jsonify({"error": "Message is required"}), 400
+
+    session = get_chat_session(data)
+
+    def events():
+        for event in stream_chat(prompt, chat_history, session=session):
+            name = event.pop("event")
+            if name in ("done", "error") and session is not None:
+                event["conversation_id"] = session.id
+            yield f"event: {name}\ndata: {json.dumps(event, ensure_ascii=False)}\n\n"
+
+    # X-Accel-Buffering stops nginx-style proxies from buffering the stream
+    return Response(stream_with_context(events()), mimetype="text/event-stream",
+                    headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"})
+
+
+@app.route("/metrics", methods=["GET"])
+def metrics_endpoint():
+    """Cache hit/miss counters for monitoring."""
+    return jsonify({
+        "fda_label_cache": label_cache.stats(),
+        "chat_classifier": local_classifier.stats(),
+        "chat_answer_cache": answer_cache.stats(),
+        "chat_sessions": session_store.stats(),
+        "upload_cache": upload_cache.stats(),
+        "ocr": get_ocr_service().stats(),
+        "ocr_preprocess": preprocess_stats(),
+        "lab_parser": parser_stats(),
+        "lab_interpretations": interpretation_stats(),
+        "llm": get_llm_client().stats()
+    })
 
 
 if __name__ == "__main__":
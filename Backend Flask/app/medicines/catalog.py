@@ -0,0 +1,150 @@
+"""
+Prebuilt on-disk snapshot of the medicine catalog.
+
+A snapshot directory holds the memory-mapped columnar store, the facet and name
+index arrays as .npy files, and a manifest recording the format version, the
+source dataset version and a SHA-256 checksum per file. Loading a snapshot only
+maps files and verifies checksums, so it does not need the HuggingFace dataset.
+
+Prebuild one with:
+    python -m app.medicines.catalog [snapshot_dir]
+"""
+import os
+import sys
+import json
+import time
+import hashlib
+import logging
+import numpy as np
+import pyarrow as pa # type: ignore
+from typing import Dict
+from app.medicines.medicine_store import MedicineStore, build_store # type: ignore
+from app.medicines.medicine_index import FacetIndex # type: ignore
+from app.medicines.name_index import NameIndex # type: ignore
+
+logger = logging.getLogger(__name__)
+
+DATASET_NAME = "rifatul123/NoN_generic_248218_type_indian_drug_cleaned"
+SNAPSHOT_FORMAT_VERSION = 1
+MANIFEST_FILE = "manifest.json"
+STORE_FILE = "medicines.arrow"
+FACETS_FILE = "facets.json"
+
+
+class SnapshotError(Exception):
+    """Raised when a snapshot is missing, from another format version, or corrupt."""
+
+
+class MedicineCatalog:
+    """The columnar store plus the indexes the /medicines endpoint queries."""
+
+    def __init__(self, store: MedicineStore, class_index: FacetIndex, use_index: FacetIndex, name_index: NameIndex):
+        self.store = store
+        self.version = store.version
+        self.class_index = class_index
+        self.use_index = use_index
+        self.name_index = name_index
+
+
+def _sha256(path: str) -> str:
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(1 << 20), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def _write_text_atomic(path: str, text: str) -> None:
+    tmp_path = f"{path}.{os.getpid()}.tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        f.write(text)
+    os.replace(tmp_path, path)
+
+
+def write_snapshot(source: pa.Table, version: str, snapshot_dir: str) -> None:
+    """Build the store and indexes for `source` and write them as a snapshot."""
+    os.makedirs(snapshot_dir, exist_ok=True)
+    build_store(source, os.path.join(snapshot_dir, STORE_FILE))
+    store = MedicineStore(os.path.join(snapshot_dir, STORE_FILE), version)
+    indexes = {
+        "class": FacetIndex(store.list_column("CLASS")),
+        "use": FacetIndex(store.list_column("Uses")),
+        "name": NameIndex(store.name_lower),
+    }
+
+    files = [STORE_FILE, FACETS_FILE]
+    facets = {"classes": indexes["class"].values, "uses": indexes["use"].values}
+    _write_text_atomic(os.path.join(snapshot_dir, FACETS_FILE), json.dumps(facets))
+    for prefix, index in indexes.items():
+        for name, array in index.arrays().items():
+            file_name = f"{prefix}.{name}.npy"
+            # np.save appends .npy to paths without it, so keep the suffix on the temp file
+            tmp_path = os.path.join(snapshot_dir, f"{prefix}.{name}.{os.getpid()}.tmp.npy")
+            np.save(tmp_path, np.ascontiguousarray(array))
+            os.replace(tmp_path, os.path.join(snapshot_dir, file_name))
+            files.append(file_name)
+
+    # The manifest goes last: a snapshot without one is never loaded
+    manifest = {
+        "format_version": SNAPSHOT_FORMAT_VERSION,
+        "dataset": DATASET_NAME,
+        "dataset_version": version,
+        "created": time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime()),
+        "files": {file_name: _sha256(os.path.join(snapshot_dir, file_name)) for file_name in files},
+    }
+    _write_text_atomic(os.path.join(snapshot_dir, MANIFEST_FILE), json.dumps(manifest, indent=2))
+    logger.info("Wrote medicine catalog snapshot %s to %s", version, snapshot_dir)
+
+
+def load_snapshot(snapshot_dir: str, verify: bool = True) -> MedicineCatalog:
+    """Map a snapshot written by `write_snapshot`, checking its format version and checksums."""
+    manifest_path = os.path.join(snapshot_dir, MANIFEST_FILE)
+    try:
+        with open(manifest_path, encoding="utf-8") as f:
+            manifest = json.load(f)
+    except (OSError, ValueError) as e:
+        raise SnapshotError(f"No readable snapshot manifest at {manifest_path}: {e}")
+    if manifest.get("format_version") != SNAPSHOT_FORMAT_VERSION:
+        raise SnapshotError(f"Snapshot format {manifest.get('format_version')} != {SNAPSHOT_FORMAT_VERSION}")
+
+    files: Dict[str, str] = manifest.get("files", {})
+    for file_name, checksum in files.items():
+        path = os.path.join(snapshot_dir, file_name)
+        if not os.path.exists(path):
+            raise SnapshotError(f"Snapshot file {file_name} is missing")
+        if verify and _sha256(path) != checksum:
+            raise SnapshotError(f"Snapshot file {file_name} failed its checksum")
+
+    def arrays(prefix, names):
+        return {name: np.load(os.path.join(snapshot_dir, f"{prefix}.{name}.npy"), mmap_mode="r") for name in names}
+
+    with open(os.path.join(snapshot_dir, FACETS_FILE), encoding="utf-8") as f:
+        facets = json.load(f)
+    store = MedicineStore(os.path.join(snapshot_dir, STORE_FILE), manifest["dataset_version"])
+    return MedicineCatalog(
+        store,
+        FacetIndex.from_arrays(facets["classes"], arrays("class", FacetIndex.ARRAYS)),
+        FacetIndex.from_arrays(facets["uses"], arrays("use", FacetIndex.ARRAYS)),
+        NameIndex.from_arrays(store.name_lower, arrays("name", NameIndex.ARRAYS)),
+    )
+
+
+def build_snapshot_from_hub(snapshot_dir: str) -> None:
+    """Download the medicine dataset from the HuggingFace Hub and snapshot it."""
+    from datasets import load_dataset # type: ignore
+    from huggingface_hub import login # type: ignore
+    from app.config import HUGGINGFACE_TOKEN # type: ignore
+
+    if HUGGINGFACE_TOKEN:
+        login(token=HUGGINGFACE_TOKEN)
+    else:
+        print("Warning: HUGGINGFACE_TOKEN is missing from .env file. Medicine database features might be limited.")
+    dataset = load_dataset(DATASET_NAME)["train"]
+    write_snapshot(dataset.data.table, dataset._fingerprint, snapshot_dir)
+
+
+if __name__ == "__main__":
+    from app.config import MEDICINES_SNAPSHOT_DIR # type: ignore
+
+    logging.basicConfig(level=logging.INFO)
+    build_snapshot_from_hub(sys.argv[1] if len(sys.argv) > 1 else MEDICINES_SNAPSHOT_DIR)
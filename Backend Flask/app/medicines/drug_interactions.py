@@ -1,6 +1,65 @@
+import os
 import requests
-import re
+from concurrent.futures import ThreadPoolExecutor
+from requests.adapters import HTTPAdapter
 from typing import List, Dict, Optional
+from app.utils.cache_utils import TwoTierCache # type: ignore
+from app.medicines.label_db import lookup_interaction_text # type: ignore
+from app.medicines.interaction_matcher import get_matcher # type: ignore
+from app.config import CACHE_DIR, FDA_API_URL, FDA_CACHE_SIZE, FDA_CACHE_TTL, FDA_CACHE_STALE_TTL, FDA_CACHE_NEGATIVE_TTL, INTERACTIONS_SOURCE, FDA_MAX_CONCURRENCY # type: ignore
+
+# Label lookups are cached per normalized drug name; "" means openFDA had no interaction text
+label_cache = TwoTierCache(
+    "fda_labels",
+    os.path.join(CACHE_DIR, "fda_labels.sqlite3"),
+    max_entries=FDA_CACHE_SIZE,
+    ttl=FDA_CACHE_TTL,
+    stale_ttl=FDA_CACHE_STALE_TTL,
+    negative_ttl=FDA_CACHE_NEGATIVE_TTL,
+    is_negative=lambda text: not text,
+)
+
+# Shared keep-alive session so repeated and concurrent label fetches reuse connections
+fda_session = requests.Session()
+fda_session.mount("https://", HTTPAdapter(pool_connections=1, pool_maxsize=FDA_MAX_CONCURRENCY))
+fda_session.mount("http://", HTTPAdapter(pool_connections=1, pool_maxsize=FDA_MAX_CONCURRENCY))
+
+
+def normalize_drug_name(drug: str) -> str:
+    return " ".join(drug.lower().split())
+
+
+def fetch_interaction_text_from_fda(drug: str) -> str:
+    """
+    Fetch the drug_interactions text of the first openFDA label that mentions `drug`.
+
+    Returns an empty string when openFDA has no matching label; raises
+    requests.exceptions.RequestException on connection or server errors.
+    """
+    url = f"{FDA_API_URL}?search=drug_interactions:{drug}"
+    response = fda_session.get(url, timeout=15)
+    if response.status_code == 404:  # openFDA answers "No matches found" with a 404
+        return ""
+    response.raise_for_status()  # Raise an exception for bad status codes
+    data = response.json()
+
+    for result in data.get("results", []):
+        interaction_list = result.get("drug_interactions")
+        if interaction_list and len(interaction_list) > 0:
+            return interaction_list[0]  # Stop at the first one found
+    return ""
+
+
+def get_interaction_text(drug: str) -> str:
+    """
+    Interaction text for `drug` from the configured source: the local label database
+    in "offline" mode, otherwise the cached openFDA lookup keyed by the normalized name.
+    """
+    drug = normalize_drug_name(drug)
+    if INTERACTIONS_SOURCE == "offline":
+        return lookup_interaction_text(drug)
+    return label_cache.get_or_load(drug, lambda: fetch_interaction_text_from_fda(drug))
+
 
 def get_drug_interactions(primary_drug: str, related_drugs: List[str]) -> Dict:
     """
@@ -14,39 +73,15 @@ def get_drug_interactions(primary_drug: str, related_drugs: List[str]) -> Dict:
         Dict: Dictionary containing interaction results
     """
     try:
-        # Step 1: Send the request to get all interactions with the primary drug
-        url = f"https://api.fda.gov/drug/label.json?search=drug_interactions:{primary_drug}"
-        response = requests.get(url, timeout=15)
-        response.raise_for_status()  # Raise an exception for bad status codes
-        data = response.json()
-        
-        # Step 2: Extract drug_interactions from the response
-        interaction_text = ""
-        for result in data.get("results", []):
-            interaction_list = result.get("drug_interactions")
-            if interaction_list and len(interaction_list) > 0:
-                interaction_text = interaction_list[0]
-                break  # Stop at the first one found
+        # Step 1 & 2: Get the drug_interactions text of the primary drug (cached)
+        interaction_text = get_interaction_text(primary_drug)
         
         # Step 3: Search within drug_interactions for specific drugs
         interactions = {}
         if interaction_text:
-            for drug in related_drugs:
-                # Improved regex pattern to find sentences containing the drug name
-                # This pattern looks for the drug name within a sentence (ending with period)
-                pattern = r'([^.]*?\b' + re.escape(drug) + r'\b[^.]*?\.)'
-                matches = re.findall(pattern, interaction_text, re.IGNORECASE)
-                
-                if matches:
-                    # Clean up the matches - remove extra whitespace and ensure proper formatting
-                    cleaned_matches = []
-                    for match in matches:
-                        cleaned = match.strip()
-                        if cleaned and len(cleaned) > 10:  # Only include meaningful sentences
-                            cleaned_matches.append(cleaned)
-                    interactions[drug] = cleaned_matches
-                else:
-                    interactions[drug] = []
+            # One pass over the sentences finds every related drug (and its known synonyms)
+            matches = get_matcher(related_drugs).match_sentences(interaction_text)
+            interactions = {drug: matches[drug] for drug in related_drugs}
         else:
             return {
                 "success": False,
@@ -75,6 +110,77 @@ def get_drug_interactions(primary_drug: str, related_drugs: List[str]) -> Dict:
             "interactions": {}
         }
 
+def get_interaction_matrix(drugs: List[str]) -> Dict:
+    """
+    Check every pair of drugs in a regimen for interactions.
+
+    The interaction text of every drug is fetched concurrently (at most
+    FDA_MAX_CONCURRENCY upstream requests at a time), then each drug's label is
+    searched once for all the other drugs. A pair interacts if either drug's
+    label mentions the other. When a drug's label couldn't be fetched (see
+    "errors") or has no interaction text, its pairs are unknown (None) unless
+    the other drug's label mentions it.
+
+    Args:
+        drugs (List[str]): The drugs in the regimen (at least two); names differing
+            only in case or spacing are checked once, under their first spelling
+
+    Returns:
+        Dict: The pairwise matrix, the supporting sentences per pair and any per-drug errors
+    """
+    unique = {}
+    for drug in drugs:
+        unique.setdefault(normalize_drug_name(drug), drug)
+    drugs = list(unique.values())
+    with ThreadPoolExecutor(max_workers=min(FDA_MAX_CONCURRENCY, len(drugs))) as executor:
+        futures = {drug: executor.submit(get_interaction_text, drug) for drug in drugs}
+
+    texts, errors = {}, {}
+    for drug, future in futures.items():
+        try:
+            texts[drug] = future.result()
+        except requests.exceptions.RequestException as e:
+            errors[drug] = f"Error connecting to FDA API: {str(e)}"
+        except Exception as e:
+            errors[drug] = f"Unexpected error: {str(e)}"
+
+    # mentions[a][b]: sentences of a's label that mention b
+    matcher = get_matcher(drugs)
+    mentions = {drug: matcher.match_sentences(text) if text else {} for drug, text in texts.items()}
+
+    matrix = [[None] * len(drugs) for _ in drugs]
+    pairs = []
+    for i, drug_a in enumerate(drugs):
+        for j in range(i + 1, len(drugs)):
+            drug_b = drugs[j]
+            interactions = {
+                drug_a: mentions.get(drug_a, {}).get(drug_b, []),
+                drug_b: mentions.get(drug_b, {}).get(drug_a, []),
+            }
+            if interactions[drug_a] or interactions[drug_b]:
+                has_interactions = True
+            else:
+                # Without both labels' interaction text, no mention doesn't mean no interaction
+                has_interactions = False if texts.get(drug_a) and texts.get(drug_b) else None
+            matrix[i][j] = matrix[j][i] = has_interactions
+            pairs.append({
+                "drugs": [drug_a, drug_b],
+                "interactions": interactions,
+                "has_interactions": has_interactions
+            })
+
+    return {
+        "drugs": drugs,
+        "matrix": matrix,
+        "pairs": pairs,
+        "errors": errors,
+        "summary": {
+            "total_pairs": len(pairs),
+            "pairs_with_interactions": len([pair for pair in pairs if pair["has_interactions"]]),
+            "pairs_unknown": len([pair for pair in pairs if pair["has_interactions"] is None])
+        }
+    }
+
 def format_interaction_response(interaction_data: Dict) -> Dict:
     """
     Format the interaction data for API response.
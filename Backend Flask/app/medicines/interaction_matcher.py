@@ -0,0 +1,122 @@
+from collections import deque
+from functools import lru_cache
+from typing import Dict, Iterable, List, Tuple
+from app.medicines.label_db import split_sentences # type: ignore
+
+# International (INN) and US (USAN) names of the same drug, so a label written with
+# one name still matches a query for the other
+DRUG_SYNONYMS = {
+    "paracetamol": ["acetaminophen"],
+    "acetaminophen": ["paracetamol"],
+    "salbutamol": ["albuterol"],
+    "albuterol": ["salbutamol"],
+    "adrenaline": ["epinephrine"],
+    "epinephrine": ["adrenaline"],
+    "noradrenaline": ["norepinephrine"],
+    "norepinephrine": ["noradrenaline"],
+    "frusemide": ["furosemide"],
+    "furosemide": ["frusemide"],
+    "glibenclamide": ["glyburide"],
+    "glyburide": ["glibenclamide"],
+    "pethidine": ["meperidine"],
+    "meperidine": ["pethidine"],
+    "lignocaine": ["lidocaine"],
+    "lidocaine": ["lignocaine"],
+    "ciclosporin": ["cyclosporine"],
+    "cyclosporine": ["ciclosporin"],
+    "rifampicin": ["rifampin"],
+    "rifampin": ["rifampicin"],
+}
+
+# Sentences this short are headings or fragments, not interaction statements
+MIN_SENTENCE_LENGTH = 10
+
+
+def _is_word_char(char: str) -> bool:
+    return char.isalnum() or char == "_"
+
+
+class DrugMatcher:
+    """
+    Aho-Corasick automaton over the lowercased names (and synonyms) of a set of drugs.
+
+    One left-to-right pass over a text reports every whole-word occurrence of every
+    name, including overlapping ones, so the cost is linear in the text length
+    regardless of how many drugs are being checked.
+    """
+
+    def __init__(self, drugs: Iterable[str]):
+        self.drugs = list(dict.fromkeys(drugs))
+        self._goto: List[Dict[str, int]] = [{}]
+        self._fail: List[int] = [0]
+        self._output: List[List[Tuple[int, int]]] = [[]]  # (drug index, pattern length)
+
+        for drug_index, drug in enumerate(self.drugs):
+            names = {drug.lower()} | set(DRUG_SYNONYMS.get(drug.lower(), []))
+            for name in names:
+                if name:
+                    self._add(name, drug_index)
+        self._build_failure_links()
+
+    def _add(self, pattern: str, drug_index: int) -> None:
+        state = 0
+        for char in pattern:
+            next_state = self._goto[state].get(char)
+            if next_state is None:
+                next_state = len(self._goto)
+                self._goto[state][char] = next_state
+                self._goto.append({})
+                self._fail.append(0)
+                self._output.append([])
+            state = next_state
+        self._output[state].append((drug_index, len(pattern)))
+
+    def _build_failure_links(self) -> None:
+        queue = deque(self._goto[0].values())
+        while queue:
+            state = queue.popleft()
+            for char, next_state in self._goto[state].items():
+                queue.append(next_state)
+                fallback = self._fail[state]
+                while fallback and char not in self._goto[fallback]:
+                    fallback = self._fail[fallback]
+                target = self._goto[fallback].get(char, 0)
+                self._fail[next_state] = target if target != next_state else 0
+                self._output[next_state] = self._output[next_state] + self._output[self._fail[next_state]]
+
+    def drugs_in(self, text: str) -> set:
+        """Indices of the drugs mentioned in `text` as whole words."""
+        found = set()
+        text = text.lower()
+        goto, fail, output = self._goto, self._fail, self._output
+        state = 0
+        for position, char in enumerate(text):
+            while state and char not in goto[state]:
+                state = fail[state]
+            state = goto[state].get(char, 0)
+            for drug_index, length in output[state]:
+                start = position - length + 1
+                if (start == 0 or not _is_word_char(text[start - 1])) and \
+                        (position + 1 == len(text) or not _is_word_char(text[position + 1])):
+                    found.add(drug_index)
+        return found
+
+    def match_sentences(self, text: str) -> Dict[str, List[str]]:
+        """Split `text` into sentences once and return, per drug, the sentences that mention it."""
+        matches: Dict[str, List[str]] = {drug: [] for drug in self.drugs}
+        for sentence in split_sentences(text):
+            if len(sentence) <= MIN_SENTENCE_LENGTH:
+                continue
+            for drug_index in sorted(self.drugs_in(sentence)):
+                matches[self.drugs[drug_index]].append(sentence)
+        return matches
+
+
+@lru_cache(maxsize=256)
+def _cached_matcher(drugs: Tuple[str, ...]) -> DrugMatcher:
+    return DrugMatcher(drugs)
+
+
+def get_matcher(drugs: Iterable[str]) -> DrugMatcher:
+    """Return a compiled matcher for `drugs`, reusing it for repeated drug sets."""
+    return _cached_matcher(tuple(sorted(set(drugs))))
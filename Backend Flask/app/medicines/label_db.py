@@ -0,0 +1,142 @@
+"""
+Offline openFDA drug-label database for network-free interaction checks.
+
+Ingest the openFDA drug-label bulk download (https://open.fda.gov/data/downloads/,
+the drug-label-*-of-*.json.zip files) with:
+    python -m app.medicines.label_db file1.json.zip [file2.json.zip ...]
+
+Each label's drug_interactions section is stored whole and also split into
+sentences in a SQLite FTS5 table, so looking up the label for a drug is a
+full-text query instead of a round trip to api.fda.gov.
+"""
+import os
+import re
+import sys
+import json
+import sqlite3
+import zipfile
+import logging
+from typing import Iterator, List
+from app.config import LABEL_DB_PATH # type: ignore
+
+logger = logging.getLogger(__name__)
+
+# A sentence ends at ., ! or ? followed by whitespace or the end of the text,
+# so decimals such as "2.5 mg" stay inside their sentence
+SENTENCE_END = re.compile(r'(?<=[.!?])\s+')
+
+SCHEMA = """
+CREATE TABLE labels (
+    id INTEGER PRIMARY KEY,
+    set_id TEXT,
+    generic_name TEXT,
+    brand_name TEXT,
+    interaction_text TEXT NOT NULL
+);
+CREATE VIRTUAL TABLE interaction_sentences USING fts5(
+    sentence,
+    label_id UNINDEXED,
+    position UNINDEXED,
+    tokenize = 'unicode61'
+);
+"""
+
+
+def split_sentences(text: str) -> List[str]:
+    """Split interaction text into stripped, non-empty sentences."""
+    return [sentence.strip() for sentence in SENTENCE_END.split(text) if sentence.strip()]
+
+
+def _read_labels(path: str) -> Iterator[dict]:
+    """Yield the label records of one openFDA dump file (.json or .json.zip)."""
+    if zipfile.is_zipfile(path):
+        with zipfile.ZipFile(path) as archive:
+            for name in archive.namelist():
+                if name.endswith(".json"):
+                    with archive.open(name) as f:
+                        yield from json.load(f).get("results", [])
+    else:
+        with open(path, encoding="utf-8") as f:
+            yield from json.load(f).get("results", [])
+
+
+def ingest(paths: List[str], db_path: str = LABEL_DB_PATH) -> int:
+    """
+    Build the label database from openFDA dump files, replacing any existing one.
+
+    The database is written to a temporary file and swapped in at the end, so
+    running lookups keep working during an ingest.
+
+    Returns:
+        int: Number of labels with a drug_interactions section that were stored.
+    """
+    os.makedirs(os.path.dirname(db_path) or ".", exist_ok=True)
+    tmp_path = f"{db_path}.{os.getpid()}.tmp"
+    if os.path.exists(tmp_path):
+        os.remove(tmp_path)
+
+    conn = sqlite3.connect(tmp_path)
+    stored = 0
+    try:
+        conn.executescript(SCHEMA)
+        for path in paths:
+            logger.info("Ingesting %s", path)
+            for label in _read_labels(path):
+                sections = label.get("drug_interactions") or []
+                interaction_text = " ".join(section.strip() for section in sections if section)
+                if not interaction_text:
+                    continue
+                openfda = label.get("openfda", {})
+                cursor = conn.execute(
+                    "INSERT INTO labels (set_id, generic_name, brand_name, interaction_text) VALUES (?, ?, ?, ?)",
+                    (label.get("set_id"), "; ".join(openfda.get("generic_name", [])), "; ".join(openfda.get("brand_name", [])), interaction_text),
+                )
+                conn.executemany(
+                    "INSERT INTO interaction_sentences (sentence, label_id, position) VALUES (?, ?, ?)",
+                    ((sentence, cursor.lastrowid, position) for position, sentence in enumerate(split_sentences(interaction_text))),
+                )
+                stored += 1
+        conn.commit()
+        conn.execute("INSERT INTO interaction_sentences (interaction_sentences) VALUES ('optimize')")
+        conn.commit()
+    finally:
+        conn.close()
+    os.replace(tmp_path, db_path)
+    logger.info("Stored %d labels in %s", stored, db_path)
+    return stored
+
+
+def _phrase_query(drug: str) -> str:
+    # Quote the name as an FTS5 phrase so punctuation in drug names isn't parsed as syntax
+    return '"' + drug.replace('"', '""') + '"'
+
+
+def lookup_interaction_text(drug: str, db_path: str = LABEL_DB_PATH) -> str:
+    """
+    Offline equivalent of the openFDA `drug_interactions:<drug>` search: the interaction
+    text of the best-ranked label whose interaction section mentions `drug`.
+
+    Returns an empty string when no label mentions it; raises FileNotFoundError when
+    the database has not been ingested yet.
+    """
+    if not os.path.exists(db_path):
+        raise FileNotFoundError(f"Drug label database not found at {db_path}; run python -m app.medicines.label_db")
+    conn = sqlite3.connect(f"file:{db_path}?mode=ro", uri=True)
+    try:
+        row = conn.execute(
+            "SELECT labels.interaction_text FROM interaction_sentences "
+            "JOIN labels ON labels.id = interaction_sentences.label_id "
+            "WHERE interaction_sentences MATCH ? ORDER BY rank LIMIT 1",
+            (_phrase_query(drug),),
+        ).fetchone()
+    finally:
+        conn.close()
+    return row[0] if row else ""
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO)
+    if len(sys.argv) < 2:
+        print("Usage: python -m app.medicines.label_db <drug-label dump .json or .json.zip> ...")
+        sys.exit(1)
+    ingest(sys.argv[1:])
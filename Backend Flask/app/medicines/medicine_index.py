@@ -0,0 +1,88 @@
+import numpy as np
+import pyarrow as pa # type: ignore
+import pyarrow.compute as pc # type: ignore
+from typing import Dict, List, Optional
+
+
+class FacetIndex:
+    """
+    Inverted index from facet values (e.g. CLASS or Uses) to the rows that carry them.
+
+    Posting lists are sorted int32 row arrays packed into one flat buffer, and every
+    row keeps its own facet codes (CSR layout) so that per-facet counts for a result
+    set cost O(result size) instead of O(catalog size).
+    """
+
+    def __init__(self, column: pa.ListArray):
+        entry_rows = pc.list_parent_indices(column).to_numpy().astype(np.int64)
+        encoded = pc.dictionary_encode(pc.list_flatten(column))
+        dictionary = encoded.dictionary.to_pylist()
+
+        # Re-number codes so they follow the sorted order of the facet values
+        self.values = sorted(dictionary)
+        self._codes = {value: code for code, value in enumerate(self.values)}
+        remap = np.fromiter((self._codes[value] for value in dictionary), dtype=np.int64, count=len(dictionary))
+        entry_codes = remap[encoded.indices.to_numpy()] if len(dictionary) else np.empty(0, dtype=np.int64)
+
+        # Sorting (row, code) pairs drops values repeated within a row and orders the CSR
+        num_values = max(len(self.values), 1)
+        pairs = np.unique(entry_rows * num_values + entry_codes)
+        rows = (pairs // num_values).astype(np.int32)
+        self.row_codes = (pairs % num_values).astype(np.int32)
+        self.row_offsets = np.zeros(len(column) + 1, dtype=np.int64)
+        np.cumsum(np.bincount(rows, minlength=len(column)), out=self.row_offsets[1:])
+
+        # Stable sort by code keeps each posting list in row order
+        self.postings = rows[np.argsort(self.row_codes, kind="stable")]
+        self.counts = np.bincount(self.row_codes, minlength=len(self.values))
+        self.posting_offsets = np.zeros(len(self.values) + 1, dtype=np.int64)
+        np.cumsum(self.counts, out=self.posting_offsets[1:])
+
+    ARRAYS = ("row_codes", "row_offsets", "postings", "posting_offsets", "counts")
+
+    @classmethod
+    def from_arrays(cls, values: List[str], arrays: Dict[str, np.ndarray]) -> "FacetIndex":
+        """Rebuild an index from its facet values and the arrays listed in ARRAYS (e.g. memory-mapped from a snapshot)."""
+        index = cls.__new__(cls)
+        index.values = values
+        index._codes = {value: code for code, value in enumerate(values)}
+        for name in cls.ARRAYS:
+            setattr(index, name, arrays[name])
+        return index
+
+    def arrays(self) -> Dict[str, np.ndarray]:
+        return {name: getattr(self, name) for name in self.ARRAYS}
+
+    def posting(self, value: str) -> np.ndarray:
+        """Return the sorted rows tagged with `value` (empty if the value is unknown)."""
+        code = self._codes.get(value.strip())
+        if code is None:
+            return np.empty(0, dtype=np.int32)
+        return self.postings[self.posting_offsets[code]:self.posting_offsets[code + 1]]
+
+    def rows_matching_any(self, values: List[str]) -> np.ndarray:
+        """Union of the posting lists of `values`, in row order."""
+        postings = [self.posting(value) for value in values]
+        if len(postings) == 1:
+            return postings[0]
+        return np.unique(np.concatenate(postings)) if postings else np.empty(0, dtype=np.int32)
+
+    def counts_for(self, rows: Optional[np.ndarray] = None) -> Dict[str, int]:
+        """Per-facet counts for `rows`, or for the whole catalog when `rows` is None."""
+        if rows is None:
+            counts = self.counts
+        else:
+            starts = self.row_offsets[rows]
+            lengths = self.row_offsets[rows + 1] - starts
+            total = int(lengths.sum())
+            # Gather the CSR slices of the selected rows without a Python loop
+            shifts = np.repeat(starts - (np.cumsum(lengths) - lengths), lengths)
+            counts = np.bincount(self.row_codes[shifts + np.arange(total)], minlength=len(self.values))
+        return {self.values[code]: int(counts[code]) for code in np.flatnonzero(counts)}
+
+
+def intersect_rows(rows: Optional[np.ndarray], other: np.ndarray) -> np.ndarray:
+    """Keep the rows of `rows` that are also in the sorted set `other`, preserving their order; `None` stands for "all rows"."""
+    if rows is None:
+        return other
+    return rows[np.isin(rows, other, assume_unique=True)]
@@ -0,0 +1,79 @@
+import os
+import logging
+import numpy as np
+import pyarrow as pa # type: ignore
+import pyarrow.compute as pc # type: ignore
+from typing import Dict, List, Sequence
+
+logger = logging.getLogger(__name__)
+
+LIST_COLUMNS = ("CLASS", "Uses", "SIDEEFFECT")
+
+
+def split_column(column: pa.Array) -> pa.ListArray:
+    """Turn a comma-separated string column into a list<string> column of stripped, non-empty parts."""
+    if isinstance(column, pa.ChunkedArray):
+        column = column.combine_chunks()
+    lists = pc.split_pattern(column, ",")
+    parts = pc.utf8_trim_whitespace(pc.list_flatten(lists))
+    rows = pc.list_parent_indices(lists).to_numpy()
+    keep = pc.not_equal(parts, "")
+    parts = parts.filter(keep)
+    rows = rows[keep.to_numpy(zero_copy_only=False)]
+    offsets = np.zeros(len(column) + 1, dtype=np.int32)
+    np.cumsum(np.bincount(rows, minlength=len(column)), out=offsets[1:])
+    return pa.ListArray.from_arrays(pa.array(offsets), parts)
+
+
+def build_store(source: pa.Table, path: str) -> None:
+    """
+    Write the columnar medicine store for `source` to `path`.
+
+    The store is an uncompressed Arrow IPC file so it can be memory-mapped: NAME,
+    a lowercased NAME_LOWER for search, and CLASS/Uses/SIDEEFFECT pre-split into
+    list<string> columns.
+    """
+    names = pc.fill_null(source.column("NAME"), "")
+    columns = {"NAME": names, "NAME_LOWER": pc.utf8_lower(names)}
+    for name in LIST_COLUMNS:
+        columns[name] = split_column(source.column(name))
+    table = pa.table(columns)
+
+    # Write to a temporary file first so concurrent workers never map a partial store
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    tmp_path = f"{path}.{os.getpid()}.tmp"
+    with pa.OSFile(tmp_path, "wb") as sink:
+        with pa.ipc.new_file(sink, table.schema) as writer:
+            writer.write_table(table)
+    os.replace(tmp_path, path)
+    logger.info("Built medicine store at %s (%d rows)", path, table.num_rows)
+
+
+class MedicineStore:
+    """
+    Read-only, memory-mapped columnar view of the medicine catalog.
+
+    Every worker process maps the same file, so the OS page cache holds a single copy
+    of the data no matter how many workers are running. Rows are only converted to
+    Python objects for the indices a caller asks for.
+    """
+
+    def __init__(self, path: str, version: str = None):
+        self.path = path
+        self.version = version or os.path.basename(path)
+        self.table = pa.ipc.open_file(pa.memory_map(path, "r")).read_all()
+        self.num_rows = self.table.num_rows
+        self.name_lower = self.table.column("NAME_LOWER")
+
+    def list_column(self, name: str) -> pa.ListArray:
+        return self.table.column(name).combine_chunks()
+
+    def rows(self, indices: Sequence[int]) -> List[Dict]:
+        """Materialize only the requested rows, in the given order."""
+        if len(indices) == 0:
+            return []
+        if isinstance(indices, range) and indices.step == 1:
+            selected = self.table.slice(indices.start, len(indices))
+        else:
+            selected = self.table.take(pa.array(np.asarray(indices, dtype=np.int64)))
+        return selected.select(["NAME", *LIST_COLUMNS]).to_pylist()
@@ -1,51 +1,181 @@
-from datasets import load_dataset # type: ignore
+import json
+import time
+import hashlib
+import logging
+import threading
+from functools import lru_cache
+from typing import NamedTuple, Optional, Tuple
 from flask import request, jsonify
+from app.medicines.catalog import MedicineCatalog, SnapshotError, build_snapshot_from_hub, load_snapshot # type: ignore
+from app.medicines.medicine_index import intersect_rows # type: ignore
+from app.config import MEDICINES_SNAPSHOT_DIR, MEDICINES_CACHE_SIZE, MEDICINES_LOAD_RETRY # type: ignore
+
+logger = logging.getLogger(__name__)
 
-dataset = load_dataset("rifatul123/NoN_generic_248218_type_indian_drug_cleaned")
-medicines = dataset["train"].to_list()
 ITEMS_PER_PAGE = 6
 
-def get_medicines_data(): # Function to get medicine data for endpoint
-    page = int(request.args.get('page', 1))
-    limit = int(request.args.get('limit', ITEMS_PER_PAGE))
-    search_query = request.args.get('search', '').lower()
-    selected_classes = request.args.get('classes', '').split(',') if request.args.get('classes') else []
-    selected_uses = request.args.get('uses', '').split(',') if request.args.get('uses') else []
+# The catalog is loaded from a local snapshot (built from the HuggingFace dataset on
+# first run), possibly in a background thread; requests see None until it is ready
+_catalog: Optional[MedicineCatalog] = None
+_catalog_status = {"status": "warming", "error": None}
+_catalog_lock = threading.Lock()
+_failed_at = 0.0  # time.monotonic() of the last failed load
+_retry_lock = threading.Lock()
+_facets_json = {}
+
+
+def load_catalog() -> MedicineCatalog:
+    """Load the medicine catalog, building the local snapshot first if it is missing or stale."""
+    global _catalog, _failed_at
+    if _catalog is not None:
+        return _catalog
+    with _catalog_lock:
+        if _catalog is not None:
+            return _catalog
+        try:
+            try:
+                catalog = load_snapshot(MEDICINES_SNAPSHOT_DIR)
+            except SnapshotError as e:
+                logger.info("Rebuilding medicine catalog snapshot: %s", e)
+                build_snapshot_from_hub(MEDICINES_SNAPSHOT_DIR)
+                catalog = load_snapshot(MEDICINES_SNAPSHOT_DIR)
+        except Exception as e:
+            logger.error("Failed to load medicine catalog: %s", e)
+            _failed_at = time.monotonic()
+            _catalog_status.update(status="failed", error=str(e))
+            raise
+        # Facet lists are serialized once; responses splice them in
+        _facets_json["classes"] = json.dumps(catalog.class_index.values)
+        _facets_json["uses"] = json.dumps(catalog.use_index.values)
+        _catalog = catalog
+        _catalog_status.update(status="ready", error=None)
+        logger.info("Medicine catalog %s ready (%d medicines)", catalog.version, catalog.store.num_rows)
+        return catalog
+
+
+def start_background_load() -> threading.Thread:
+    """Load the catalog in a daemon thread so the other endpoints can serve meanwhile."""
+    def run():
+        try:
+            load_catalog()
+        except Exception:
+            pass  # Already logged and recorded in the catalog status
+
+    thread = threading.Thread(target=run, name="medicine-catalog-loader", daemon=True)
+    thread.start()
+    return thread
+
+
+def retry_failed_load() -> bool:
+    """
+    Start another background load if the last load failed at least MEDICINES_LOAD_RETRY
+    seconds ago (e.g. the dataset download failed). Returns whether a load was started.
+    """
+    with _retry_lock:
+        if _catalog_status["status"] != "failed" or time.monotonic() - _failed_at < MEDICINES_LOAD_RETRY:
+            return False
+        logger.info("Retrying medicine catalog load")
+        _catalog_status.update(status="warming", error=None)
+    start_background_load()
+    return True
+
+
+def get_catalog() -> Optional[MedicineCatalog]:
+    """Return the loaded catalog, or None while it is still warming up (or failed to load)."""
+    return _catalog
+
+
+def get_catalog_status() -> dict:
+    return dict(_catalog_status)
+
+
+class MedicinesQuery(NamedTuple):
+    page: int
+    limit: int
+    search: str
+    fuzzy: bool
+    classes: Tuple[str, ...]
+    uses: Tuple[str, ...]
 
-    filtered_medicines = medicines
+
+def _parse_list_arg(args, name: str) -> Tuple[str, ...]:
+    # Selected values are OR-ed together, so their order and duplicates don't matter
+    return tuple(sorted(set(value.strip() for value in args.get(name, '').split(',')))) if args.get(name) else ()
+
+
+def parse_medicines_query(args=None) -> MedicinesQuery:
+    """Normalize the /medicines query string so equivalent requests share one cache entry."""
+    args = request.args if args is None else args
+    return MedicinesQuery(
+        page=int(args.get('page', 1)),
+        limit=int(args.get('limit', ITEMS_PER_PAGE)),
+        search=args.get('search', '').lower(),
+        fuzzy=args.get('fuzzy', '').lower() in ('1', 'true', 'yes'),
+        classes=_parse_list_arg(args, 'classes'),
+        uses=_parse_list_arg(args, 'uses'),
+    )
+
+
+def medicines_etag(query: MedicinesQuery) -> str:
+    """Entity tag for a normalized query, tied to the dataset version of the loaded catalog."""
+    dataset_version = hashlib.sha1(load_catalog().version.encode()).hexdigest()[:16]
+    return f"{dataset_version}-{hashlib.sha1(repr(tuple(query)).encode()).hexdigest()[:16]}"
+
+
+@lru_cache(maxsize=MEDICINES_CACHE_SIZE)
+def get_medicines_json(query: MedicinesQuery) -> bytes:
+    """Serialized /medicines response for `query`, cached in a bounded LRU."""
+    response = _query_medicines(load_catalog(), query)
+    # Splice in the facet lists, which are serialized once at load time
+    body = json.dumps(response, separators=(",", ":"))
+    return f'{body[:-1]},"classes":{_facets_json["classes"]},"uses":{_facets_json["uses"]}}}'.encode("utf-8")
+
+
+def get_medicines_data(query: MedicinesQuery = None): # Function to get medicine data for endpoint
+    catalog = load_catalog()
+    response = _query_medicines(catalog, query or parse_medicines_query())
+    response["classes"] = catalog.class_index.values
+    response["uses"] = catalog.use_index.values
+    return response # Return dictionary, jsonify in main.py
+
+
+def _query_medicines(catalog: MedicineCatalog, query: MedicinesQuery):
+    page, limit, search_query = query.page, query.limit, query.search
+    fuzzy_search = query.fuzzy
+    selected_classes, selected_uses = list(query.classes), list(query.uses)
+
+    filtered_rows = None  # None means the whole catalog, in dataset order
     if search_query:
-        filtered_medicines = [m for m in filtered_medicines if search_query in m.get('NAME', '').lower()]
+        # Ranked: exact name, then prefix, then infix (then typo-tolerant matches if requested)
+        filtered_rows = catalog.name_index.search(search_query, fuzzy=fuzzy_search)
 
     if selected_classes:
-        filtered_medicines = [m for m in filtered_medicines if any(cls.strip() in [c.strip() for c in m.get('CLASS', '').split(',')] for cls in selected_classes)]
+        filtered_rows = intersect_rows(filtered_rows, catalog.class_index.rows_matching_any(selected_classes))
     if selected_uses:
-        filtered_medicines = [m for m in filtered_medicines if any(use.strip() in [u.strip() for u in m.get('Uses', '').split(',')] for use in selected_uses)]
+        filtered_rows = intersect_rows(filtered_rows, catalog.use_index.rows_matching_any(selected_uses))
 
-    total_items = len(filtered_medicines)
+    total_items = catalog.store.num_rows if filtered_rows is None else len(filtered_rows)
     total_pages = (total_items + limit - 1) // limit
-    start = (page - 1) * limit
+    start = max(page - 1, 0) * limit
     end = start + limit
-    paginated_medicines = filtered_medicines[start:end]
+    page_rows = range(start, min(max(end, start), total_items)) if filtered_rows is None else filtered_rows[start:end]
+    paginated_medicines = catalog.store.rows(page_rows)
 
     response_medicines = [
         {
             "id": index + 1,
-            "NAME": med.get('NAME', 'Unknown'),
-            "CLASS": [cls.strip() for cls in med.get('CLASS', '').split(',')] if med.get('CLASS') else [],
-            "Uses": [use.strip() for use in med.get('Uses', '').split(',')] if med.get('Uses') else [],
-            "SIDEEFFECT": [effect.strip() for effect in med.get('SIDEEFFECT', '').split(',')] if med.get('SIDEEFFECT') else []
+            "NAME": med['NAME'] or 'Unknown',
+            "CLASS": med['CLASS'],
+            "Uses": med['Uses'],
+            "SIDEEFFECT": med['SIDEEFFECT']
         }
         for index, med in enumerate(paginated_medicines)
     ]
 
-    all_classes = sorted(set(cls.strip() for med in medicines for cls in med.get('CLASS', '').split(',') if cls))
-    all_uses = sorted(set(use.strip() for med in medicines for use in med.get('Uses', '').split(',') if use))
-
-    response = {
+    return {
         "medicines": response_medicines,
         "totalPages": total_pages,
         "totalItems": total_items,
-        "classes": all_classes,
-        "uses": all_uses
+        "classCounts": catalog.class_index.counts_for(filtered_rows),
+        "useCounts": catalog.use_index.counts_for(filtered_rows)
     }
-    return response # Return dictionary, jsonify in main.py
\ No newline at end of file
@@ -0,0 +1,159 @@
+import bisect
+import numpy as np
+import pyarrow as pa # type: ignore
+import pyarrow.compute as pc # type: ignore
+from typing import Dict, List
+
+# Typo-tolerant search only verifies this many of the best trigram candidates
+FUZZY_MAX_CANDIDATES = 200
+# Stop intersecting trigram postings once this few candidates are left; verifying them is cheaper
+VERIFY_CANDIDATES_BELOW = 4096
+
+
+def _string_buffers(array: pa.Array):
+    """Return (offsets, data) numpy views over a string array's Arrow buffers."""
+    offset_type = np.int64 if pa.types.is_large_string(array.type) else np.int32
+    _, offsets_buffer, data_buffer = array.buffers()
+    offsets = np.frombuffer(offsets_buffer, dtype=offset_type)[array.offset:array.offset + len(array) + 1]
+    data = np.frombuffer(data_buffer, dtype=np.uint8) if data_buffer is not None else np.empty(0, dtype=np.uint8)
+    return offsets.astype(np.int64), data
+
+
+def _trigram_codes(data: np.ndarray) -> np.ndarray:
+    """Pack every 3-byte window of `data` into an int32 code."""
+    data = data.astype(np.int32)
+    return (data[:-2] << 16) | (data[1:-1] << 8) | data[2:]
+
+
+def substring_distance(pattern: str, text: str, max_distance: int) -> int:
+    """Smallest edit distance between `pattern` and any substring of `text` (capped at max_distance + 1)."""
+    previous = [0] * (len(text) + 1)
+    for i, pattern_char in enumerate(pattern, 1):
+        current = [i] + [0] * len(text)
+        for j, text_char in enumerate(text, 1):
+            current[j] = min(previous[j] + 1, current[j - 1] + 1, previous[j - 1] + (pattern_char != text_char))
+        if min(current) > max_distance:
+            return max_distance + 1
+        previous = current
+    return min(previous)
+
+
+class _SortedNames:
+    """Sequence view over the sorted lowercase names, for use with bisect."""
+
+    def __init__(self, names: pa.StringArray):
+        self.names = names
+
+    def __len__(self):
+        return len(self.names)
+
+    def __getitem__(self, position):
+        return self.names[position].as_py()
+
+
+class NameIndex:
+    """
+    Search index over the lowercased medicine names.
+
+    A sorted copy of the names answers exact and prefix lookups with binary search,
+    and a byte-trigram inverted index narrows infix (and typo-tolerant) matches down
+    to a handful of candidates before they are verified. Results are ranked
+    exact > prefix > infix > fuzzy, and keep dataset order within each tier.
+    """
+
+    ARRAYS = ("sorted_rows", "trigram_codes", "trigram_offsets", "trigram_rows")
+
+    def __init__(self, name_lower: pa.Array):
+        if isinstance(name_lower, pa.ChunkedArray):
+            name_lower = name_lower.combine_chunks()
+        self.names = name_lower
+        self.sorted_rows = pc.sort_indices(name_lower).to_numpy().astype(np.int32)
+        self._sorted_names = _SortedNames(name_lower.take(pa.array(self.sorted_rows)))
+
+        # One (trigram, row) pair per distinct trigram of each name
+        offsets, data = _string_buffers(name_lower)
+        codes = _trigram_codes(data[offsets[0]:offsets[-1]]) if offsets[-1] - offsets[0] >= 3 else np.empty(0, dtype=np.int32)
+        lengths = np.diff(offsets)
+        byte_rows = np.repeat(np.arange(len(name_lower), dtype=np.int32), lengths)
+        positions = np.arange(len(codes), dtype=np.int64)
+        valid = positions + 3 <= offsets[byte_rows[:len(codes)] + 1] - offsets[0]
+        pairs = np.unique((codes[valid].astype(np.int64) << 32) | byte_rows[:len(codes)][valid].astype(np.int64))
+        self.trigram_codes, starts = np.unique(pairs >> 32, return_index=True)
+        self.trigram_offsets = np.append(starts, len(pairs)).astype(np.int64)
+        self.trigram_rows = (pairs & 0xFFFFFFFF).astype(np.int32)
+
+    @classmethod
+    def from_arrays(cls, name_lower: pa.Array, arrays: Dict[str, np.ndarray]) -> "NameIndex":
+        """Rebuild an index from the names and the arrays listed in ARRAYS (e.g. memory-mapped from a snapshot)."""
+        index = cls.__new__(cls)
+        index.names = name_lower.combine_chunks() if isinstance(name_lower, pa.ChunkedArray) else name_lower
+        for name in cls.ARRAYS:
+            setattr(index, name, arrays[name])
+        index._sorted_names = _SortedNames(index.names.take(pa.array(index.sorted_rows)))
+        return index
+
+    def arrays(self) -> Dict[str, np.ndarray]:
+        return {name: getattr(self, name) for name in self.ARRAYS}
+
+    def _trigram_posting(self, code: int) -> np.ndarray:
+        position = np.searchsorted(self.trigram_codes, code)
+        if position == len(self.trigram_codes) or self.trigram_codes[position] != code:
+            return np.empty(0, dtype=np.int32)
+        return self.trigram_rows[self.trigram_offsets[position]:self.trigram_offsets[position + 1]]
+
+    def _query_postings(self, query: str) -> List[np.ndarray]:
+        query_bytes = np.frombuffer(query.encode("utf-8"), dtype=np.uint8)
+        if len(query_bytes) < 3:
+            return []
+        return [self._trigram_posting(int(code)) for code in np.unique(_trigram_codes(query_bytes))]
+
+    def _verified(self, rows: np.ndarray, query: str) -> np.ndarray:
+        if not len(rows):
+            return rows
+        matches = pc.match_substring(self.names.take(pa.array(rows)), query)
+        return rows[matches.to_numpy(zero_copy_only=False)]
+
+    def _infix_rows(self, query: str) -> np.ndarray:
+        postings = self._query_postings(query)
+        if not postings:
+            # Too short for trigrams: a vectorized scan is the cheapest exact answer
+            matches = pc.match_substring(self.names, query)
+            return np.flatnonzero(matches.to_numpy(zero_copy_only=False)).astype(np.int32)
+        postings.sort(key=len)
+        candidates = postings[0]
+        for posting in postings[1:]:
+            if len(candidates) < VERIFY_CANDIDATES_BELOW:
+                break
+            candidates = np.intersect1d(candidates, posting, assume_unique=True)
+        return self._verified(candidates, query)
+
+    def _fuzzy_rows(self, query: str, exclude: np.ndarray) -> np.ndarray:
+        postings = self._query_postings(query)
+        if len(query) < 4 or not postings:
+            return np.empty(0, dtype=np.int32)
+        max_distance = 1 if len(query) <= 6 else 2
+        # q-gram lemma: a match within k edits shares at least |trigrams| - 3k trigrams
+        min_shared = max(1, len(postings) - 3 * max_distance)
+        rows, shared = np.unique(np.concatenate(postings), return_counts=True)
+        keep = (shared >= min_shared) & ~np.isin(rows, exclude)
+        rows, shared = rows[keep], shared[keep]
+        rows = rows[np.argsort(-shared, kind="stable")][:FUZZY_MAX_CANDIDATES]
+        names = self.names.take(pa.array(rows)).to_pylist()
+        matched = [row for row, name in zip(rows, names) if substring_distance(query, name, max_distance) <= max_distance]
+        return np.sort(np.array(matched, dtype=np.int32))
+
+    def search(self, query: str, fuzzy: bool = False) -> np.ndarray:
+        """Return the rows whose name contains `query` (already lowercased), best matches first."""
+        if not query:
+            return np.arange(len(self.names), dtype=np.int32)
+        low = bisect.bisect_left(self._sorted_names, query)
+        exact_end = bisect.bisect_right(self._sorted_names, query, lo=low)
+        prefix_end = bisect.bisect_left(self._sorted_names, query + "\U0010ffff", lo=exact_end)
+        exact = np.sort(self.sorted_rows[low:exact_end])
+        prefix = np.sort(self.sorted_rows[exact_end:prefix_end])
+        infix = self._infix_rows(query)
+        infix = infix[~np.isin(infix, self.sorted_rows[low:prefix_end])]
+        ranked = [exact, prefix, infix]
+        if fuzzy:
+            ranked.append(self._fuzzy_rows(query, np.concatenate(ranked)))
+        return np.concatenate(ranked).astype(np.int32)
@@ -1,10 +1,38 @@
 import cv2  # type: ignore
 import numpy as np
 import io
+import os
 import json
 import re
+import time
+import tempfile
+import subprocess
+import unicodedata
+import threading
+import multiprocessing
+from itertools import islice
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor, TimeoutError as FutureTimeoutError
+from concurrent.futures.process import BrokenProcessPool
+from typing import NamedTuple
 from PIL import Image
-from app.utils.ocr_utils import ocr_model  # type: ignore  # Import OCR model
+from pdf2image import convert_from_path, pdfinfo_from_path # type: ignore
+from app.utils.ocr_utils import get_ocr_service, OCRDeadlineExceeded  # type: ignore  # OCR service
+from app.config import (OCR_PREPROCESS, OCR_IMAGE_SIZE, OCR_NOISE_THRESHOLD, OCR_CONTRAST_THRESHOLD, # type: ignore
+                        OCR_SKEW_THRESHOLD, OCR_PDF_DPI, OCR_PDF_MAX_PAGES, OCR_PDF_WORKERS, OCR_DEADLINE,
+                        OCR_PDF_TEXT_LAYER, OCR_PDF_MIN_TEXT_CHARS)
+
+SKEW_ESTIMATE_SIZE = 512  # Longest side (px) of the copy skew is estimated on
+MAX_SKEW = 15.0  # Largest skew (degrees) looked for
+MAX_SKEW_POINTS = 20000  # Ink pixels sampled for the skew estimate
+MAX_GARBLED_SHARE = 0.1  # Share of unreadable characters above which a PDF text layer is OCR'd instead
+PAGE_IMAGE_SHARE = 0.5  # Share of a PDF page an image must cover for the page to be OCR'd as a scan
+RESULT_ROW = re.compile(r"[^\W\d_]{2,}.*\d")  # A name followed by a number, e.g. "Hemoglobin 13.5 g/dL"
+
+_preprocess_counters = {"images": 0, "tiers": {}, "stage_seconds": {}, "pdf_pages": {"text_layer": 0, "ocr": 0}}
+_preprocess_lock = threading.Lock()
+_pdf_pool = None
+_pdf_pool_lock = threading.Lock()
 
 def safe_json_parse(text):
     """Safely extracts and parses JSON from a string."""
@@ -19,78 +47,425 @@ def safe_json_parse(text):
     except json.JSONDecodeError:
         return {"error": "Failed to parse JSON"}
 
-def preprocess_image(image_bytes):
-    """Preprocesses an image for better OCR accuracy."""
-    img = np.array(Image.open(io.BytesIO(image_bytes)).convert("L"))
+class ImageQuality(NamedTuple):
+    noise: float     # Estimated standard deviation of pixel noise (gray levels)
+    contrast: float  # Difference between the mean gray levels of paper and ink
+    skew: float      # Estimated text rotation in degrees
 
-    # Preserve aspect ratio while resizing
-    h, w = img.shape
-    scale_factor = 1024 / max(h, w)
-    new_size = (int(w * scale_factor), int(h * scale_factor))
-    img = cv2.resize(img, new_size, interpolation=cv2.INTER_AREA)
 
-    # Denoising
-    img = cv2.fastNlMeansDenoising(img, h=20)
+def _downscale(img, size):
+    h, w = img.shape
+    if max(h, w) <= size:
+        return img
+    scale = size / max(h, w)
+    return cv2.resize(img, (max(1, int(w * scale)), max(1, int(h * scale))), interpolation=cv2.INTER_AREA)
 
-    # CLAHE (Contrast Limited Adaptive Histogram Equalization)
-    clahe = cv2.createCLAHE(clipLimit=3.0, tileGridSize=(8, 8))
-    img = clahe.apply(img)
 
-    # Gaussian Blur
-    img = cv2.GaussianBlur(img, (5, 5), 0)
+def estimate_noise(img):
+    """
+    Noise standard deviation of a grayscale image (Immerkaer's Laplacian-difference
+    estimate). The median keeps text edges, a minority of pixels, from counting as noise.
+    """
+    kernel = np.array([[1, -2, 1], [-2, 4, -2], [1, -2, 1]], dtype=np.float32)
+    response = cv2.filter2D(img.astype(np.float32), -1, kernel)
+    # The kernel turns noise of std s into a response of std 6s; median(|x|) = 0.6745 std
+    return float(np.median(np.abs(response[1:-1, 1:-1]))) / (6 * 0.6745)
 
-    # Adaptive Thresholding
-    img = cv2.adaptiveThreshold(img, 255, cv2.ADAPTIVE_THRESH_GAUSSIAN_C,
-                                cv2.THRESH_BINARY, 15, 3)
 
-    # Deskewing
-    img = deskew_image(img)
+def estimate_skew(img):
+    """
+    Rotation in degrees that straightens the text, estimated on a copy downscaled to
+    SKEW_ESTIMATE_SIZE px: the angle at which the ink's row profile is sharpest (text
+    rows and the gaps between them line up), searched in 1 and then 0.1 degree steps.
+    """
+    small = _downscale(img, SKEW_ESTIMATE_SIZE)
+    # A local threshold, so shadows and uneven lighting don't count as ink
+    ink = cv2.adaptiveThreshold(small, 1, cv2.ADAPTIVE_THRESH_MEAN_C, cv2.THRESH_BINARY_INV, 15, 15)
+    ys, xs = np.nonzero(ink)
+    if len(ys) < 0.001 * ink.size:
+        return 0.0
+    if len(ys) > MAX_SKEW_POINTS:
+        keep = np.random.default_rng(0).choice(len(ys), MAX_SKEW_POINTS, replace=False)
+        ys, xs = ys[keep], xs[keep]
+    h, w = ink.shape
+    xs, ys = xs - w / 2.0, ys - h / 2.0
+    offset = int(np.hypot(h, w) / 2) + 1
 
-    # Morphological Transformations
-    kernel = np.ones((1, 1), np.uint8)
-    img = cv2.morphologyEx(img, cv2.MORPH_CLOSE, kernel)
+    def sharpness(angle):
+        # Row profile of the ink after rotating by `angle` (same convention as cv2.getRotationMatrix2D);
+        # with a fixed ink total, the sum of squared row counts grows as rows get sharper
+        theta = np.radians(angle)
+        rows = np.rint(ys * np.cos(theta) - xs * np.sin(theta)).astype(np.int64) + offset
+        counts = np.bincount(rows, minlength=2 * offset + 1).astype(np.float64)
+        return float(np.dot(counts, counts))
 
-    # Sharpening
-    kernel_sharpening = np.array([[-1, -1, -1], 
-                                  [-1,  9, -1],
-                                  [-1, -1, -1]])
-    img = cv2.filter2D(img, -1, kernel_sharpening)
+    coarse = max(np.arange(-MAX_SKEW, MAX_SKEW + 0.5, 1.0), key=sharpness)
+    best = max(np.arange(max(-MAX_SKEW, coarse - 1.0), min(MAX_SKEW, coarse + 1.0) + 0.05, 0.1), key=sharpness)
+    # Keep the image as it is unless rotating is clearly better
+    return round(float(best), 1) if sharpness(best) > 1.02 * sharpness(0.0) else 0.0
 
-    _, processed_bytes = cv2.imencode(".png", img)
-    return processed_bytes.tobytes()
 
-def deskew_image(img):
-    """Corrects the skew of an image using Hough Line Transform."""
-    edges = cv2.Canny(img, 50, 150, apertureSize=3)
-    lines = cv2.HoughLines(edges, 1, np.pi / 180, 200)
+def measure_image(img):
+    """Cheap quality measurements that decide which preprocessing stages an image needs."""
+    small = _downscale(img, SKEW_ESTIMATE_SIZE)
+    threshold, _ = cv2.threshold(small, 0, 255, cv2.THRESH_BINARY + cv2.THRESH_OTSU)
+    ink, paper = small[small <= threshold], small[small > threshold]
+    contrast = float(paper.mean() - ink.mean()) if ink.size and paper.size else 0.0
+    return ImageQuality(noise=estimate_noise(img), contrast=contrast, skew=estimate_skew(small))
 
-    angle = 0
-    if lines is not None:
-        angles = []
-        for rho, theta in lines[:, 0]:
-            angle_deg = np.degrees(theta) - 90
-            angles.append(angle_deg)
-        angle = np.median(angles)
 
+def rotate_image(img, angle):
     (h, w) = img.shape[:2]
     M = cv2.getRotationMatrix2D((w // 2, h // 2), angle, 1.0)
-    img = cv2.warpAffine(img, M, (w, h), flags=cv2.INTER_CUBIC, borderMode=cv2.BORDER_REPLICATE)
+    return cv2.warpAffine(img, M, (w, h), flags=cv2.INTER_CUBIC, borderMode=cv2.BORDER_REPLICATE)
+
+
+def _record_preprocess(tier, timings):
+    with _preprocess_lock:
+        _preprocess_counters["images"] += 1
+        _preprocess_counters["tiers"][tier] = _preprocess_counters["tiers"].get(tier, 0) + 1
+        for stage, seconds in timings.items():
+            _preprocess_counters["stage_seconds"][stage] = _preprocess_counters["stage_seconds"].get(stage, 0.0) + seconds
+
+
+def load_gray(image, max_side=OCR_IMAGE_SIZE):
+    """
+    Grayscale array of an image, scaled so its longest side is `max_side` px.
+
+    `image` is the encoded bytes of an upload, a PIL image (e.g. a rendered PDF page) or
+    an array. JPEGs are decoded at reduced size (libjpeg's DCT scaling, up to 1/8), since
+    the pixels the resize would drop never need decoding.
+    """
+    if isinstance(image, np.ndarray):
+        gray = image if image.ndim == 2 else cv2.cvtColor(image, cv2.COLOR_RGB2GRAY)
+    else:
+        if isinstance(image, (bytes, bytearray)):
+            image = Image.open(io.BytesIO(image))
+            if image.format == "JPEG":
+                image.draft("L", (max_side, max_side))
+        gray = np.asarray(image if image.mode == "L" else image.convert("L"))
+
+    # Preserve aspect ratio while resizing
+    h, w = gray.shape
+    scale_factor = max_side / max(h, w)
+    new_size = (int(w * scale_factor), int(h * scale_factor))
+    return cv2.resize(gray, new_size, interpolation=cv2.INTER_AREA)
+
+
+def preprocess_image(image):
+    """
+    Preprocesses an image for better OCR accuracy; returns a grayscale array for paddleocr_ocr.
+
+    `image` is the encoded bytes of an upload, a PIL image or an array (see load_gray).
+    See _preprocess for the stages.
+    """
+    img, tier, timings = _preprocess(image)
+    _record_preprocess(tier, timings)
     return img
 
-def paddleocr_ocr(image_bytes):
-    """Runs OCR using PaddleOCR and extracts text."""
-    image = Image.open(io.BytesIO(image_bytes)).convert("RGB")
-    img_np = np.array(image)
-    
+
+def _preprocess(image):
+    """
+    Preprocess an image; returns the grayscale array, its tier and the seconds spent per stage.
+
+    `image` is the encoded bytes of an upload, a PIL image or an array (see load_gray).
+
+    With OCR_PREPROCESS=adaptive (the default) the image is measured first (see
+    measure_image) and only the stages it needs are run:
+    - "clean": grayscale and resize only. PaddleOCR's models read clean, evenly or
+      unevenly lit, and mildly noisy pages best as they are.
+    - "enhanced": adds CLAHE for faded pages and/or rotation for skewed ones.
+    - "heavy": adds denoising for very noisy images.
+    OCR_PREPROCESS=full always runs the full chain of denoising, CLAHE, blur, adaptive
+    thresholding, deskewing and sharpening.
+    """
+    timings = {}
+    started = time.perf_counter()
+    img = load_gray(image)
+    timings["decode_resize"], started = time.perf_counter() - started, time.perf_counter()
+
+    full = OCR_PREPROCESS == "full"
+    quality = measure_image(img)
+    timings["measure"], started = time.perf_counter() - started, time.perf_counter()
+
+    denoise = full or quality.noise > OCR_NOISE_THRESHOLD
+    if denoise:
+        # Denoising
+        img = cv2.fastNlMeansDenoising(img, h=20)
+        timings["denoise"], started = time.perf_counter() - started, time.perf_counter()
+
+    if full or quality.contrast < OCR_CONTRAST_THRESHOLD:
+        # CLAHE (Contrast Limited Adaptive Histogram Equalization)
+        clahe = cv2.createCLAHE(clipLimit=3.0, tileGridSize=(8, 8))
+        img = clahe.apply(img)
+        timings["contrast"], started = time.perf_counter() - started, time.perf_counter()
+
+    if full:
+        # Gaussian Blur, then adaptive thresholding
+        img = cv2.GaussianBlur(img, (5, 5), 0)
+        img = cv2.adaptiveThreshold(img, 255, cv2.ADAPTIVE_THRESH_GAUSSIAN_C,
+                                    cv2.THRESH_BINARY, 15, 3)
+        timings["binarize"], started = time.perf_counter() - started, time.perf_counter()
+
+    if abs(quality.skew) > OCR_SKEW_THRESHOLD:
+        img = rotate_image(img, quality.skew)
+        timings["deskew"], started = time.perf_counter() - started, time.perf_counter()
+
+    if full:
+        # Sharpening
+        kernel_sharpening = np.array([[-1, -1, -1],
+                                      [-1,  9, -1],
+                                      [-1, -1, -1]])
+        img = cv2.filter2D(img, -1, kernel_sharpening)
+        timings["sharpen"], started = time.perf_counter() - started, time.perf_counter()
+
+    if full:
+        tier = "full"
+    else:
+        tier = "heavy" if denoise else ("enhanced" if len(timings) > 2 else "clean")
+    print(f"Preprocessed image: tier={tier} noise={quality.noise:.1f} contrast={quality.contrast:.0f} "
+          f"skew={quality.skew:.1f} " + " ".join(f"{stage}={seconds * 1000:.1f}ms" for stage, seconds in timings.items()))
+    return img, tier, timings
+
+
+def preprocess_stats():
+    """Images preprocessed per tier and the seconds spent in each stage, for monitoring."""
+    with _preprocess_lock:
+        return {
+            "images": _preprocess_counters["images"],
+            "tiers": dict(_preprocess_counters["tiers"]),
+            "stage_seconds": {stage: round(seconds, 3) for stage, seconds in _preprocess_counters["stage_seconds"].items()},
+            "pdf_pages": dict(_preprocess_counters["pdf_pages"]),
+        }
+
+def group_rows(boxes):
+    """
+    Groups PaddleOCR boxes into the visual rows of the page.
+
+    PaddleOCR returns one box per text fragment, so a table row such as
+    "Hemoglobin | 13.5 | g/dL | 12-16" comes back as four boxes. Boxes whose vertical
+    centers lie within half a line height of a row's center join that row; each row
+    is returned as its text fragments joined left to right.
+    """
+    items = []
+    for text_info in boxes or []:
+        if len(text_info) < 2:
+            continue
+        points, (text, _) = text_info[0], text_info[1]
+        ys = [point[1] for point in points]
+        items.append(((min(ys) + max(ys)) / 2, max(ys) - min(ys), min(point[0] for point in points), text))
+    items.sort()
+
+    rows = []  # [center_y, height, [(x, text), ...]]
+    for center, height, x, text in items:
+        if rows and abs(center - rows[-1][0]) <= max(height, rows[-1][1]) / 2:
+            row = rows[-1]
+            count = len(row[2])
+            row[0] = (row[0] * count + center) / (count + 1)
+            row[1] = max(row[1], height)
+            row[2].append((x, text))
+        else:
+            rows.append([center, height, [(x, text)]])
+    return [" ".join(text for _, text in sorted(row[2])) for row in rows]
+
+def _ocr_input(image):
+    """The BGR array PaddleOCR takes, from an image array (or encoded image bytes)."""
+    if isinstance(image, (bytes, bytearray)):
+        return np.asarray(Image.open(io.BytesIO(image)).convert("RGB"))
+    if image.ndim == 2:
+        return cv2.cvtColor(image, cv2.COLOR_GRAY2BGR)
+    return image
+
+def _page_text(future, deadline):
+    """Waits for a page submitted to the OCR service and returns its text, one line per row of the page."""
     try:
-        result = ocr_model.ocr(img_np, cls=True)
-        extracted_text = " ".join(
-            text_info[1][0] for line in result for text_info in line if len(text_info) >= 2
-        )
-        return extracted_text.strip()
+        result = get_ocr_service().result(future, deadline)
+    except OCRDeadlineExceeded:
+        raise
     except Exception as e:
         print(f"PaddleOCR Error: {e}")
         return ""
+    return "\n".join(group_rows(result)).strip()
+
+def paddleocr_ocr(image, deadline=None):
+    """
+    Runs OCR using PaddleOCR on an image array (or encoded image bytes) and extracts text, one line per row of the page.
+
+    The page is OCR'd by the OCR service (see app.utils.ocr_utils). Raises
+    OCRDeadlineExceeded if that doesn't finish by `deadline` (a `time.monotonic()`
+    time, by default OCR_DEADLINE seconds from now).
+    """
+    deadline = deadline if deadline is not None else time.monotonic() + OCR_DEADLINE
+    return _page_text(get_ocr_service().submit(_ocr_input(image), deadline), deadline)
+
+def _render_pdf_page(pdf_path, page_number):
+    """Rasterize and preprocess one PDF page. Runs in a worker process of the PDF pool."""
+    pages = convert_from_path(pdf_path, dpi=OCR_PDF_DPI, first_page=page_number, last_page=page_number, grayscale=True)
+    if not pages:
+        return None, None, {}
+    return _preprocess(pages[0])
+
+
+def get_pdf_pool():
+    """The process pool PDF pages are rasterized and preprocessed in, created on first use."""
+    global _pdf_pool
+    if _pdf_pool is None:
+        with _pdf_pool_lock:
+            if _pdf_pool is None:
+                # Spawned rather than forked: the server's threads (and their locks) must not be copied into workers
+                _pdf_pool = ProcessPoolExecutor(max_workers=OCR_PDF_WORKERS, mp_context=multiprocessing.get_context("spawn"))
+    return _pdf_pool
+
+
+def pdf_text_layer(pdf_path, page_count):
+    """
+    The embedded text of the first `page_count` pages of a PDF, or None if it can't be read.
+
+    Uses poppler's pdftotext, which pdf2image needs anyway. With -layout each printed
+    row (e.g. "Hemoglobin   13.5   g/dL   12.0 - 16.0") stays on one line, in reading
+    order; runs of spaces are then collapsed, as in the rows OCR returns.
+    """
+    try:
+        output = subprocess.run(["pdftotext", "-layout", "-enc", "UTF-8", "-l", str(page_count), pdf_path, "-"],
+                                capture_output=True, check=True, timeout=OCR_DEADLINE).stdout
+    except (OSError, subprocess.SubprocessError) as e:
+        print(f"PDF text layer could not be read: {e}")
+        return None
+    pages = output.decode("utf-8", errors="replace").split("\f")[:page_count]
+    pages += [""] * (page_count - len(pages))
+    return ["\n".join(line for line in (" ".join(line.split()) for line in page.splitlines()) if line) for page in pages]
+
+def pdf_page_images(pdf_path, page_count, page_size):
+    """
+    Which of the first `page_count` pages of a PDF have an image covering at least
+    PAGE_IMAGE_SHARE of the page, or None if the images can't be listed.
+
+    Such a page is a scan, even when it carries a text layer (a scanner's own OCR, or a
+    stamp or footer added later). Uses poppler's pdfimages -list, which gives each
+    image's size in pixels and its resolution; `page_size` is (width, height) in points.
+    """
+    try:
+        output = subprocess.run(["pdfimages", "-list", "-l", str(page_count), pdf_path],
+                                capture_output=True, check=True, timeout=OCR_DEADLINE).stdout
+    except (OSError, subprocess.SubprocessError) as e:
+        print(f"PDF images could not be listed: {e}")
+        return None
+    page_area = page_size[0] * page_size[1] / 72 ** 2  # Square inches
+    pages = set()
+    # Columns: page num type width height color comp bpc enc interp object ID x-ppi y-ppi size ratio
+    for line in output.decode("utf-8", errors="replace").splitlines()[2:]:
+        fields = line.split()
+        try:
+            page, kind, width, height, x_ppi, y_ppi = (int(fields[0]), fields[2], int(fields[3]), int(fields[4]),
+                                                       float(fields[12]), float(fields[13]))
+        except (IndexError, ValueError):
+            continue
+        if kind == "image" and x_ppi > 0 and y_ppi > 0 and width / x_ppi * height / y_ppi >= page_area * PAGE_IMAGE_SHARE:
+            pages.add(page)
+    return pages
+
+def text_layer_problem(text, page_image=False):
+    """Why a page's text layer can't be used in place of OCR, or None if it can. `page_image`: the page is a scanned image (see pdf_page_images)."""
+    chars = "".join(text.split())
+    if not chars:
+        return "no text layer"
+    if page_image:
+        return "the page is a scanned image"
+    if len(chars) < OCR_PDF_MIN_TEXT_CHARS:
+        return f"only {len(chars)} characters of text"
+    # Fonts without a Unicode mapping come out as control, private-use or replacement characters
+    garbled = sum(char == "\ufffd" or unicodedata.category(char) in ("Cc", "Co", "Cn") for char in chars)
+    if garbled > len(chars) * MAX_GARBLED_SHARE:
+        return f"{garbled / len(chars):.0%} of the text is unreadable"
+    # A cover letter or a page of notes over a scanned table has text, but no results in it
+    if not any(RESULT_ROW.search(line) for line in text.splitlines()):
+        return "no rows with a name and a number"
+    return None
+
+def extract_text_from_pdf(file_bytes):
+    """
+    Text of each page of a PDF, in page order.
+
+    Pages of digitally generated PDFs are read from their text layer (see
+    pdf_text_layer). Pages without usable text (scans, including scans with a text
+    layer, or text that can't be decoded or has no results, see text_layer_problem)
+    are rasterized one at a time at OCR_PDF_DPI and preprocessed in parallel in the PDF
+    process pool, with at most one page per worker (OCR_PDF_WORKERS) submitted at a
+    time, so only the pages being worked on are held in memory. Each is handed to the
+    OCR service as soon as it is ready. The choice made for each page is printed. Pages
+    after the first OCR_PDF_MAX_PAGES are skipped. Raises OCRDeadlineExceeded if the
+    pages aren't rendered and OCR'd within OCR_DEADLINE seconds.
+    """
+    global _pdf_pool
+    deadline = time.monotonic() + OCR_DEADLINE
+    texts, pages = {}, {}
+    # A file in a temporary directory rather than a NamedTemporaryFile, which poppler
+    # can't open on Windows while it is still open here. A worker still rendering after the
+    # deadline may hold the file open, so cleanup errors are ignored
+    with tempfile.TemporaryDirectory(prefix="medimate-pdf-", ignore_cleanup_errors=True) as pdf_dir:
+        pdf_path = os.path.join(pdf_dir, "upload.pdf")
+        with open(pdf_path, "wb") as pdf_file:
+            pdf_file.write(file_bytes)
+        info = pdfinfo_from_path(pdf_path)
+        page_count = info["Pages"]
+        if page_count > OCR_PDF_MAX_PAGES:
+            print(f"PDF has {page_count} pages; only the first {OCR_PDF_MAX_PAGES} are read")
+        page_numbers = range(1, min(page_count, OCR_PDF_MAX_PAGES) + 1)
+
+        text_layer = pdf_text_layer(pdf_path, len(page_numbers)) if OCR_PDF_TEXT_LAYER else None
+        page_images = set()
+        page_size = re.match(r"([\d.]+) x ([\d.]+)", info.get("Page size", ""))
+        if text_layer is not None and any(text_layer) and page_size:
+            page_images = pdf_page_images(pdf_path, len(page_numbers), tuple(map(float, page_size.groups()))) or set()
+        ocr_page_numbers = []
+        for page_number in page_numbers:
+            if text_layer is None:
+                problem = "text layer not read"
+            else:
+                problem = text_layer_problem(text_layer[page_number - 1], page_number in page_images)
+            if problem is None:
+                texts[page_number] = text_layer[page_number - 1]
+                print(f"PDF page {page_number}: using its text layer ({len(texts[page_number])} characters)")
+            else:
+                ocr_page_numbers.append(page_number)
+                if OCR_PDF_TEXT_LAYER:
+                    print(f"PDF page {page_number}: OCR ({problem})")
+        with _preprocess_lock:
+            _preprocess_counters["pdf_pages"]["text_layer"] += len(texts)
+            _preprocess_counters["pdf_pages"]["ocr"] += len(ocr_page_numbers)
+
+        if ocr_page_numbers:
+            pool = get_pdf_pool()
+            queued = iter(ocr_page_numbers)
+            # Pages being rendered, in page order; at most one per worker, so rendered pages
+            # don't pile up in memory ahead of the OCR queue
+            window = deque((page_number, pool.submit(_render_pdf_page, pdf_path, page_number))
+                           for page_number in islice(queued, max(1, OCR_PDF_WORKERS)))
+            try:
+                while window:
+                    page_number, future = window.popleft()
+                    try:
+                        img, tier, timings = future.result(timeout=max(0.0, deadline - time.monotonic()))
+                    except FutureTimeoutError:
+                        for _, pending in window:
+                            pending.cancel()
+                        raise OCRDeadlineExceeded("PDF pages were not rendered before the request deadline") from None
+                    next_page = next(queued, None)
+                    if next_page is not None:
+                        window.append((next_page, pool.submit(_render_pdf_page, pdf_path, next_page)))
+                    if img is None:
+                        continue
+                    _record_preprocess(tier, timings)
+                    pages[page_number] = get_ocr_service().submit(_ocr_input(img), deadline)
+            except BrokenProcessPool:
+                # A worker died (e.g. killed for memory); start a fresh pool for the next request
+                with _pdf_pool_lock:
+                    _pdf_pool = None
+                raise
+
+    for page_number, page in pages.items():
+        texts[page_number] = _page_text(page, deadline)
+    return [texts.get(page_number, "") for page_number in page_numbers]
 
 def extract_text_from_image(file_bytes):
     """Processes an image and extracts text using OCR."""
@@ -0,0 +1,117 @@
+"""
+Catalog of common lab tests, loaded once from data/lab_tests.json.
+
+Every test has a canonical key, display name, category, unit and default adult
+reference range, plus the aliases reports print it under ("HGB", "Hb",
+"Haemoglobin", ...). All aliases are normalized into one dict when the module is
+imported, so looking up a result's name is a handful of dict lookups rather than a
+scan over keywords.
+"""
+import os
+import re
+import json
+from functools import lru_cache
+from typing import Dict, NamedTuple, Optional
+from app.models.medical_models import MedicalTestResult, NormalRange # type: ignore
+
+CATALOG_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "data", "lab_tests.json")
+NUMBER = re.compile(r"^-?\d+(?:\.\d+)?$")
+# Words that qualify a test name without changing the test ("Serum Creatinine", "Platelet Count")
+QUALIFIERS = {"serum", "plasma", "blood", "whole", "count", "level", "levels", "s"}
+# Specimens other than blood. The catalog's ranges are for blood, so "Glucose (Urine)" or
+# "Calcium 24h Urine" is only found by an alias that names the specimen, never by dropping words
+SPECIMENS = {
+    "urine", "urinary", "csf", "fluid", "stool", "faecal", "fecal", "sputum", "saliva", "sweat", "spinal",
+    "pleural", "ascitic", "peritoneal", "synovial", "amniotic", "24h", "24hr", "24hrs", "timed",
+}
+
+
+class LabTest(NamedTuple):
+    key: str
+    name: str
+    category: str
+    unit: Optional[str]
+    min: Optional[float]
+    max: Optional[float]
+
+
+def normalize_name(name: Optional[str]) -> str:
+    """Lowercased test name without punctuation and extra spaces."""
+    name = re.sub(r"[^\w%]+", " ", (name or "").lower()).replace("%", "").replace("_", " ")
+    return re.sub(r"\s+", " ", name).strip()
+
+
+def _unit_key(unit: str) -> str:
+    unit = unit.lower().replace(" ", "").replace("µ", "u").replace("μ", "u").replace("³", "^3").replace("*", "^")
+    unit = re.sub(r"^x(?=10)", "", unit)
+    return re.sub(r"^10e(\d+)", r"10^\1", unit)
+
+
+with open(CATALOG_PATH, encoding="utf-8") as f:
+    _catalog = json.load(f)
+
+TESTS: Dict[str, LabTest] = {
+    key: LabTest(key, test["name"], test["category"], test["unit"], test["range"]["min"], test["range"]["max"])
+    for key, test in _catalog["tests"].items()
+}
+# Normalized name or alias -> test
+ALIAS_INDEX: Dict[str, LabTest] = {}
+for key, test in _catalog["tests"].items():
+    for alias in [key, test["name"], *test["aliases"]]:
+        ALIAS_INDEX.setdefault(normalize_name(alias), TESTS[key])
+UNITS: Dict[str, str] = {_unit_key(unit): canonical for unit, canonical in _catalog["units"].items()}
+# Single words that place an unknown test in a category ("Bilirubin Indirect" -> Liver Function)
+CATEGORY_WORDS: Dict[str, str] = dict(_catalog["keywords"])
+for alias, test in ALIAS_INDEX.items():
+    if " " not in alias and len(alias) >= 3:
+        CATEGORY_WORDS.setdefault(alias, test.category)
+
+
+@lru_cache(maxsize=4096)
+def lookup_test(name: Optional[str]) -> Optional[LabTest]:
+    """The catalog entry for a test name as printed on a report, or None if it isn't in the catalog."""
+    normalized = normalize_name(name)
+    test = ALIAS_INDEX.get(normalized)
+    if test is not None or not normalized or SPECIMENS.intersection(normalized.split()):
+        return test
+    # "ALT (SGPT)": try the name outside and inside the parentheses
+    for part in re.split(r"[()\[\]]", name or ""):
+        test = ALIAS_INDEX.get(normalize_name(part))
+        if test is not None:
+            return test
+    words = [word for word in normalized.split() if word not in QUALIFIERS]
+    return ALIAS_INDEX.get(" ".join(words))
+
+
+def canonical_unit(unit: Optional[str]) -> Optional[str]:
+    """The catalog's spelling of a unit ("mg/dl" -> "mg/dL", "x10^9/L" -> "10^3/uL"), or the unit unchanged."""
+    if not unit:
+        return unit
+    return UNITS.get(_unit_key(unit), unit)
+
+
+def infer_category(test_name: str) -> str:
+    test = lookup_test(test_name)
+    if test is not None:
+        return test.category
+    for word in normalize_name(test_name).split():
+        if word in CATEGORY_WORDS:
+            return CATEGORY_WORDS[word]
+    return "General Test"
+
+
+def complete_from_catalog(result: MedicalTestResult) -> MedicalTestResult:
+    """
+    Normalize the unit spelling and numeric values sent as text and, when the report
+    gave no normal range, use the catalog's default range if the result is in the
+    catalog's unit.
+    """
+    result.unit = canonical_unit(result.unit)
+    if isinstance(result.value, str) and NUMBER.match(result.value.strip()):
+        result.value = float(result.value.strip())
+    test = lookup_test(result.name)
+    if test is None or result.normalRange.min is not None or result.normalRange.max is not None:
+        return result
+    if result.unit and result.unit == test.unit:
+        result.normalRange = NormalRange(min=test.min, max=test.max)
+    return result
@@ -0,0 +1,128 @@
+"""
+Reuse of lab result interpretations across reports.
+
+An interpretation depends on what was measured and where the value falls relative
+to its normal range, not on the exact value. Results are therefore keyed by
+(canonical test name, category, band, unit), where the band is one of very_low,
+low, normal, high or very_high, and the canonical name is the test's key in the lab
+catalog (see lab_catalog). Common analytes are answered from the templates
+in data/lab_interpretation_templates.json; the others are cached after the AI
+has interpreted them once. Templates are only used for results in the catalog's
+unit with a real reference range, since their wording assumes both.
+"""
+import os
+import re
+import json
+import threading
+from typing import Dict, Optional
+from app.models.medical_models import MedicalTestResult # type: ignore
+from app.utils.cache_utils import TwoTierCache # type: ignore
+from app.ocr.lab_catalog import lookup_test, normalize_name, canonical_unit # type: ignore
+from app.config import (CACHE_DIR, LAB_INTERPRETATION_CACHE_SIZE, LAB_INTERPRETATION_CACHE_TTL, # type: ignore
+                        LAB_INTERPRETATION_TEMPLATES)
+
+TEMPLATES_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "data", "lab_interpretation_templates.json")
+NUMBER = re.compile(r"-?\d+(?:\.\d+)?")
+
+with open(TEMPLATES_PATH, encoding="utf-8") as f:
+    TEMPLATES: Dict[str, Dict[str, str]] = json.load(f)["templates"]
+
+interpretation_cache = TwoTierCache(
+    "lab_interpretations",
+    os.path.join(CACHE_DIR, "lab_interpretations.sqlite3"),
+    max_entries=LAB_INTERPRETATION_CACHE_SIZE,
+    ttl=LAB_INTERPRETATION_CACHE_TTL,
+)
+_counters = {"template_hits": 0, "cache_hits": 0, "misses": 0, "uncacheable": 0}
+_counters_lock = threading.Lock()
+
+
+def _count(counter: str) -> None:
+    with _counters_lock:
+        _counters[counter] += 1
+
+
+def _number(value) -> Optional[float]:
+    if isinstance(value, (int, float)):
+        return float(value)
+    match = NUMBER.search(str(value)) if value is not None else None
+    return float(match.group()) if match else None
+
+
+def canonical_test_name(name: Optional[str]) -> str:
+    """The test's catalog key, or its normalized name if it isn't in the catalog."""
+    test = lookup_test(name)
+    return test.key if test is not None else normalize_name(name)
+
+
+def normalize_unit(unit: Optional[str]) -> str:
+    return (canonical_unit(unit) or "").lower()
+
+
+def result_band(test_result: MedicalTestResult) -> Optional[str]:
+    """Where the value falls relative to the normal range, or None if that can't be told."""
+    value = _number(test_result.value)
+    low, high = _number(test_result.normalRange.min), _number(test_result.normalRange.max)
+    if value is None or (low is None and high is None):
+        return None
+    # "very" means more than one range-width outside the range (or twice/half a one-sided limit)
+    if low is not None and value < low:
+        width = (high - low) if high is not None else low / 2
+        return "very_low" if value < low - width else "low"
+    if high is not None and value > high:
+        width = (high - low) if low is not None else high
+        return "very_high" if value > high + width else "high"
+    return "normal"
+
+
+def interpretation_key(test_result: MedicalTestResult) -> Optional[str]:
+    band = result_band(test_result)
+    name = canonical_test_name(test_result.name)
+    if band is None or not name:
+        return None
+    return f"{name}|{test_result.category or ''}|{band}|{normalize_unit(test_result.unit)}"
+
+
+def template_applies(test_result: MedicalTestResult) -> bool:
+    """
+    Whether the catalog templates can describe this result: it must be in the catalog's
+    unit, and its range must not be the 0-100 placeholder given to percentage tests
+    without a printed range (every percentage would read as "normal" against it).
+    """
+    test = lookup_test(test_result.name)
+    if test is None or (canonical_unit(test_result.unit) or None) != test.unit:
+        return False
+    low, high = _number(test_result.normalRange.min), _number(test_result.normalRange.max)
+    return (low, high) != (0.0, 100.0) or (test.min, test.max) == (0.0, 100.0)
+
+
+def lookup_interpretation(test_result: MedicalTestResult) -> Optional[str]:
+    """A template or previously generated interpretation for this result, or None."""
+    band = result_band(test_result)
+    if band is None:
+        _count("uncacheable")
+        return None
+    if LAB_INTERPRETATION_TEMPLATES and template_applies(test_result):
+        template = TEMPLATES.get(canonical_test_name(test_result.name), {}).get(band)
+        if template:
+            _count("template_hits")
+            return template.format(name=test_result.name)
+    cached = interpretation_cache.get(interpretation_key(test_result))
+    _count("cache_hits" if cached is not None else "misses")
+    return cached
+
+
+def remember_interpretation(test_result: MedicalTestResult, interpretation: str) -> None:
+    key = interpretation_key(test_result)
+    if key is not None:
+        interpretation_cache.set(key, interpretation)
+
+
+def interpretation_stats() -> Dict:
+    """Where interpretations came from: templates, the cache, or the AI (misses)."""
+    with _counters_lock:
+        stats = dict(_counters)
+    lookups = stats["template_hits"] + stats["cache_hits"] + stats["misses"] + stats["uncacheable"]
+    stats["hit_rate"] = round((stats["template_hits"] + stats["cache_hits"]) / lookups, 4) if lookups else 0.0
+    stats["cache"] = interpretation_cache.stats()
+    return stats
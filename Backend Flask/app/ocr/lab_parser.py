@@ -0,0 +1,176 @@
+"""
+Rule-based parser for printed lab reports.
+
+Most lab reports print one test per row as "Name Value [Flag] Unit Range", e.g.
+"Hemoglobin 13.5 g/dL 12.0 - 16.0" or "WBC 11.2 H 10^3/uL (4-10)". Lines in that
+layout are parsed here with regular expressions, so the AI is only asked about the
+lines the parser can't read (qualitative results, merged columns, ...) or about the
+whole report when too little of it could be read.
+
+Each parsed line gets a confidence (higher with a range, a unit and a test name
+found in the lab catalog). Lines below LAB_PARSER_MIN_LINE_CONFIDENCE are treated
+as unparsed: a number after a few words without a range, unit or known test name
+is as likely a header ("Room 204", "Mr John Smith 45 Y M") as a result. The
+report's confidence is the sum over parsed lines divided by the number of lines
+that look like results, parsed or not.
+"""
+import re
+import threading
+from typing import Dict, List, NamedTuple, Optional
+from app.models.medical_models import MedicalTestResult, NormalRange # type: ignore
+from app.ocr.lab_catalog import lookup_test # type: ignore
+from app.config import LAB_PARSER_MIN_LINE_CONFIDENCE # type: ignore
+
+NUMBER = r"\d+(?:\.\d+)?"
+# Result value, optionally with thousands separators and a flag glued on ("13.5H", "150,000")
+VALUE = re.compile(r"^(\d{1,3}(?:,\d{3})+(?:\.\d+)?|\d+(?:\.\d+)?)(H|L|HH|LL|\*)?$")
+RANGE = re.compile(rf"(?<![\w.^/])\(?\s*({NUMBER})\s*-\s*({NUMBER})\s*\)?(?![\w.^/])")
+COMPARATOR_RANGE = re.compile(rf"(?<![\w.^/])\(?\s*(<=?|>=?)\s*({NUMBER})\s*\)?(?![\w.^/])")
+UNIT = re.compile(r"^(?=.*[A-Za-z%/µμ])[A-Za-z%/µμ^*×.0-9]+$")
+FLAGS = {"h", "l", "hh", "ll", "high", "low", "*", "abnormal", "normal", "n", "a"}
+QUALITATIVE = re.compile(r"\b(negative|positive|nil|trace|reactive|non-reactive|present|absent|detected|not detected)\b", re.I)
+# Labels of report metadata that carry numbers but aren't results
+NON_TEST_WORDS = {
+    "age", "sex", "gender", "date", "time", "dob", "patient", "name", "id", "mrn", "uhid", "no", "ref", "referred",
+    "doctor", "dr", "physician", "consultant", "phone", "tel", "mobile", "page", "sample", "specimen", "collected",
+    "received", "reported", "printed", "registered", "registration", "lab", "report", "bill", "invoice", "visit",
+    "address", "hospital", "accession", "barcode", "test", "result", "units", "unit", "reference", "range",
+    "mr", "mrs", "ms", "miss", "master", "baby", "bed", "room", "ward", "floor", "opd", "ipd",
+}
+
+_counters = {"reports": 0, "parsed_reports": 0, "partial_reports": 0, "fallback_reports": 0,
+             "lines_parsed": 0, "lines_unparsed": 0}
+_counters_lock = threading.Lock()
+
+
+class ParsedReport(NamedTuple):
+    results: List[MedicalTestResult]
+    unparsed_lines: List[str]  # Lines that look like results but couldn't be parsed
+    confidence: float
+
+
+def parse_normal_range(normal_range_str):
+    normal_range = NormalRange()
+    if normal_range_str:
+        if isinstance(normal_range_str, dict):
+            normal_range.min = normal_range_str.get("min")
+            normal_range.max = normal_range_str.get("max")
+        elif isinstance(normal_range_str, str):
+            range_parts = re.split(r'[-<>]', normal_range_str)
+            range_parts = [part.strip() for part in range_parts if part.strip()]
+
+            comparator = re.search(r'([<>])', normal_range_str)
+
+            if len(range_parts) == 2:
+                try:
+                    normal_range.min = float(range_parts[0])
+                    normal_range.max = float(range_parts[1])
+                except ValueError:
+                    pass
+            elif len(range_parts) == 1 and comparator:
+                try:
+                    value = float(range_parts[0])
+                    if comparator.group(1) == '<':
+                        normal_range.max = value
+                    elif comparator.group(1) == '>':
+                        normal_range.min = value
+                except ValueError:
+                    pass
+
+    return normal_range
+
+
+def _normalize_line(line: str) -> str:
+    line = line.replace("–", "-").replace("—", "-").replace("≤", "<=").replace("≥", ">=")
+    line = re.sub(rf"({NUMBER})\s+to\s+({NUMBER})", r"\1-\2", line, flags=re.I)
+    return re.sub(r"\s+", " ", line).strip()
+
+
+def _is_candidate(line: str) -> bool:
+    """Whether a line looks like a test result (as opposed to a header, a note or patient details)."""
+    words = re.findall(r"[a-z]+", line.lower())
+    if not words or words[0] in NON_TEST_WORDS:
+        return False
+    return bool(re.search(r"\d", line) or QUALITATIVE.search(line))
+
+
+def parse_line(line: str) -> Optional[tuple]:
+    """Parse a "Name Value [Flag] Unit Range" line; returns (MedicalTestResult, confidence) or None."""
+    tokens = _normalize_line(line).split(" ")
+    value_at = next((i for i, token in enumerate(tokens) if VALUE.match(token)), None)
+    if not value_at:  # No value, or nothing before it to name the test
+        return None
+    name = " ".join(tokens[:value_at]).strip(" :.-")
+    if len(re.findall(r"[A-Za-z]", name)) < 2:
+        return None
+    match = VALUE.match(tokens[value_at])
+    value = float(match.group(1).replace(",", ""))
+
+    rest = " ".join(tokens[value_at + 1:])
+    normal_range, confidence = NormalRange(), 0.6
+    range_match = RANGE.search(rest) or COMPARATOR_RANGE.search(rest)
+    if range_match:
+        low_or_op, high = range_match.groups()
+        range_str = f"{low_or_op}-{high}" if range_match.re is RANGE else f"{low_or_op[0]}{high}"
+        normal_range = parse_normal_range(range_str)
+        if normal_range.min is not None and normal_range.max is not None and normal_range.min > normal_range.max:
+            return None
+        rest = rest[:range_match.start()] + " " + rest[range_match.end():]
+        confidence += 0.2
+
+    unit, leftover = None, []
+    for token in rest.strip(" ()[]").split():
+        token = token.strip("()[],;")
+        if not token or token.lower() in FLAGS:
+            continue
+        # Single letters after a number are markers like "45 Y M" (age, sex), not units
+        if unit is None and UNIT.match(token) and (len(token) > 1 or token == "%"):
+            unit = token
+        else:
+            leftover.append(token)
+    if any(re.search(r"\d", token) for token in leftover):
+        # Another value or range on the same row (e.g. two merged columns): leave it to the AI
+        return None
+    if unit is not None:
+        confidence += 0.1
+    if lookup_test(name) is not None:
+        confidence += 0.1
+    if leftover:
+        confidence -= 0.2
+    return MedicalTestResult(name=name, value=value, unit=unit, normalRange=normal_range), round(confidence, 2)
+
+
+def parse_lab_report(text: str) -> ParsedReport:
+    """Parse the result lines of a lab report's OCR text (see module docstring)."""
+    results, unparsed, total = [], [], 0.0
+    for line in (text or "").splitlines():
+        line = line.strip()
+        if not _is_candidate(line):
+            continue
+        parsed = parse_line(line)
+        if parsed is None or parsed[1] < LAB_PARSER_MIN_LINE_CONFIDENCE:
+            unparsed.append(line)
+            continue
+        result, confidence = parsed
+        results.append(result)
+        total += confidence
+    candidates = len(results) + len(unparsed)
+    with _counters_lock:
+        _counters["lines_parsed"] += len(results)
+        _counters["lines_unparsed"] += len(unparsed)
+    return ParsedReport(results, unparsed, round(total / candidates, 4) if candidates else 0.0)
+
+
+def count_report(outcome: str) -> None:
+    """Record how a report was read: "parsed_reports", "partial_reports" or "fallback_reports"."""
+    with _counters_lock:
+        _counters["reports"] += 1
+        _counters[outcome] += 1
+
+
+def parser_stats() -> Dict:
+    """How many reports were read without the AI, partly with it, or fully by it."""
+    with _counters_lock:
+        stats = dict(_counters)
+    stats["ai_skip_rate"] = round(stats["parsed_reports"] / stats["reports"], 4) if stats["reports"] else 0.0
+    return stats
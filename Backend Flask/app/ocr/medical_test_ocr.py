@@ -1,21 +1,28 @@
-from pdf2image import convert_from_bytes # type: ignore
-import io
 import re
+import json
 import datetime
-from app.ocr.common_ocr import preprocess_image, paddleocr_ocr, safe_json_parse, extract_text_from_image # type: ignore # Import common OCR functions
+from concurrent.futures import ThreadPoolExecutor
+from typing import List
+from app.ocr.common_ocr import safe_json_parse, extract_text_from_image, extract_text_from_pdf # type: ignore # Import common OCR functions
 from app.utils.gemini_utils import get_gemini_model # type: ignore
-from app.models.medical_models import MedicalTestResult, NormalRange # type: ignore # Import Pydantic models
+from app.models.medical_models import MedicalTestResult # type: ignore # Import Pydantic models
+from app.ocr.lab_interpretation import lookup_interpretation, remember_interpretation # type: ignore
+from app.ocr.lab_parser import parse_lab_report, parse_normal_range, count_report # type: ignore
+from app.ocr.lab_catalog import infer_category, complete_from_catalog # type: ignore
+from app.config import (LAB_INTERPRETATION_BATCH_SIZE, LAB_INTERPRETATION_WORKERS, LAB_PARSER, # type: ignore
+                        LAB_PARSER_MIN_CONFIDENCE)
+
+INTERPRETATION_FALLBACK = "Could not generate interpretation at this time."
+
+
+class IncompleteResults(list):
+    """Results of a report whose unparsed lines the AI returned nothing for. Served, but not kept in the upload cache."""
 
 
 def extract_text_medical_test(file_bytes, file_type): # Specialized text extraction for medical tests
     extracted_text = ""
     if file_type == "application/pdf":
-        images = convert_from_bytes(file_bytes)
-        for img in images:
-            img_bytes = io.BytesIO()
-            img.save(img_bytes, format="PNG")
-            processed_img = preprocess_image(img_bytes.getvalue())
-            text = paddleocr_ocr(processed_img)
+        for text in extract_text_from_pdf(file_bytes):
             print("OCR Extracted Text (PDF Page - Medical Test):")
             print(text)
             extracted_text += text + "\n"
@@ -26,30 +33,11 @@ def extract_text_medical_test(file_bytes, file_type): # Specialized text extract
     return extracted_text.strip()
 
 
-def infer_category(test_name: str) -> str:
-    test_name_lower = test_name.lower()
-    if any(keyword in test_name_lower for keyword in ["wbc differential", "neutrophil", "lymphocyte", "monocyte", "eosinophil", "basophil", "band %"]):
-        return "WBC Differential"
-    elif any(keyword in test_name_lower for keyword in ["hemoglobin", "hgb", "rbc", "erythrocytes", "hct", "hematocrit", "mcv", "mch", "mchc", "rdw-cv"]):
-        return "Hematology"
-    elif any(keyword in test_name_lower for keyword in ["plt", "platelet"]):
-        return "Platelets"
-    elif any(keyword in test_name_lower for keyword in ["leukocytes", "wbc"]):
-        return "WBC"
-    elif any(keyword in test_name_lower for keyword in ["glucose", "sugar", "insulin"]):
-        return "Diabetes"
-    elif any(keyword in test_name_lower for keyword in ["cholesterol", "ldl", "hdl", "triglycerides"]):
-        return "Lipid Profile"
-    elif any(keyword in test_name_lower for keyword in ["creatinine", "bun", "urea"]):
-        return "Renal Function"
-    elif any(keyword in test_name_lower for keyword in ["liver", "alt", "ast", "bilirubin"]):
-        return "Liver Function"
-    else:
-        return "General Test"
-
 def infer_critical_and_trend(result: MedicalTestResult) -> MedicalTestResult:
-    if isinstance(result.value, (int, float)) and result.normalRange.min is not None and result.normalRange.max is not None:
-        if result.value < result.normalRange.min or result.value > result.normalRange.max:
+    low, high = result.normalRange.min, result.normalRange.max
+    if isinstance(result.value, (int, float)) and (low is not None or high is not None):
+        # One-sided ranges ("< 200", "> 40") only bound one side
+        if (low is not None and result.value < low) or (high is not None and result.value > high):
             result.critical = True
         else:
             result.critical = False
@@ -70,15 +58,20 @@ def infer_critical_and_trend(result: MedicalTestResult) -> MedicalTestResult:
     return result
 
 
-def generate_interpretation_from_gemini(test_result: MedicalTestResult) -> str:
-    model = get_gemini_model()
-    # ... (generate_interpretation_from_gemini function from original code) ...
+def describe_test(test_result: MedicalTestResult):
+    """Value and normal-range text of a test result, as shown to the AI."""
     if isinstance(test_result.value, (int, float)):
         value_str = str(test_result.value)
     else:
         value_str = str(test_result.value) if test_result.value else "Value not provided"
 
     normal_range_str = f"{test_result.normalRange.min}-{test_result.normalRange.max} {test_result.unit}" if test_result.normalRange.min is not None and test_result.normalRange.max is not None else "Normal range not provided"
+    return value_str, normal_range_str
+
+
+def generate_interpretation_from_gemini(test_result: MedicalTestResult) -> str:
+    model = get_gemini_model()
+    value_str, normal_range_str = describe_test(test_result)
 
     prompt = f"""
     Interpret the following medical test result in a user-friendly way and provide brief advice.
@@ -92,6 +85,7 @@ def generate_interpretation_from_gemini(test_result: MedicalTestResult) -> str:
     Focus on making the interpretation easy to understand for someone without medical background.
     Provide advice on what the result might mean in simple terms and suggest general next steps, like 'consult your doctor if concerned' or 'maintain a healthy lifestyle'.
     Keep the interpretation concise, about 2-3 sentences maximum.
+    Describe the result relative to its normal range rather than quoting the exact value.
 
     Response should be just the interpretation text, no extra formatting.
     """
@@ -102,10 +96,102 @@ def generate_interpretation_from_gemini(test_result: MedicalTestResult) -> str:
         return interpretation_text
     except Exception as e:
         print(f"Error generating interpretation from Gemini: {e}")
-        return "Could not generate interpretation at this time."
+        return INTERPRETATION_FALLBACK
+
+
+def _interpret_batch(test_results: List[MedicalTestResult], indices: List[int]) -> dict:
+    """Interpret the tests at `indices` with one AI call; returns {index: interpretation} for the ones it answered."""
+    tests = []
+    for index in indices:
+        test_result = test_results[index]
+        value_str, normal_range_str = describe_test(test_result)
+        tests.append({
+            "id": index + 1,
+            "name": test_result.name,
+            "category": test_result.category,
+            "value": f"{value_str} {test_result.unit or ''}".strip(),
+            "normalRange": normal_range_str,
+            "critical": test_result.critical,
+        })
 
+    prompt = f"""
+    Interpret each of the following medical test results in a user-friendly way and provide brief advice.
 
-def extract_medical_tests(text):
+    Focus on making each interpretation easy to understand for someone without medical background.
+    Provide advice on what the result might mean in simple terms and suggest general next steps, like 'consult your doctor if concerned' or 'maintain a healthy lifestyle'.
+    Keep each interpretation concise, about 2-3 sentences maximum.
+    Describe each result relative to its normal range rather than quoting the exact value.
+
+    Return a JSON array with one object per test, using the test's id:
+    [{{"id": 1, "interpretation": "Interpretation text"}}]
+
+    Tests:
+    {json.dumps(tests, ensure_ascii=False)}
+    """
+    try:
+        response = get_gemini_model().generate_content(prompt)
+        items = safe_json_parse(response.text)
+    except Exception as e:
+        print(f"Error generating batched interpretations from Gemini: {e}")
+        return {}
+    if not isinstance(items, list):
+        return {}
+
+    answered = {}
+    for item in items:
+        if not isinstance(item, dict):
+            continue
+        try:
+            index = int(item.get("id")) - 1
+        except (TypeError, ValueError):
+            continue
+        interpretation = item.get("interpretation")
+        if index in indices and isinstance(interpretation, str) and interpretation.strip():
+            answered[index] = interpretation.strip()
+    return answered
+
+
+def generate_interpretations(test_results: List[MedicalTestResult]) -> List[str]:
+    """
+    Interpret all tests of a report, in the same order as `test_results`.
+
+    Tests with a template or cached interpretation (see lab_interpretation) are answered
+    without the AI. The rest are sent in batches of LAB_INTERPRETATION_BATCH_SIZE, one AI call per batch,
+    with the batches running concurrently. Tests a batch reply left out (or whose batch
+    failed) are retried individually; any that still fail get a fallback text, so one
+    bad item never fails the whole report.
+    """
+    if not test_results:
+        return []
+    interpretations = {}
+    for index, test_result in enumerate(test_results):
+        known = lookup_interpretation(test_result)
+        if known is not None:
+            interpretations[index] = known
+    pending = [index for index in range(len(test_results)) if index not in interpretations]
+    if not pending:
+        return [interpretations[index] for index in range(len(test_results))]
+
+    batch_size = max(1, LAB_INTERPRETATION_BATCH_SIZE)
+    batches = [pending[start:start + batch_size] for start in range(0, len(pending), batch_size)]
+    with ThreadPoolExecutor(max_workers=max(1, LAB_INTERPRETATION_WORKERS)) as executor:
+        for answered in executor.map(lambda indices: _interpret_batch(test_results, indices), batches):
+            interpretations.update(answered)
+
+        missing = [index for index in pending if index not in interpretations]
+        if missing:
+            print(f"Interpreting {len(missing)} test(s) individually after the batched call left them out")
+            for index, text in zip(missing, executor.map(lambda index: generate_interpretation_from_gemini(test_results[index]), missing)):
+                interpretations[index] = text
+
+    for index in pending:
+        if interpretations[index] != INTERPRETATION_FALLBACK:
+            remember_interpretation(test_results[index], interpretations[index])
+    return [interpretations[index] for index in range(len(test_results))]
+
+
+def extract_tests_with_gemini(text) -> List[MedicalTestResult]:
+    """Ask the AI for the test results in `text`."""
     model = get_gemini_model()
     prompt = f"""
     Extract structured medical test results from the following text.
@@ -167,8 +253,41 @@ def extract_medical_tests(text):
             test_results_list.append(test_result)
     else:
         return []
+    return test_results_list
 
-    results_with_metadata = []
+
+def extract_medical_tests(text):
+    """
+    Extract, check and interpret the test results of a lab report's OCR text.
+
+    Lines in the usual "Name Value Unit Range" layout are read by the rule-based parser
+    (see lab_parser); the AI only gets the lines it couldn't read. Reports the parser reads with less
+    than LAB_PARSER_MIN_CONFIDENCE are sent to the AI whole, as before. When the AI returns
+    nothing for a report's unparsed lines, the results are an IncompleteResults list.
+    """
+    test_results_list = []
+    incomplete = False
+    if LAB_PARSER:
+        report = parse_lab_report(text)
+        print(f"Lab parser: {len(report.results)} test(s) parsed, {len(report.unparsed_lines)} line(s) left, "
+              f"confidence {report.confidence}")
+        if report.results and report.confidence >= LAB_PARSER_MIN_CONFIDENCE:
+            test_results_list = report.results
+            if report.unparsed_lines:
+                count_report("partial_reports")
+                ai_results = extract_tests_with_gemini("\n".join(report.unparsed_lines))
+                # Nothing back may as well be a failed AI call; don't let the upload cache keep it
+                incomplete = not ai_results
+                test_results_list = test_results_list + ai_results
+            else:
+                count_report("parsed_reports")
+        else:
+            count_report("fallback_reports")
+            test_results_list = extract_tests_with_gemini(text)
+    else:
+        test_results_list = extract_tests_with_gemini(text)
+
+    processed_results = []
     for result_dict in [result.dict() for result in test_results_list]:
         test_result_obj = MedicalTestResult(**result_dict)
         test_result_obj.category = infer_category(test_result_obj.name)
@@ -185,41 +304,15 @@ def extract_medical_tests(text):
                  test_result_obj.value = re.sub(r'%', '', test_result_obj.value).strip()
 
 
+        test_result_obj = complete_from_catalog(test_result_obj)
         test_result_obj = infer_critical_and_trend(test_result_obj)
-        test_result_obj.interpretation = generate_interpretation_from_gemini(test_result_obj)
+        processed_results.append(test_result_obj)
+
+    results_with_metadata = []
+    for test_result_obj, interpretation in zip(processed_results, generate_interpretations(processed_results)):
+        test_result_obj.interpretation = interpretation
         test_result_obj.lastUpdated = datetime.datetime.now().isoformat()
         results_with_metadata.append(test_result_obj.dict())
 
-    return results_with_metadata
-
-
-def parse_normal_range(normal_range_str):
-    normal_range = NormalRange()
-    # ... (parse_normal_range function from original code) ...
-    if normal_range_str:
-        if isinstance(normal_range_str, dict):
-            normal_range.min = normal_range_str.get("min")
-            normal_range.max = normal_range_str.get("max")
-        elif isinstance(normal_range_str, str):
-            range_parts = re.split(r'[-<>]', normal_range_str)
-            range_parts = [part.strip() for part in range_parts if part.strip()]
-
-            comparator = re.search(r'([<>])', normal_range_str)
-
-            if len(range_parts) == 2:
-                try:
-                    normal_range.min = float(range_parts[0])
-                    normal_range.max = float(range_parts[1])
-                except ValueError:
-                    pass
-            elif len(range_parts) == 1 and comparator:
-                try:
-                    value = float(range_parts[0])
-                    if comparator.group(1) == '<':
-                        normal_range.max = value
-                    elif comparator.group(1) == '>':
-                        normal_range.min = value
-                except ValueError:
-                    pass
-
-    return normal_range
\ No newline at end of file
+    return IncompleteResults(results_with_metadata) if incomplete else results_with_metadata
+
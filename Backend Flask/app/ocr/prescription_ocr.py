@@ -1,9 +1,8 @@
-from pdf2image import convert_from_bytes # type: ignore
-import io
 import logging
 from typing import List, Dict, Any
-from app.ocr.common_ocr import preprocess_image, paddleocr_ocr, safe_json_parse # type: ignore
+from app.ocr.common_ocr import preprocess_image, paddleocr_ocr, safe_json_parse, extract_text_from_pdf # type: ignore
 from app.utils.gemini_utils import get_gemini_model # type: ignore
+from app.utils.ocr_utils import OCRDeadlineExceeded # type: ignore
 
 # Set up logging
 logging.basicConfig(level=logging.INFO)
@@ -23,18 +22,15 @@ def extract_text_prescription(file_bytes: bytes, file_type: str) -> str:
     extracted_text = ""
     try:
         if file_type == "application/pdf":
-            images = convert_from_bytes(file_bytes)
-            for img in images:
-                with io.BytesIO() as img_bytes:
-                    img.save(img_bytes, format="PNG")
-                    processed_img = preprocess_image(img_bytes.getvalue())
-                    text = paddleocr_ocr(processed_img)
-                    logger.info("OCR Extracted Text (PDF Page - Prescription):\n%s", text)
-                    extracted_text += text + "\n"
+            for text in extract_text_from_pdf(file_bytes):
+                logger.info("OCR Extracted Text (PDF Page - Prescription):\n%s", text)
+                extracted_text += text + "\n"
         else:
             processed_img = preprocess_image(file_bytes)
             extracted_text = paddleocr_ocr(processed_img)
             logger.info("OCR Extracted Text (Image - Prescription):\n%s", extracted_text)
+    except OCRDeadlineExceeded:
+        raise
     except Exception as e:
         logger.error("Error during text extraction: %s", str(e))
         return ""
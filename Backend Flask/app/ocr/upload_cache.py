@@ -0,0 +1,69 @@
+"""
+Cache of OCR text and extraction results for uploaded files.
+
+Users often upload the same file again, for example after a frontend retry or to
+re-check a result. Entries are keyed by the SHA-256 of the uploaded bytes, its
+content type (which decides how it is read) and the pipeline key (PIPELINE_VERSION
+plus the settings that change results), so an identical upload is answered without
+OCR or AI calls. Two things are stored:
+- the OCR text, shared by /extract-medical-tests and /extract-prescriptions;
+- each endpoint's structured output.
+
+Entries live in memory and in a SQLite file of at most UPLOAD_CACHE_MAX_BYTES,
+which drops the least recently used entries first. Failed extractions (no text,
+nothing extracted, AI errors, lab results with a fallback interpretation or whose
+unparsed lines the AI returned nothing for) are not reused. Concurrent uploads of the same file
+share one extraction.
+"""
+import os
+import hashlib
+from typing import Any, Callable
+from app.utils.cache_utils import TwoTierCache # type: ignore
+from app.ocr.medical_test_ocr import INTERPRETATION_FALLBACK, IncompleteResults # type: ignore
+from app.config import (CACHE_DIR, UPLOAD_CACHE_SIZE, UPLOAD_CACHE_MAX_BYTES, UPLOAD_CACHE_TTL, MY_MODEL_NAME, # type: ignore
+                        LAB_PARSER, LAB_PARSER_MIN_CONFIDENCE, LAB_PARSER_MIN_LINE_CONFIDENCE, LAB_INTERPRETATION_TEMPLATES,
+                        LAB_INTERPRETATION_BATCH_SIZE, LAB_INTERPRETATION_WORKERS, OCR_PREPROCESS, OCR_IMAGE_SIZE,
+                        OCR_NOISE_THRESHOLD, OCR_CONTRAST_THRESHOLD, OCR_SKEW_THRESHOLD, OCR_PDF_DPI, OCR_PDF_MAX_PAGES,
+                        OCR_PDF_TEXT_LAYER, OCR_PDF_MIN_TEXT_CHARS)
+
+PIPELINE_VERSION = "5"  # Bump when a change to OCR, parsing or prompts changes what an upload returns
+PIPELINE_KEY = hashlib.sha256(repr((
+    PIPELINE_VERSION, MY_MODEL_NAME, LAB_PARSER, LAB_PARSER_MIN_CONFIDENCE, LAB_PARSER_MIN_LINE_CONFIDENCE,
+    LAB_INTERPRETATION_TEMPLATES, LAB_INTERPRETATION_BATCH_SIZE, LAB_INTERPRETATION_WORKERS,
+    OCR_PREPROCESS, OCR_IMAGE_SIZE, OCR_NOISE_THRESHOLD, OCR_CONTRAST_THRESHOLD, OCR_SKEW_THRESHOLD,
+    OCR_PDF_DPI, OCR_PDF_MAX_PAGES, OCR_PDF_TEXT_LAYER, OCR_PDF_MIN_TEXT_CHARS,
+)).encode("utf-8")).hexdigest()[:12]
+
+
+def _is_failure(value: Any) -> bool:
+    if not value or (isinstance(value, dict) and "error" in value) or isinstance(value, IncompleteResults):
+        return True
+    # Lab results with an interpretation the AI couldn't write
+    return isinstance(value, list) and any(isinstance(item, dict) and item.get("interpretation") == INTERPRETATION_FALLBACK
+                                           for item in value)
+
+
+# Failures get a TTL of 0: they are stored but never served, so the next upload retries
+upload_cache = TwoTierCache(
+    "uploads",
+    os.path.join(CACHE_DIR, "uploads.sqlite3"),
+    max_entries=UPLOAD_CACHE_SIZE,
+    ttl=UPLOAD_CACHE_TTL,
+    negative_ttl=0,
+    is_negative=_is_failure,
+    max_disk_bytes=UPLOAD_CACHE_MAX_BYTES,
+)
+
+
+def upload_digest(file_bytes: bytes) -> str:
+    return hashlib.sha256(file_bytes).hexdigest()
+
+
+def cached_text(digest: str, file_type: str, extract: Callable[[], str]) -> str:
+    """The OCR text of an uploaded file, from the cache or from `extract()`."""
+    return upload_cache.get_or_load(f"text:{PIPELINE_KEY}:{file_type}:{digest}", extract)
+
+
+def cached_result(kind: str, digest: str, file_type: str, extract: Callable[[], Any]) -> Any:
+    """An endpoint's output (`kind`: "medical_tests" or "prescriptions") for an uploaded file, from the cache or from `extract()`."""
+    return upload_cache.get_or_load(f"{kind}:{PIPELINE_KEY}:{file_type}:{digest}", extract)
@@ -0,0 +1,242 @@
+import os
+import json
+import time
+import sqlite3
+import logging
+import threading
+from collections import OrderedDict
+from contextlib import contextmanager
+from typing import Any, Callable, Dict, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+
+class _Flight:
+    """One in-progress load that concurrent callers for the same key wait on."""
+
+    def __init__(self):
+        self.done = threading.Event()
+        self.value = None
+        self.error: Optional[BaseException] = None
+
+
+class TwoTierCache:
+    """
+    In-process LRU in front of an on-disk SQLite store, with TTL expiry.
+
+    `get_or_load` adds the read-through behaviour:
+    - fresh entries are returned directly;
+    - entries past their TTL but within `stale_ttl` are returned immediately while a
+      background thread refreshes them (stale-while-revalidate);
+    - results the `is_negative` predicate flags (e.g. "no results") are cached for
+      `negative_ttl` instead of `ttl`;
+    - concurrent misses for the same key share a single load (single-flight).
+
+    With `max_disk_bytes` the on-disk store is bounded too: once its values take more
+    than that many bytes, the least recently used entries are deleted.
+
+    Values must be JSON-serializable. Errors raised by the loader are not cached.
+    """
+
+    def __init__(self, name: str, path: Optional[str], max_entries: int = 1024, ttl: float = 86400,
+                 stale_ttl: float = 0, negative_ttl: Optional[float] = None,
+                 is_negative: Callable[[Any], bool] = lambda value: value is None,
+                 max_disk_bytes: Optional[int] = None):
+        self.name = name
+        self.path = path
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.stale_ttl = stale_ttl
+        self.negative_ttl = ttl if negative_ttl is None else negative_ttl
+        self.is_negative = is_negative
+        self.max_disk_bytes = max_disk_bytes
+        self._memory: "OrderedDict[str, Tuple[Any, float, float]]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._flights: Dict[str, _Flight] = {}
+        self._counters = {"memory_hits": 0, "disk_hits": 0, "stale_hits": 0, "negative_hits": 0,
+                          "misses": 0, "loads": 0, "coalesced": 0, "refreshes": 0, "load_errors": 0, "evictions": 0}
+        if path:
+            os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+            with self._connect() as conn:
+                conn.execute("PRAGMA journal_mode=WAL")
+                conn.execute("CREATE TABLE IF NOT EXISTS cache (key TEXT PRIMARY KEY, value TEXT NOT NULL, stored_at REAL NOT NULL, ttl REAL NOT NULL)")
+                if max_disk_bytes is not None:
+                    # Entry sizes and last use, for LRU eviction (added to stores created without them)
+                    columns = {row[1] for row in conn.execute("PRAGMA table_info(cache)")}
+                    if "size" not in columns:
+                        conn.execute("ALTER TABLE cache ADD COLUMN size INTEGER NOT NULL DEFAULT 0")
+                    if "used_at" not in columns:
+                        conn.execute("ALTER TABLE cache ADD COLUMN used_at REAL NOT NULL DEFAULT 0")
+                    conn.execute("CREATE INDEX IF NOT EXISTS cache_used_at ON cache (used_at)")
+
+    @contextmanager
+    def _connect(self):
+        # A connection per operation keeps the store safe across threads and worker processes
+        conn = sqlite3.connect(self.path, timeout=5)
+        try:
+            with conn:
+                yield conn
+        finally:
+            conn.close()
+
+    def _count(self, counter: str) -> None:
+        with self._lock:
+            self._counters[counter] += 1
+
+    def _remember(self, key: str, entry: Tuple[Any, float, float]) -> None:
+        with self._lock:
+            self._memory[key] = entry
+            self._memory.move_to_end(key)
+            while len(self._memory) > self.max_entries:
+                self._memory.popitem(last=False)
+
+    def _touch(self, key: str) -> None:
+        """Mark a disk entry as just used, so LRU eviction keeps it."""
+        try:
+            with self._connect() as conn:
+                conn.execute("UPDATE cache SET used_at = ? WHERE key = ?", (time.time(), key))
+        except sqlite3.Error as e:
+            logger.warning("%s cache update failed: %s", self.name, e)
+
+    def _evict(self, conn: sqlite3.Connection) -> None:
+        """Delete least recently used entries until the disk store fits in max_disk_bytes."""
+        excess = conn.execute("SELECT COALESCE(SUM(size), 0) FROM cache").fetchone()[0] - self.max_disk_bytes
+        if excess <= 0:
+            return
+        evicted = []
+        for key, size in conn.execute("SELECT key, size FROM cache ORDER BY used_at"):
+            if excess <= 0:
+                break
+            evicted.append((key,))
+            excess -= size
+        conn.executemany("DELETE FROM cache WHERE key = ?", evicted)
+        with self._lock:
+            self._counters["evictions"] += len(evicted)
+
+    def _lookup(self, key: str) -> Tuple[Optional[Tuple[Any, float, float]], str]:
+        with self._lock:
+            entry = self._memory.get(key)
+            if entry is not None:
+                self._memory.move_to_end(key)
+        if entry is not None:
+            if self.path and self.max_disk_bytes is not None:
+                self._touch(key)
+            return entry, "memory_hits"
+        if self.path:
+            try:
+                with self._connect() as conn:
+                    row = conn.execute("SELECT value, stored_at, ttl FROM cache WHERE key = ?", (key,)).fetchone()
+                    if row is not None and self.max_disk_bytes is not None:
+                        conn.execute("UPDATE cache SET used_at = ? WHERE key = ?", (time.time(), key))
+            except sqlite3.Error as e:
+                logger.warning("%s cache read failed: %s", self.name, e)
+                row = None
+            if row is not None:
+                entry = (json.loads(row[0]), row[1], row[2])
+                self._remember(key, entry)
+                return entry, "disk_hits"
+        return None, "misses"
+
+    def get(self, key: str) -> Optional[Any]:
+        """Return the cached value for `key` if it is still fresh, else None."""
+        entry, source = self._lookup(key)
+        if entry is not None and time.time() - entry[1] < entry[2]:
+            self._count(source)
+            return entry[0]
+        self._count("misses")
+        return None
+
+    def set(self, key: str, value: Any) -> None:
+        ttl = self.negative_ttl if self.is_negative(value) else self.ttl
+        entry = (value, time.time(), ttl)
+        self._remember(key, entry)
+        if self.path:
+            try:
+                with self._connect() as conn:
+                    if self.max_disk_bytes is None:
+                        conn.execute("INSERT OR REPLACE INTO cache (key, value, stored_at, ttl) VALUES (?, ?, ?, ?)",
+                                     (key, json.dumps(value), entry[1], ttl))
+                    else:
+                        data = json.dumps(value)
+                        conn.execute("INSERT OR REPLACE INTO cache (key, value, stored_at, ttl, size, used_at) VALUES (?, ?, ?, ?, ?, ?)",
+                                     (key, data, entry[1], ttl, len(data.encode("utf-8")), entry[1]))
+                        self._evict(conn)
+            except sqlite3.Error as e:
+                logger.warning("%s cache write failed: %s", self.name, e)
+
+    def _load(self, key: str, loader: Callable[[], Any]) -> Any:
+        """Run `loader` once per key no matter how many callers ask concurrently."""
+        with self._lock:
+            flight = self._flights.get(key)
+            leader = flight is None
+            if leader:
+                flight = self._flights[key] = _Flight()
+            else:
+                self._counters["coalesced"] += 1
+        if not leader:
+            flight.done.wait()
+            if flight.error is not None:
+                raise flight.error
+            return flight.value
+
+        try:
+            self._count("loads")
+            flight.value = loader()
+            self.set(key, flight.value)
+            return flight.value
+        except BaseException as e:
+            self._count("load_errors")
+            flight.error = e
+            raise
+        finally:
+            with self._lock:
+                del self._flights[key]
+            flight.done.set()
+
+    def _refresh_in_background(self, key: str, loader: Callable[[], Any]) -> None:
+        with self._lock:
+            if key in self._flights:
+                return
+            self._counters["refreshes"] += 1
+
+        def run():
+            try:
+                self._load(key, loader)
+            except Exception as e:
+                logger.warning("%s cache refresh for %r failed: %s", self.name, key, e)
+
+        threading.Thread(target=run, name=f"{self.name}-refresh", daemon=True).start()
+
+    def get_or_load(self, key: str, loader: Callable[[], Any]) -> Any:
+        """Return the cached value for `key`, calling `loader` on a miss (see class docstring)."""
+        entry, source = self._lookup(key)
+        if entry is not None:
+            value, stored_at, ttl = entry
+            age = time.time() - stored_at
+            if age < ttl:
+                self._count(source)
+                if self.is_negative(value):
+                    self._count("negative_hits")
+                return value
+            if age < ttl + self.stale_ttl:
+                self._count("stale_hits")
+                self._refresh_in_background(key, loader)
+                return value
+        self._count("misses")
+        return self._load(key, loader)
+
+    def stats(self) -> Dict[str, Any]:
+        """Hit/miss counters plus the current in-memory size and hit rate."""
+        with self._lock:
+            stats = dict(self._counters)
+            stats["memory_entries"] = len(self._memory)
+        if self.path and self.max_disk_bytes is not None:
+            try:
+                with self._connect() as conn:
+                    stats["disk_entries"], stats["disk_bytes"] = conn.execute("SELECT COUNT(*), COALESCE(SUM(size), 0) FROM cache").fetchone()
+            except sqlite3.Error as e:
+                logger.warning("%s cache read failed: %s", self.name, e)
+        hits = stats["memory_hits"] + stats["disk_hits"] + stats["stale_hits"]
+        lookups = hits + stats["misses"]
+        stats["hit_rate"] = round(hits / lookups, 4) if lookups else 0.0
+        return stats
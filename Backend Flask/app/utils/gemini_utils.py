@@ -1,8 +1,6 @@
-import google.generativeai as genai # type: ignore
-from app.config import GENAI_API_KEY, MY_MODEL_NAME # type: ignore
+from app.utils.llm_client import get_llm_client # type: ignore
 
-genai.configure(api_key=GENAI_API_KEY)
-gemini_model_name = MY_MODEL_NAME
 
 def get_gemini_model():
-    return genai.GenerativeModel(gemini_model_name)
\ No newline at end of file
+    """The shared, rate-limited LLM client; a drop-in for `genai.GenerativeModel`."""
+    return get_llm_client()
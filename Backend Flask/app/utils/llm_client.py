@@ -0,0 +1,289 @@
+"""
+Shared LLM client used by the chatbot and the OCR modules.
+
+All AI calls go through one `LLMClient`, which
+- reuses a single model instance of the configured backend,
+- spaces calls with a token bucket (LLM_RATE_LIMIT requests/minute, bursts of LLM_BURST),
+- caps calls in flight with a semaphore (LLM_MAX_CONCURRENCY),
+- retries rate-limit, timeout and server errors with exponential backoff and full
+  jitter, without ever waiting past the call's deadline (LLM_DEADLINE seconds).
+
+`generate_content(prompt, stream=False)` matches `genai.GenerativeModel.generate_content`,
+so callers use the client exactly like the model it replaces. Only starting a stream
+is retried: an error while its chunks are being read is raised to the caller, since
+part of the reply may already have been passed on.
+
+Backends: "gemini" (Google Gemini) and "stub", a deterministic local backend for
+tests and benchmarks that needs no API key or network (set LLM_BACKEND=stub).
+"""
+import re
+import json
+import time
+import random
+import hashlib
+import logging
+import threading
+from typing import Any, Dict, Optional
+from app.config import (GENAI_API_KEY, MY_MODEL_NAME, LLM_BACKEND, LLM_RATE_LIMIT, LLM_BURST, LLM_MAX_CONCURRENCY, # type: ignore
+                        LLM_TIMEOUT, LLM_DEADLINE, LLM_MAX_RETRIES, LLM_STUB_LATENCY)
+
+logger = logging.getLogger(__name__)
+
+# HTTP statuses / gRPC error names worth retrying: rate limiting, timeouts and server errors
+RETRYABLE_STATUS = {408, 429, 500, 502, 503, 504}
+RETRYABLE_ERRORS = {"ResourceExhausted", "TooManyRequests", "ServiceUnavailable", "DeadlineExceeded",
+                    "InternalServerError", "GatewayTimeout", "TimeoutError", "ConnectionError", "Timeout"}
+BACKOFF_BASE = 0.5  # Seconds before the first retry (before jitter)
+BACKOFF_CAP = 8.0
+
+
+class LLMDeadlineExceeded(TimeoutError):
+    """Raised when a call can't be started or retried before its deadline."""
+
+
+def is_retryable(error: BaseException) -> bool:
+    status = getattr(error, "code", None) or getattr(error, "status_code", None)
+    if isinstance(status, int) and status in RETRYABLE_STATUS:
+        return True
+    return any(cls.__name__ in RETRYABLE_ERRORS for cls in type(error).__mro__)
+
+
+class TokenBucket:
+    """Allows `rate` acquisitions per second on average, with bursts of up to `capacity`."""
+
+    def __init__(self, rate: float, capacity: float):
+        self.rate = rate
+        self.capacity = capacity
+        self._tokens = capacity
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def acquire(self, deadline: float) -> float:
+        """Take one token, waiting if needed; returns the seconds waited. Raises if the deadline comes first."""
+        waited = 0.0
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+                self._updated = now
+                if self._tokens >= 1:
+                    self._tokens -= 1
+                    return waited
+                wait = (1 - self._tokens) / self.rate
+            if now + wait > deadline:
+                raise LLMDeadlineExceeded("Rate limit wait would pass the call deadline")
+            time.sleep(wait)
+            waited += wait
+
+
+class GeminiBackend:
+    def __init__(self, model_name: str = MY_MODEL_NAME, api_key: Optional[str] = GENAI_API_KEY):
+        import google.generativeai as genai # type: ignore
+
+        genai.configure(api_key=api_key)
+        self.model = genai.GenerativeModel(model_name)
+
+    def generate(self, prompt: str, stream: bool, timeout: float):
+        return self.model.generate_content(prompt, stream=stream, request_options={"timeout": timeout})
+
+
+class StubResponse:
+    def __init__(self, text: str):
+        self.text = text
+
+
+class StubBackend:
+    """
+    Deterministic offline backend: recognizes the prompts this app sends and answers
+    each with a well-formed reply derived from a hash of the prompt, after `latency` seconds.
+    """
+
+    # "<name>[:] <value> [<unit>] [<min>-<max>]", e.g. "WBC 11.2 10^3/uL 4-10"
+    TEST_LINE = re.compile(r"^[ \t]*([A-Za-z][A-Za-z %()./-]*?)[ \t]*:?[ \t]+(\d+(?:\.\d+)?)"
+                           r"(?:[ \t]+(?!\d+(?:\.\d+)?[ \t]*-)(\S+))?"
+                           r"(?:[ \t]+\(?(\d+(?:\.\d+)?)[ \t]*-[ \t]*(\d+(?:\.\d+)?)\)?)?[ \t]*$", re.MULTILINE)
+
+    def __init__(self, latency: float = LLM_STUB_LATENCY):
+        self.latency = latency
+
+    def _answer(self, prompt: str) -> str:
+        digest = hashlib.sha256(prompt.encode("utf-8")).hexdigest()[:8]
+        if 'Response Format (JSON only' in prompt:
+            return json.dumps({"language": "English", "dialect": "Standard English", "is_medical": True,
+                               "message": f"Stub reply {digest}: rest, stay hydrated and see a doctor if it persists."})
+        if "Identify the language" in prompt:
+            return json.dumps({"language": "English", "dialect": "Standard English"})
+        if 'Answer ONLY "yes" or "no"' in prompt:
+            return "yes"
+        if "running summary" in prompt:
+            return json.dumps({"summary": f"Stub summary {digest}."})
+        if "Extract structured medical test results" in prompt:
+            text = prompt.split("Text:", 1)[-1]
+            tests = [{"name": name.strip(), "value": float(value), "unit": unit or None,
+                      "normalRange": {"min": float(low) if low else None, "max": float(high) if high else None}}
+                     for name, value, unit, low, high in self.TEST_LINE.findall(text)]
+            return json.dumps(tests)
+        if "Extract structured prescription data" in prompt:
+            return "[]"
+        if "Interpret each of the following medical test results" in prompt:
+            tests = json.loads(prompt.split("Tests:", 1)[-1])
+            return json.dumps([{"id": test["id"], "interpretation": f"Stub interpretation {digest} of {test['name']}."}
+                               for test in tests])
+        if "Interpret the following medical test result" in prompt:
+            return f"Stub interpretation {digest}: discuss this result with your doctor."
+        return json.dumps({"message": f"Stub reply {digest}."})
+
+    def generate(self, prompt: str, stream: bool, timeout: float):
+        time.sleep(min(self.latency, timeout))
+        text = self._answer(prompt)
+        if not stream:
+            return StubResponse(text)
+        return iter([StubResponse(text[i:i + 16]) for i in range(0, len(text), 16)])
+
+
+BACKENDS = {"gemini": GeminiBackend, "stub": StubBackend}
+
+
+class _Stream:
+    """
+    Iterator over a streamed reply that holds one of the client's slots until the stream
+    is exhausted, fails, is closed, or is garbage-collected without being read.
+    """
+
+    def __init__(self, chunks, release):
+        self._chunks = iter(chunks)
+        self._release = release
+
+    def __iter__(self):
+        return self
+
+    def __next__(self):
+        if self._release is None:
+            raise StopIteration
+        try:
+            return next(self._chunks)
+        except BaseException:
+            self.close()
+            raise
+
+    def close(self) -> None:
+        """Stop reading the stream and free its slot."""
+        release, self._release = self._release, None
+        if release is not None:
+            close = getattr(self._chunks, "close", None)
+            if close is not None:
+                close()
+            release()
+
+    def __del__(self):
+        self.close()
+
+
+class LLMClient:
+    """Rate-limited, concurrency-bounded, retrying front end to an LLM backend (see module docstring)."""
+
+    def __init__(self, backend, rate_per_minute: float = LLM_RATE_LIMIT, burst: int = LLM_BURST,
+                 max_concurrency: int = LLM_MAX_CONCURRENCY, timeout: float = LLM_TIMEOUT,
+                 deadline: float = LLM_DEADLINE, max_retries: int = LLM_MAX_RETRIES):
+        self.backend = backend
+        self.timeout = timeout
+        self.deadline = deadline
+        self.max_retries = max_retries
+        self._bucket = TokenBucket(rate_per_minute / 60.0, burst)
+        self._slots = threading.BoundedSemaphore(max_concurrency)
+        self._lock = threading.Lock()
+        self._counters = {"calls": 0, "attempts": 0, "retries": 0, "failures": 0, "deadline_exceeded": 0, "in_flight": 0}
+        self._rate_wait = 0.0
+
+    def _count(self, counter: str, delta: int = 1) -> None:
+        with self._lock:
+            self._counters[counter] += delta
+
+    def _acquire_slot(self, deadline: float) -> None:
+        waited = self._bucket.acquire(deadline)
+        with self._lock:
+            self._rate_wait += waited
+        if not self._slots.acquire(timeout=max(0.0, deadline - time.monotonic())):
+            raise LLMDeadlineExceeded("No free LLM slot before the call deadline")
+        self._count("in_flight")
+
+    def _release_slot(self) -> None:
+        self._count("in_flight", -1)
+        self._slots.release()
+
+    def _call(self, prompt: str, stream: bool, deadline: float):
+        """Run one backend call, retrying transient errors until `deadline`."""
+        attempt = 0
+        while True:
+            self._acquire_slot(deadline)
+            try:
+                self._count("attempts")
+                remaining = deadline - time.monotonic()
+                response = self.backend.generate(prompt, stream, max(0.1, min(self.timeout, remaining)))
+            except Exception as e:
+                self._release_slot()
+                if not is_retryable(e) or attempt >= self.max_retries:
+                    raise
+                backoff = random.uniform(0, min(BACKOFF_CAP, BACKOFF_BASE * 2 ** attempt))
+                if time.monotonic() + backoff >= deadline:
+                    raise
+                logger.warning("LLM call failed (%s), retrying in %.2fs", e, backoff)
+                self._count("retries")
+                attempt += 1
+                time.sleep(backoff)
+                continue
+            # A stream keeps its slot until it has been consumed or closed (see _Stream)
+            if not stream:
+                self._release_slot()
+            return response
+
+    def generate_content(self, prompt: str, stream: bool = False, deadline: Optional[float] = None):
+        """
+        Generate a reply to `prompt`, like `genai.GenerativeModel.generate_content`.
+
+        Args:
+            prompt (str): The prompt text.
+            stream (bool): Return an iterator of partial responses instead of one response.
+            deadline (float, optional): `time.monotonic()` time by which the call, including
+                rate-limit waits and retries, must finish; defaults to LLM_DEADLINE from now.
+
+        Returns:
+            An object with a `.text` attribute, or an iterator of them when streaming. A
+            stream holds a concurrency slot until it is read to the end or closed. Errors
+            raised while reading it are not retried.
+        """
+        deadline = deadline if deadline is not None else time.monotonic() + self.deadline
+        self._count("calls")
+        try:
+            response = self._call(prompt, stream, deadline)
+        except LLMDeadlineExceeded:
+            self._count("deadline_exceeded")
+            self._count("failures")
+            raise
+        except Exception:
+            self._count("failures")
+            raise
+        return _Stream(response, self._release_slot) if stream else response
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            stats = dict(self._counters)
+            stats["rate_limit_wait_seconds"] = round(self._rate_wait, 3)
+        stats["backend"] = type(self.backend).__name__
+        return stats
+
+
+_client: Optional[LLMClient] = None
+_client_lock = threading.Lock()
+
+
+def get_llm_client() -> LLMClient:
+    """The process-wide client for the configured LLM_BACKEND, created on first use."""
+    global _client
+    if _client is None:
+        with _client_lock:
+            if _client is None:
+                if LLM_BACKEND not in BACKENDS:
+                    raise ValueError(f"Unknown LLM_BACKEND {LLM_BACKEND!r}; expected one of {sorted(BACKENDS)}")
+                _client = LLMClient(BACKENDS[LLM_BACKEND]())
+    return _client
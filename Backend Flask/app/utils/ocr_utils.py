@@ -1,3 +1,153 @@
+"""
+OCR service shared by the Flask threads.
+
+Page images are OCR'd by a pool of OCR_WORKERS engine threads, each with its own
+PaddleOCR model (Paddle releases the GIL while a model runs, so each worker can
+keep a core busy). The workers take pages from one queue, from any request, one
+page at a time, and OCR each with the full PaddleOCR pipeline (detection, angle
+classification, recognition). A worker holds no pages it isn't working on, so an
+idle worker always gets the next queued page.
+
+Every page carries its request's deadline. A page whose deadline has passed when a
+worker takes it is dropped, and its caller gets OCRDeadlineExceeded.
+"""
+import os
+import time
+import queue
+import threading
+from concurrent.futures import Future, TimeoutError as FutureTimeoutError
+from typing import Any, Dict, List, NamedTuple, Optional
+import numpy as np
 from paddleocr import PaddleOCR # type: ignore
+from app.config import OCR_WORKERS # type: ignore
+
+
+class OCRDeadlineExceeded(TimeoutError):
+    """Raised when a page can't be OCR'd before its request's deadline."""
+
+
+class _Page(NamedTuple):
+    image: np.ndarray
+    deadline: float
+    queued_at: float
+    future: Future
+
+
+class OCRService:
+    """Pool of PaddleOCR workers fed by one page queue (see module docstring)."""
+
+    def __init__(self, workers: int = OCR_WORKERS):
+        self.workers = max(1, workers)
+        # Split the cores between the workers' models rather than letting each use all of them
+        self._cpu_threads = max(1, (os.cpu_count() or 1) // self.workers)
+        self._queue: "queue.Queue[_Page]" = queue.Queue()
+        self._lock = threading.Lock()
+        self._counters = {"pages": 0, "text_lines": 0, "deadline_exceeded": 0, "failures": 0,
+                          "workers_ready": 0, "max_queue_depth": 0}
+        self._queue_wait = 0.0
+        self._ocr_seconds = 0.0
+        for i in range(self.workers):
+            threading.Thread(target=self._run, name=f"ocr-worker-{i}", daemon=True).start()
+
+    def _count(self, counter: str, delta: int = 1) -> None:
+        with self._lock:
+            self._counters[counter] += delta
+
+    def submit(self, image: np.ndarray, deadline: float) -> Future:
+        """
+        Queue a page for OCR.
+
+        Args:
+            image (np.ndarray): BGR page image.
+            deadline (float): `time.monotonic()` time after which the page is no longer wanted.
+
+        Returns:
+            Future: Resolves to the page's PaddleOCR result, a list of [box, (text, score)].
+        """
+        future: Future = Future()
+        self._queue.put(_Page(image, deadline, time.monotonic(), future))
+        depth = self._queue.qsize()
+        with self._lock:
+            self._counters["max_queue_depth"] = max(self._counters["max_queue_depth"], depth)
+        return future
+
+    def result(self, future: Future, deadline: float) -> List[Any]:
+        """Wait for a submitted page; raises OCRDeadlineExceeded if it isn't done by `deadline`."""
+        try:
+            return future.result(timeout=max(0.0, deadline - time.monotonic()))
+        except FutureTimeoutError:
+            # Still queued: drop it. Already running: let it finish, the result is discarded.
+            future.cancel()
+            self._count("deadline_exceeded")
+            raise OCRDeadlineExceeded("OCR of the page did not finish before the request deadline") from None
+
+    def ocr(self, image: np.ndarray, deadline: float) -> List[Any]:
+        """OCR one page image, waiting for the result."""
+        return self.result(self.submit(image, deadline), deadline)
+
+    def _next_page(self) -> _Page:
+        """Wait for a page that is still wanted and mark it running."""
+        while True:
+            page = self._queue.get()
+            if not page.future.set_running_or_notify_cancel():
+                continue  # The caller already gave up on it
+            now = time.monotonic()
+            if now > page.deadline:
+                self._count("deadline_exceeded")
+                page.future.set_exception(OCRDeadlineExceeded("Page was still queued at the request deadline"))
+                continue
+            with self._lock:
+                self._queue_wait += now - page.queued_at
+            return page
+
+    def _ocr_page(self, engine, page: _Page) -> None:
+        start = time.monotonic()
+        try:
+            lines = engine.ocr(page.image, cls=True)[0] or []
+        except Exception as e:
+            self._count("failures")
+            page.future.set_exception(e)
+            return
+        page.future.set_result(lines)
+        with self._lock:
+            self._counters["pages"] += 1
+            self._counters["text_lines"] += len(lines)
+            self._ocr_seconds += time.monotonic() - start
+
+    def _run(self) -> None:
+        try:
+            engine = PaddleOCR(use_gpu=False, lang='en', cpu_threads=self._cpu_threads)
+            self._count("workers_ready")
+        except Exception as e:
+            print(f"OCR worker could not load PaddleOCR: {e}")
+            engine, load_error = None, e
+        while True:
+            page = self._next_page()
+            if engine is None:
+                self._count("failures")
+                page.future.set_exception(load_error)
+                continue
+            self._ocr_page(engine, page)
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            stats = dict(self._counters)
+            stats["queue_wait_seconds"] = round(self._queue_wait, 3)
+            stats["ocr_seconds"] = round(self._ocr_seconds, 3)
+        stats["workers"] = self.workers
+        stats["queue_depth"] = self._queue.qsize()
+        return stats
+
+
+_service: Optional[OCRService] = None
+_service_lock = threading.Lock()
+
 
-ocr_model = PaddleOCR(use_gpu=False, lang='en') # Initialize OCR model globally
\ No newline at end of file
+def get_ocr_service() -> OCRService:
+    """The process-wide OCR service, started on first use (its workers load their models in the background)."""
+    global _service
+    if _service is None:
+        with _service_lock:
+            if _service is None:
+                _service = OCRService()
+    return _service
@@ -0,0 +1,65 @@
+#!/usr/bin/env python3
+"""
+Benchmark: AI calls and latency per chat message, single-call vs multi-call.
+
+Runs chatbot.chat on a set of first-turn medical questions against the stub LLM
+backend with a fixed latency per call (LLM_STUB_LATENCY, 0.3 s by default), once with
+the single structured call (CHAT_SINGLE_CALL=true) and once with the separate language,
+medical-check and reply calls. The answer cache is disabled and the local classifier
+is switched off, so every message reaches the AI as it did when single-call mode was
+introduced; pass --classifier to keep the classifier on.
+
+    python benchmarks/bench_chat_calls.py [--latency 0.3] [--classifier]
+"""
+import os
+import sys
+import time
+import argparse
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+QUESTIONS = [
+    "What causes a headache that lasts for three days?",
+    "Is it safe to take ibuprofen with high blood pressure?",
+    "How much water should I drink when I have a fever?",
+    "What are the early symptoms of type 2 diabetes?",
+    "Why does my knee hurt when I climb stairs?",
+    "How long does a cold usually last?",
+]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--latency", type=float, default=0.3, help="seconds per stub AI call")
+    parser.add_argument("--classifier", action="store_true", help="keep the local language/medical classifier on")
+    args = parser.parse_args()
+
+    # app.config reads these on import
+    os.environ.update({
+        "LLM_BACKEND": "stub",
+        "LLM_STUB_LATENCY": str(args.latency),
+        "LLM_RATE_LIMIT": "100000",
+        "LLM_BURST": "1000",
+        "CHAT_CACHE_SIZE": "0",
+    })
+    if not args.classifier:
+        os.environ["CHAT_CLASSIFIER_THRESHOLD"] = "1.01"  # No confidence reaches it
+
+    from app.chatbot import chatbot
+    from app.utils.llm_client import get_llm_client
+
+    client = get_llm_client()
+    for single_call in (True, False):
+        chatbot.CHAT_SINGLE_CALL = single_call
+        calls = client.stats()["calls"]
+        started = time.perf_counter()
+        for question in QUESTIONS:
+            chatbot.chat(question, [])
+        seconds = (time.perf_counter() - started) / len(QUESTIONS)
+        calls = (client.stats()["calls"] - calls) / len(QUESTIONS)
+        mode = "single-call" if single_call else "multi-call"
+        print(f"{mode:12} {calls:.1f} AI calls/message  {seconds * 1000:6.0f} ms/message")
+
+
+if __name__ == "__main__":
+    main()
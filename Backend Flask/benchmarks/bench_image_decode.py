@@ -0,0 +1,120 @@
+#!/usr/bin/env python3
+"""
+Benchmark: CPU time and peak memory from an uploaded image to the array handed to OCR.
+
+Compares the old path, which decoded with PIL, re-encoded the preprocessed image to
+PNG and decoded it again as RGB (PDF pages were saved as PNG first too), with the
+current one (load_gray straight to a grayscale array, JPEGs decoded at reduced size).
+Only decoding, resizing and measuring are timed, not the preprocessing stages or
+OCR. Inputs are a synthetic 12 MP JPEG photo and an A4 page as pdf2image renders it at
+200 dpi. Each case runs in a fresh process. Peak memory is the rise of the process's
+RSS high-water mark (reset after the imports, so Linux only).
+
+    LLM_BACKEND=stub python benchmarks/bench_image_decode.py [--runs 10]
+"""
+import io
+import os
+import sys
+import time
+import argparse
+import tempfile
+import subprocess
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import cv2  # noqa: E402  # type: ignore
+import numpy as np  # noqa: E402
+from PIL import Image  # noqa: E402
+
+CASES = [("jpeg", "old"), ("jpeg", "new"), ("pdf", "old"), ("pdf", "new")]
+
+
+def make_photo():
+    """JPEG bytes of a 4000x3000 photo of a printed report."""
+    photo = np.full((3000, 4000, 3), 235, np.uint8)
+    for i in range(60):
+        cv2.putText(photo, f"Hemoglobin 13.{i} g/dL 12.0-16.0", (200, 150 + i * 45),
+                    cv2.FONT_HERSHEY_SIMPLEX, 1.3, (20, 20, 20), 3)
+    photo = np.clip(photo + np.random.default_rng(0).normal(0, 3, photo.shape), 0, 255).astype(np.uint8)
+    buffer = io.BytesIO()
+    Image.fromarray(photo).save(buffer, format="JPEG", quality=92)
+    return buffer.getvalue()
+
+
+def make_page():
+    """An A4 page at 200 dpi, as pdf2image renders it."""
+    page = np.full((2339, 1654), 255, np.uint8)
+    for i in range(40):
+        cv2.putText(page, f"Creatinine 0.{i} mg/dL 0.6-1.2", (120, 120 + i * 52), cv2.FONT_HERSHEY_SIMPLEX, 1.2, 0, 2)
+    return Image.fromarray(page)
+
+
+def _memory_kb(field):
+    with open("/proc/self/status") as f:
+        return next(int(line.split()[1]) for line in f if line.startswith(field + ":"))
+
+
+def old_path(source, common_ocr):
+    if isinstance(source, Image.Image):
+        buffer = io.BytesIO()
+        source.save(buffer, format="PNG")
+        source = buffer.getvalue()
+    img = np.array(Image.open(io.BytesIO(source)).convert("L"))
+    h, w = img.shape
+    scale = common_ocr.OCR_IMAGE_SIZE / max(h, w)
+    img = cv2.resize(img, (int(w * scale), int(h * scale)), interpolation=cv2.INTER_AREA)
+    common_ocr.measure_image(img)
+    png = cv2.imencode(".png", img)[1].tobytes()
+    return np.array(Image.open(io.BytesIO(png)).convert("RGB"))
+
+
+def new_path(source, common_ocr):
+    img = common_ocr.load_gray(source)
+    common_ocr.measure_image(img)
+    return common_ocr._ocr_input(img)
+
+
+def run_case(case, path, runs, input_dir):
+    from app.ocr import common_ocr
+
+    if case == "jpeg":
+        with open(os.path.join(input_dir, "photo.jpg"), "rb") as f:
+            source = f.read()
+    else:
+        # pdf2image renders RGB pages unless asked for grayscale=True, as the new path does
+        source = Image.open(os.path.join(input_dir, "page.png")).convert("L" if path == "new" else "RGB")
+    convert = old_path if path == "old" else new_path
+    # Reset the high-water mark, which the imports (OCR models) have already raised
+    with open("/proc/self/clear_refs", "w") as f:
+        f.write("5")
+    baseline = _memory_kb("VmRSS")
+    convert(source, common_ocr)  # Warm-up, and the peak memory of one image
+    peak_kb = _memory_kb("VmHWM") - baseline
+    started = time.process_time()
+    for _ in range(runs):
+        convert(source, common_ocr)
+    cpu_ms = (time.process_time() - started) / runs * 1000
+    print(f"{case:5} {path:4} cpu {cpu_ms:7.1f} ms  peak +{peak_kb / 1024:5.1f} MB", flush=True)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--runs", type=int, default=10, help="conversions timed per case")
+    parser.add_argument("--case", nargs=3, metavar=("INPUT", "PATH", "DIR"), help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.case:
+        run_case(*args.case[:2], args.runs, args.case[2])
+        return
+    # Inputs are made here so building them doesn't count towards a case's peak memory
+    with tempfile.TemporaryDirectory() as input_dir:
+        with open(os.path.join(input_dir, "photo.jpg"), "wb") as f:
+            f.write(make_photo())
+        make_page().save(os.path.join(input_dir, "page.png"))
+        for case, path in CASES:
+            subprocess.run([sys.executable, os.path.abspath(__file__), "--runs", str(args.runs),
+                            "--case", case, path, input_dir], check=True)
+
+
+if __name__ == "__main__":
+    main()
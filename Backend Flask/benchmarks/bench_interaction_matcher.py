@@ -0,0 +1,81 @@
+#!/usr/bin/env python3
+"""
+Benchmark: finding related drugs in a label's drug_interactions text.
+
+Compares the per-drug regex that get_drug_interactions used to run (one lazy
+sentence regex per related drug, each scanning the whole text) with the
+Aho-Corasick matcher in app/medicines/interaction_matcher.py, on a synthetic label
+of about 200 KB and 53 related drugs. Also reports whether both find the same
+sentences; they differ only where the matcher also finds a drug's INN/USAN synonym.
+
+    LLM_BACKEND=stub python benchmarks/bench_interaction_matcher.py [--sentences 1500] [--drugs 50]
+"""
+import os
+import re
+import sys
+import time
+import random
+import argparse
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app.medicines.interaction_matcher import DrugMatcher  # noqa: E402
+
+WORDS = ("the of patients with and may increase decrease plasma concentrations monitor dose "
+         "adjustment coadministration risk").split()
+
+
+def make_label(drugs, sentences, seed=1):
+    """Interaction text of `sentences` sentences, 30% of which name one of `drugs`."""
+    rng = random.Random(seed)
+    text = []
+    for _ in range(sentences):
+        words = [rng.choice(WORDS) for _ in range(rng.randint(8, 25))]
+        if rng.random() < 0.3:
+            words.insert(rng.randint(0, len(words)), rng.choice(drugs).title())
+        text.append(" ".join(words).capitalize() + ".")
+    return " ".join(text)
+
+
+def legacy_match(drugs, text):
+    """The per-drug regex search get_drug_interactions used before the matcher."""
+    interactions = {}
+    for drug in drugs:
+        pattern = r'([^.]*?\b' + re.escape(drug) + r'\b[^.]*?\.)'
+        matches = re.findall(pattern, text, re.IGNORECASE)
+        interactions[drug] = [match.strip() for match in matches if match.strip() and len(match.strip()) > 10]
+    return interactions
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--sentences", type=int, default=1500, help="sentences in the synthetic label")
+    parser.add_argument("--drugs", type=int, default=50, help="synthetic related drugs (plus 3 real names)")
+    args = parser.parse_args()
+
+    label_drugs = [f"drugname{i}" for i in range(args.drugs + 10)] + ["warfarin", "warfarin sodium", "acetaminophen", "aspirin"]
+    text = make_label(label_drugs, args.sentences)
+    related = label_drugs[:args.drugs] + ["warfarin", "paracetamol", "Warfarin Sodium"]
+    print(f"label: {len(text) / 1024:.0f} KB, related drugs: {len(related)}")
+
+    started = time.perf_counter()
+    legacy = legacy_match(related, text)
+    legacy_seconds = time.perf_counter() - started
+
+    started = time.perf_counter()
+    matcher = DrugMatcher(related)
+    build_seconds = time.perf_counter() - started
+    started = time.perf_counter()
+    matched = matcher.match_sentences(text)
+    match_seconds = time.perf_counter() - started
+
+    print(f"per-drug regex: {legacy_seconds * 1000:9.1f} ms")
+    print(f"matcher:        {match_seconds * 1000:9.1f} ms (+{build_seconds * 1000:.1f} ms to build, cached per drug set)")
+    differing = [drug for drug in related if legacy[drug] != matched[drug]]
+    print(f"drugs with different sentences: {differing or 'none'}")
+    for drug in differing:
+        print(f"  {drug}: regex {len(legacy[drug])}, matcher {len(matched[drug])} (synonyms included)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,191 @@
+#!/usr/bin/env python3
+"""
+Benchmark: accuracy and latency of the rule-based lab report parser.
+
+Two corpora:
+- benchmarks/fixtures/lab_reports_sample.json: a small, hand-checked sample of
+  report texts in the layouts real reports come in (chain-lab PDFs, hospital ward
+  reports, phone photos after OCR), with the tests each one contains.
+- A synthetic corpus generated at run time from a fixed seed: 60 reports in five range
+  styles, with header lines (patient details, bed and room numbers, dates), flags,
+  qualitative rows and merged-column rows. The parser's rules were written with this
+  kind of text in mind, so its numbers catch regressions rather than measure accuracy
+  on real reports.
+
+- Parser accuracy: a parsed test is correct when its name, value, unit and range
+  all match a test of the report. Wrong results include header lines read as tests.
+  Also reports how many reports would be parsed fully, partly (the unparsed lines go
+  to the AI) or sent to the AI whole at LAB_PARSER_MIN_CONFIDENCE. Needs only the
+  parser and the lab catalog.
+- End to end (skipped with --parser-only): extract_medical_tests on the first 30
+  synthetic reports with the parser on and off, against the stub AI backend
+  (--latency seconds per call), with interpretations cached by a warm-up run so only
+  extraction differs. Imports the OCR modules, so needs the app's full dependencies.
+
+    python benchmarks/bench_lab_parser.py [--latency 1.5] [--reports 30] [--parser-only]
+"""
+import io
+import os
+import sys
+import json
+import time
+import random
+import argparse
+import tempfile
+import contextlib
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+SAMPLE_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "fixtures", "lab_reports_sample.json")
+
+# name, unit, low, high
+ANALYTES = [
+    ("Hemoglobin", "g/dL", 12, 16), ("RBC", "10^6/uL", 4.2, 5.4), ("Hematocrit", "%", 36, 46), ("MCV", "fL", 80, 100),
+    ("MCH", "pg", 27, 33), ("MCHC", "g/dL", 32, 36), ("RDW-CV", "%", 11.5, 14.5), ("WBC", "10^3/uL", 4, 11),
+    ("Platelets", "10^3/uL", 150, 400), ("Glucose", "mg/dL", 70, 100), ("Creatinine", "mg/dL", 0.6, 1.2),
+    ("Urea", "mg/dL", 15, 45), ("ALT (SGPT)", "U/L", 7, 56), ("AST (SGOT)", "U/L", 10, 40),
+    ("Total Cholesterol", "mg/dL", None, 200), ("Triglycerides", "mg/dL", None, 150), ("HDL Cholesterol", "mg/dL", 40, None),
+    ("LDL Cholesterol", "mg/dL", None, 100), ("TSH", "uIU/mL", 0.4, 4.0), ("HbA1c", "%", 4, 5.6),
+    ("Vitamin B12", "pg/mL", 200, 900), ("Ferritin", "ng/mL", 30, 400), ("Sodium", "mmol/L", 135, 145),
+    ("Potassium", "mmol/L", 3.5, 5.1),
+]
+QUALITATIVE = ["Urine Glucose Negative Negative", "HBsAg Non-Reactive", "Urine Protein Trace Nil"]
+HEADERS = [
+    "City Lab Diagnostics", "Patient Name: John Doe   Age: 45 Years  Sex: M", "Mr John Smith 45 Y M", "Mrs Mary Jones 62 Y F",
+    "Bed No 12", "Room 204", "Ward 7", "Ref. By: Dr. Smith", "Date: 12/03/2024 10:30", "Test Result Unit Reference Range",
+    "Sample collected 12/03/2024", "Page 1 of 1",
+]
+
+
+def _range_text(low, high, style):
+    if low is None:
+        return f"< {high}" if style else f"<{high}"
+    if high is None:
+        return f"> {low}" if style else f">{low}"
+    return [f"{low}-{high}", f"{low} - {high}", f"({low}-{high})", f"{low} to {high}", f"{low}–{high}"][style]
+
+
+def make_report(seed):
+    """A report's text and its tests ([name, value, unit, low, high]; qualitative rows have no value)."""
+    rng = random.Random(seed)
+    style = rng.randrange(5)
+    lines, tests = rng.sample(HEADERS, rng.randint(2, 6)), []
+    for name, unit, low, high in rng.sample(ANALYTES, rng.randint(8, 20)):
+        reference = low if low is not None else high
+        value = round(rng.uniform(reference * 0.5, (high or reference * 2) * 1.4), 1)
+        flag = ""
+        if high is not None and value > high:
+            flag = rng.choice(["H", " H", " High", ""])
+        elif low is not None and value < low:
+            flag = rng.choice(["L", " L", " Low", ""])
+        value_text = f"{value:,}" if value >= 1000 else f"{value}"
+        if rng.random() < 0.8:
+            lines.append(f"{name}{':' if rng.random() < 0.2 else ''} {value_text}{flag} {unit} {_range_text(low, high, style)}")
+        else:
+            lines.append(f"{name} {value_text}{flag} {_range_text(low, high, style)} {unit}")
+        tests.append([name, value, unit, low, high])
+    if rng.random() < 0.3:
+        row = rng.choice(QUALITATIVE)
+        lines.append(row)
+        tests.append([row, None, None, None, None])
+    if rng.random() < 0.2:  # Two columns merged into one row
+        (a, a_unit, a_low, a_high), (b, b_unit, b_low, b_high) = rng.sample(ANALYTES, 2)
+        lines.append(f"{a} 5.0 {a_unit} {_range_text(a_low, a_high, 0)} {b} 7.0 {b_unit} {_range_text(b_low, b_high, 0)}")
+        tests += [[a, 5.0, a_unit, a_low, a_high], [b, 7.0, b_unit, b_low, b_high]]
+    # Headers come first, plus one in the middle of the table now and then (e.g. a page break)
+    headers = [line for line in lines if line in HEADERS]
+    body = [line for line in lines if line not in HEADERS]
+    if len(headers) > 2 and rng.random() < 0.3:
+        body.insert(rng.randrange(len(body)), headers.pop())
+    return {"text": "\n".join(headers + body), "tests": tests}
+
+
+def parser_accuracy(label, corpus, lab_parser, min_confidence):
+    correct = wrong = 0
+    outcomes = {"parsed": 0, "partial": 0, "fallback": 0}
+    wrong_lines = []
+    started = time.perf_counter()
+    reports = [lab_parser.parse_lab_report(item["text"]) for item in corpus]
+    parse_seconds = time.perf_counter() - started
+    for item, report in zip(corpus, reports):
+        expected = [tuple(test) for test in item["tests"]]
+        for result in report.results:
+            key = (result.name, result.value, result.unit, result.normalRange.min, result.normalRange.max)
+            if key in expected:
+                correct += 1
+                expected.remove(key)
+            else:
+                wrong += 1
+                wrong_lines.append(key)
+        if not report.results or report.confidence < min_confidence:
+            outcomes["fallback"] += 1
+        else:
+            outcomes["partial" if report.unparsed_lines else "parsed"] += 1
+    total = sum(len(item["tests"]) for item in corpus)
+    print(f"{label}: {correct} correct and {wrong} wrong results of {total} tests in {len(corpus)} reports; "
+          f"precision {correct / max(1, correct + wrong):.3f}, recall {correct / total:.3f}, "
+          f"{parse_seconds / len(corpus) * 1000:.2f} ms per report")
+    for key in wrong_lines:
+        print(f"  wrong: {key}")
+    print(f"reports: {outcomes['parsed']} parsed fully, {outcomes['partial']} partly, "
+          f"{outcomes['fallback']} sent to the AI whole (LAB_PARSER_MIN_CONFIDENCE {min_confidence})")
+
+
+def end_to_end(corpus, medical_test_ocr, client):
+    extraction_calls = [0]
+    extract_tests_with_gemini = medical_test_ocr.extract_tests_with_gemini
+
+    def counted(text):
+        extraction_calls[0] += 1
+        return extract_tests_with_gemini(text)
+    medical_test_ocr.extract_tests_with_gemini = counted
+
+    def run(parser_enabled):
+        medical_test_ocr.LAB_PARSER = parser_enabled
+        extraction_calls[0] = 0
+        calls = client.stats()["calls"]
+        latencies = []
+        for item in corpus:
+            started = time.perf_counter()
+            with contextlib.redirect_stdout(io.StringIO()):
+                medical_test_ocr.extract_medical_tests(item["text"])
+            latencies.append(time.perf_counter() - started)
+        latencies.sort()
+        return (sum(latencies) / len(latencies), latencies[int(len(latencies) * 0.9)],
+                client.stats()["calls"] - calls, extraction_calls[0])
+
+    run(False)  # Warm the interpretation cache, so only extraction differs below
+    for label, enabled in (("AI only", False), ("parser", True)):
+        mean, p90, calls, extractions = run(enabled)
+        print(f"{label:8} mean {mean:.2f} s  p90 {p90:.2f} s  AI calls {calls} (extraction {extractions})")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--latency", type=float, default=1.5, help="seconds per stub AI call")
+    parser.add_argument("--reports", type=int, default=30, help="synthetic reports run end to end")
+    parser.add_argument("--parser-only", action="store_true", help="skip the end-to-end run")
+    args = parser.parse_args()
+
+    # app.config reads these on import; the interpretation cache goes to a throwaway directory
+    cache_dir = tempfile.mkdtemp(prefix="bench-lab-parser-")
+    os.environ.update({"LLM_BACKEND": "stub", "LLM_STUB_LATENCY": str(args.latency), "LLM_RATE_LIMIT": "100000",
+                       "LLM_BURST": "1000", "MEDIMATE_CACHE_DIR": cache_dir})
+    from app.ocr import lab_parser
+    from app.config import LAB_PARSER_MIN_CONFIDENCE
+
+    with open(SAMPLE_PATH, encoding="utf-8") as f:
+        sample = json.load(f)
+    synthetic = [make_report(seed) for seed in range(60)]
+    parser_accuracy("sample", sample, lab_parser, LAB_PARSER_MIN_CONFIDENCE)
+    parser_accuracy("synthetic", synthetic, lab_parser, LAB_PARSER_MIN_CONFIDENCE)
+    if args.parser_only:
+        return
+
+    from app.ocr import medical_test_ocr
+    from app.utils.llm_client import get_llm_client
+    end_to_end(synthetic[:args.reports], medical_test_ocr, get_llm_client())
+
+
+if __name__ == "__main__":
+    main()
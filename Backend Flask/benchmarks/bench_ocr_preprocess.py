@@ -0,0 +1,123 @@
+#!/usr/bin/env python3
+"""
+Benchmark: OCR accuracy and preprocessing time, adaptive vs full preprocessing.
+
+Renders synthetic A4 lab reports (14 "Name Value Unit Range" rows each), degrades
+them into the kinds of pages users upload (low contrast, faded, skewed, noisy,
+photo-like), then preprocesses and OCRs each page with OCR_PREPROCESS=full (the fixed
+denoise/CLAHE/blur/threshold/deskew/sharpen chain) and with OCR_PREPROCESS=adaptive.
+Accuracy is the similarity of the OCR text to the rendered text, ignoring whitespace
+and case. Needs PaddleOCR (the OCR service) like the app itself.
+
+    LLM_BACKEND=stub python benchmarks/bench_ocr_preprocess.py [--pages 3] [--kinds clean,faded]
+"""
+import io
+import os
+import sys
+import time
+import random
+import difflib
+import argparse
+import contextlib
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import cv2  # noqa: E402  # type: ignore
+import numpy as np  # noqa: E402
+from PIL import Image, ImageDraw, ImageFont  # noqa: E402
+from app.ocr import common_ocr  # noqa: E402
+
+ANALYTES = [
+    ("Hemoglobin", "g/dL", "12.0-16.0"), ("RBC Count", "10^6/uL", "4.2-5.4"), ("Hematocrit", "%", "36-46"),
+    ("MCV", "fL", "80-100"), ("MCH", "pg", "27-33"), ("WBC", "10^3/uL", "4.0-11.0"), ("Platelets", "10^3/uL", "150-400"),
+    ("Glucose", "mg/dL", "70-100"), ("Creatinine", "mg/dL", "0.6-1.2"), ("Urea", "mg/dL", "15-45"),
+    ("ALT (SGPT)", "U/L", "7-56"), ("AST (SGOT)", "U/L", "10-40"), ("Total Cholesterol", "mg/dL", "<200"),
+    ("Triglycerides", "mg/dL", "<150"), ("TSH", "uIU/mL", "0.4-4.0"), ("Sodium", "mmol/L", "135-145"),
+    ("Potassium", "mmol/L", "3.5-5.1"), ("Ferritin", "ng/mL", "30-400"),
+]
+KINDS = ["clean", "low_contrast", "faded", "skewed", "noisy", "very_noisy", "noisy_skewed", "photo"]
+
+
+def _font(size=34):
+    try:
+        return ImageFont.truetype("DejaVuSans.ttf", size)
+    except OSError:
+        return ImageFont.load_default(size=size)
+
+
+def make_page(seed, font):
+    """A 1700x2200 grayscale report page (A4 at 200 dpi) and its text, one row per line."""
+    rng = random.Random(seed)
+    page = Image.new("L", (1700, 2200), 255)
+    draw = ImageDraw.Draw(page)
+    lines, y = [], 120
+    for name, unit, normal_range in rng.sample(ANALYTES, 14):
+        columns = [(100, name), (700, f"{rng.uniform(1, 200):.1f}"), (950, unit), (1250, normal_range)]
+        for x, text in columns:
+            draw.text((x, y), text, fill=0, font=font)
+        lines.append(" ".join(text for _, text in columns))
+        y += 130
+    return page, lines
+
+
+def degrade(page, kind, seed):
+    """PNG bytes of `page` degraded as a `kind` upload."""
+    pixels = np.asarray(page).astype(np.float32)
+    noise = np.random.default_rng(seed)
+    if kind == "low_contrast":
+        pixels = 110 + pixels * (90 / 255)
+    elif kind == "faded":
+        pixels = 190 + pixels * (30 / 255)
+    elif kind == "very_noisy":
+        pixels = pixels + noise.normal(0, 90, pixels.shape)
+    elif kind in ("noisy", "noisy_skewed"):
+        pixels = pixels + noise.normal(0, 25, pixels.shape)
+    elif kind == "photo":
+        # Sensor noise, slight blur and light falling off across the page
+        pixels = cv2.GaussianBlur(pixels + noise.normal(0, 10, pixels.shape), (5, 5), 0)
+        pixels = pixels * np.linspace(0.6, 1.0, pixels.shape[1])[None, :]
+    pixels = np.clip(pixels, 0, 255).astype(np.uint8)
+    if kind in ("skewed", "noisy_skewed"):
+        h, w = pixels.shape
+        rotation = cv2.getRotationMatrix2D((w // 2, h // 2), -3.0, 1.0)
+        pixels = cv2.warpAffine(pixels, rotation, (w, h), borderValue=255 if kind == "skewed" else 200)
+    buffer = io.BytesIO()
+    Image.fromarray(pixels).save(buffer, format="PNG")
+    return buffer.getvalue()
+
+
+def accuracy(text, lines):
+    normalize = lambda s: "".join(s.split()).lower()
+    return difflib.SequenceMatcher(None, normalize(text), normalize(" ".join(lines)), autojunk=False).ratio()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--pages", type=int, default=3, help="pages per kind")
+    parser.add_argument("--kinds", default=",".join(KINDS), help="comma-separated page kinds")
+    args = parser.parse_args()
+
+    font = _font()
+    pages = [make_page(seed, font) for seed in range(args.pages)]
+    print(f"{'kind':14} {'mode':9} {'accuracy':>8} {'preprocess':>11} {'ocr':>9}  tiers")
+    for kind in args.kinds.split(","):
+        uploads = [(degrade(page, kind, seed), lines) for seed, (page, lines) in enumerate(pages)]
+        for mode in ("full", "adaptive"):
+            common_ocr.OCR_PREPROCESS = mode
+            scores, preprocess_seconds, ocr_seconds, tiers = [], 0.0, 0.0, []
+            for data, lines in uploads:
+                started = time.perf_counter()
+                with contextlib.redirect_stdout(io.StringIO()):
+                    image, tier, _ = common_ocr._preprocess(data)
+                preprocess_seconds += time.perf_counter() - started
+                started = time.perf_counter()
+                text = common_ocr.paddleocr_ocr(image)
+                ocr_seconds += time.perf_counter() - started
+                scores.append(accuracy(text, lines))
+                tiers.append(tier)
+            print(f"{kind:14} {mode:9} {np.mean(scores):8.2f} {preprocess_seconds / len(uploads) * 1000:8.0f} ms "
+                  f"{ocr_seconds / len(uploads) * 1000:6.0f} ms  {','.join(tiers)}", flush=True)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,97 @@
+"""
+Test setup shared by all test modules.
+
+app.config reads the environment when it is first imported, so the settings the
+tests depend on are fixed here, before any test module imports the app:
+- the stub LLM backend, so no GEMINI_API_KEY or network access is needed;
+- a throwaway cache directory, so tests never see (or leave behind) cached data;
+- FDA_API_URL pointing at a local stub openFDA server (see StubFDAServer).
+"""
+import os
+import sys
+import json
+import shutil
+import tempfile
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+
+class StubFDAServer:
+    """
+    Local stand-in for api.fda.gov/drug/label.json.
+
+    `labels` maps a drug name to the drug_interactions text its label returns. Drugs
+    without a label get openFDA's 404 "No matches found"; drugs in `failing` get a 500.
+    Every request is recorded in `requests` (the searched drug names, in order).
+    """
+
+    def __init__(self):
+        self.labels = {}
+        self.failing = set()
+        self.delay = 0.0
+        self.requests = []
+        self._lock = threading.Lock()
+        self._server = ThreadingHTTPServer(("127.0.0.1", 0), self._handler())
+        self._server.daemon_threads = True
+        self.url = f"http://127.0.0.1:{self._server.server_port}/drug/label.json"
+        threading.Thread(target=self._server.serve_forever, daemon=True).start()
+
+    def _handler(self):
+        stub = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                search = parse_qs(urlparse(self.path).query).get("search", [""])[0]
+                drug = search.split(":", 1)[-1]
+                with stub._lock:
+                    stub.requests.append(drug)
+                if stub.delay:
+                    threading.Event().wait(stub.delay)
+                if drug in stub.failing:
+                    self._reply(500, {"error": {"code": "SERVER_ERROR"}})
+                elif drug in stub.labels:
+                    self._reply(200, {"results": [{"drug_interactions": [stub.labels[drug]]}]})
+                else:
+                    self._reply(404, {"error": {"code": "NOT_FOUND", "message": "No matches found!"}})
+
+            def _reply(self, status, body):
+                data = json.dumps(body).encode("utf-8")
+                self.send_response(status)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(data)))
+                self.end_headers()
+                self.wfile.write(data)
+
+            def log_message(self, format, *args):
+                pass
+
+        return Handler
+
+    def reset(self):
+        with self._lock:
+            self.labels, self.failing, self.delay, self.requests = {}, set(), 0.0, []
+
+
+_cache_dir = tempfile.mkdtemp(prefix="medimate-tests-")
+_fda_server = StubFDAServer()
+
+os.environ["LLM_BACKEND"] = "stub"
+os.environ["MEDIMATE_CACHE_DIR"] = _cache_dir
+os.environ["FDA_API_URL"] = _fda_server.url
+os.environ["INTERACTIONS_SOURCE"] = "fda"
+os.environ["BACKGROUND_LOAD"] = "false"
+
+
+def pytest_unconfigure(config):
+    shutil.rmtree(_cache_dir, ignore_errors=True)
+
+
+@pytest.fixture
+def fda_server():
+    _fda_server.reset()
+    yield _fda_server
+    _fda_server.reset()
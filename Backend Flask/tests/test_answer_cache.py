@@ -0,0 +1,36 @@
+"""Near-duplicate matching of the chatbot answer cache (app/chatbot/answer_cache.py)."""
+from app.chatbot.answer_cache import AnswerCache
+
+ANSWER = {"is_medical": True, "message": "Cached answer."}
+
+
+def cache_with(question):
+    cache = AnswerCache(max_entries=100, ttl=3600, similarity=0.8)
+    cache.put(question, "English", "Standard English", ANSWER)
+    return cache
+
+
+def test_rephrased_question_hits():
+    cache = cache_with("What causes severe morning headaches in adults?")
+    assert cache.get("severe morning headache in adults causes", "English", "Standard English") == ANSWER
+    assert cache.get("What usually causes severe morning headaches in adults?", "English", "Standard English") == ANSWER
+    assert cache.stats()["exact_hits"] == 1 and cache.stats()["near_hits"] == 1
+
+
+def test_negated_question_misses():
+    cache = cache_with("Can I take ibuprofen with aspirin?")
+    for question in ("Can't I take ibuprofen with aspirin?", "Cannot I take ibuprofen with aspirin",
+                     "Can I not take ibuprofen with aspirin?", "Why can t I take ibuprofen with aspirin?"):
+        assert cache.get(question, "English", "Standard English") is None, question
+    assert cache.get("can i take ibuprofen with aspirin", "English", "Standard English") == ANSWER
+
+
+def test_different_dose_misses():
+    cache = cache_with("Is 250 mg of paracetamol safe for a child taking amoxicillin?")
+    assert cache.get("Is 2500 mg of paracetamol safe for a child taking amoxicillin?", "English", "Standard English") is None
+    assert cache.get("Is 250mg of paracetamol safe for a child taking amoxicillin", "English", "Standard English") == ANSWER
+
+
+def test_other_dialect_misses():
+    cache = cache_with("What causes headaches?")
+    assert cache.get("What causes headaches?", "English", "American English") is None
@@ -0,0 +1,39 @@
+"""Caching and session turns of chat replies (app/chatbot/chatbot.py)."""
+from app.chatbot import chatbot
+from app.chatbot.answer_cache import answer_cache
+from app.chatbot.local_classifier import Classification
+
+NOT_MEDICAL = Classification("English", "Standard English", 1.0, False, 1.0)
+
+
+class FakeStream:
+    def __init__(self, chunks):
+        self.chunks = chunks
+
+    def generate_content(self, prompt, stream=False):
+        return iter([type("Chunk", (), {"text": chunk})() for chunk in self.chunks])
+
+
+def test_failed_reply_is_not_cached_or_recorded(monkeypatch):
+    monkeypatch.setattr(chatbot.local_classifier, "classify", lambda message, has_history: NOT_MEDICAL)
+    monkeypatch.setattr(chatbot, "generate_ai_response", lambda prompt: {})
+    session = chatbot.session_store.create()
+    question = "Which football team won the league this year?"
+    response = chatbot.chat(question, session=session)
+    assert response.message == chatbot.FRIENDLY_FALLBACK
+    assert answer_cache.get(question, "English", "Standard English") is None
+    assert not session.has_history()
+
+    monkeypatch.setattr(chatbot, "generate_ai_response", lambda prompt: {"message": "I can only help with health questions."})
+    assert chatbot.chat(question, session=session).message == "I can only help with health questions."
+    assert answer_cache.get(question, "English", "Standard English")["message"] == "I can only help with health questions."
+    assert session.has_history()
+
+
+def test_cut_off_stream_is_not_cached(monkeypatch):
+    monkeypatch.setattr(chatbot.local_classifier, "classify", lambda message, has_history: NOT_MEDICAL)
+    monkeypatch.setattr(chatbot, "gemini_model", FakeStream(['{"message": "I can only help wi']))
+    question = "What is the capital city of Australia?"
+    events = list(chatbot.stream_chat(question))
+    assert events[-1]["event"] == "done"
+    assert answer_cache.get(question, "English", "Standard English") is None
@@ -0,0 +1,74 @@
+"""Cached openFDA label lookups (app/medicines/drug_interactions.py) against the stub openFDA server."""
+import threading
+import pytest
+import requests
+from app.utils.cache_utils import TwoTierCache
+from app.medicines import drug_interactions
+from app.medicines.drug_interactions import get_interaction_text, get_drug_interactions
+
+WARFARIN_TEXT = "Aspirin may increase the risk of bleeding. Monitor INR closely when starting amiodarone."
+
+
+def test_repeated_lookups_fetch_once(fda_server):
+    fda_server.labels["warfarin"] = WARFARIN_TEXT
+
+    assert get_interaction_text("warfarin") == WARFARIN_TEXT
+    assert get_interaction_text("Warfarin") == WARFARIN_TEXT
+    assert get_interaction_text("  WARFARIN ") == WARFARIN_TEXT
+    assert fda_server.requests == ["warfarin"]
+
+
+def test_disk_store_survives_restart(fda_server, monkeypatch):
+    fda_server.labels["clopidogrel"] = "Omeprazole reduces the effect of clopidogrel."
+    assert get_interaction_text("clopidogrel")
+
+    # A new cache on the same file, as after a restart: the label comes from disk
+    cache = drug_interactions.label_cache
+    restarted = TwoTierCache(cache.name, cache.path, max_entries=cache.max_entries, ttl=cache.ttl,
+                             stale_ttl=cache.stale_ttl, negative_ttl=cache.negative_ttl, is_negative=cache.is_negative)
+    monkeypatch.setattr(drug_interactions, "label_cache", restarted)
+    assert get_interaction_text("clopidogrel") == "Omeprazole reduces the effect of clopidogrel."
+    assert fda_server.requests == ["clopidogrel"]
+    assert restarted.stats()["disk_hits"] == 1
+
+
+def test_no_matches_is_cached(fda_server):
+    assert get_interaction_text("unlabelledol") == ""
+    assert get_interaction_text("unlabelledol") == ""
+    assert fda_server.requests == ["unlabelledol"]
+    assert get_drug_interactions("unlabelledol", ["aspirin"])["success"] is False
+
+
+def test_server_errors_are_not_cached(fda_server):
+    fda_server.failing.add("metformin")
+    with pytest.raises(requests.exceptions.HTTPError):
+        get_interaction_text("metformin")
+
+    fda_server.failing.clear()
+    fda_server.labels["metformin"] = "Contrast agents may cause lactic acidosis."
+    assert get_interaction_text("metformin") == "Contrast agents may cause lactic acidosis."
+    assert fda_server.requests == ["metformin", "metformin"]
+
+
+def test_concurrent_misses_share_one_request(fda_server):
+    fda_server.labels["digoxin"] = "Amiodarone raises digoxin levels."
+    fda_server.delay = 0.2
+    results = []
+    threads = [threading.Thread(target=lambda: results.append(get_interaction_text("digoxin"))) for _ in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert results == ["Amiodarone raises digoxin levels."] * 8
+    assert fda_server.requests == ["digoxin"]
+
+
+def test_interaction_check_uses_cached_label(fda_server):
+    fda_server.labels["simvastatin"] = "Clarithromycin increases the risk of myopathy. Grapefruit juice should be avoided."
+
+    first = get_drug_interactions("simvastatin", ["clarithromycin", "aspirin"])
+    second = get_drug_interactions("simvastatin", ["clarithromycin", "aspirin"])
+    assert first == second
+    assert first["interactions"]["clarithromycin"] and not first["interactions"]["aspirin"]
+    assert fda_server.requests == ["simvastatin"]
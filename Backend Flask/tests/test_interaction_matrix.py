@@ -0,0 +1,45 @@
+"""Pairwise interaction matrix (get_interaction_matrix) against the stub openFDA server."""
+from app.medicines.drug_interactions import get_interaction_matrix
+
+
+def test_pairs_interact_if_either_label_mentions_the_other(fda_server):
+    fda_server.labels["simvastatin"] = "Clarithromycin increases the risk of myopathy."
+    fda_server.labels["warfarin"] = "Monitor INR when starting any new drug."
+    fda_server.labels["clarithromycin"] = "Colchicine levels may rise."
+
+    result = get_interaction_matrix(["Simvastatin", "Clarithromycin", "Warfarin"])
+    assert result["matrix"] == [[None, True, False], [True, None, False], [False, False, None]]
+    assert result["errors"] == {}
+    assert result["summary"] == {"total_pairs": 3, "pairs_with_interactions": 1, "pairs_unknown": 0}
+
+
+def test_pairs_of_a_failed_label_are_unknown(fda_server):
+    fda_server.labels["atorvastatin"] = "Erythromycin increases atorvastatin exposure."
+    fda_server.labels["lisinopril"] = "Potassium supplements may cause hyperkalemia."
+    fda_server.failing.add("erythromycin")
+
+    result = get_interaction_matrix(["Atorvastatin", "Lisinopril", "Erythromycin"])
+    assert set(result["errors"]) == {"Erythromycin"}
+    # Atorvastatin's label mentions erythromycin, so that pair is known despite the error
+    assert result["matrix"] == [[None, False, True], [False, None, None], [True, None, None]]
+    assert result["summary"] == {"total_pairs": 3, "pairs_with_interactions": 1, "pairs_unknown": 1}
+
+
+def test_names_differing_in_case_are_checked_once(fda_server):
+    fda_server.labels["metoprolol"] = "Verapamil may cause bradycardia."
+
+    result = get_interaction_matrix(["Metoprolol", "verapamil", "METOPROLOL", " Verapamil "])
+    assert result["drugs"] == ["Metoprolol", "verapamil"]
+    assert result["matrix"] == [[None, True], [True, None]]
+    assert sorted(fda_server.requests) == ["metoprolol", "verapamil"]
+
+
+def test_pairs_of_a_drug_without_interaction_text_are_unknown(fda_server):
+    fda_server.labels["amlodipine"] = "Simvastatin doses above 20 mg increase the risk of myopathy."
+    fda_server.labels["levothyroxine"] = ""  # A label without a drug_interactions section
+    fda_server.labels["simvastatin"] = "Gemfibrozil increases the risk of myopathy."
+
+    result = get_interaction_matrix(["Amlodipine", "Levothyroxine", "Simvastatin"])
+    assert result["errors"] == {}
+    assert result["matrix"] == [[None, None, True], [None, None, None], [True, None, None]]
+    assert result["summary"] == {"total_pairs": 3, "pairs_with_interactions": 1, "pairs_unknown": 2}
@@ -0,0 +1,15 @@
+"""Test name lookups in the lab catalog (app/ocr/lab_catalog.py)."""
+from app.ocr.lab_catalog import lookup_test
+
+
+def test_name_with_abbreviation_in_parentheses():
+    assert lookup_test("ALT (SGPT)").key == lookup_test("ALT").key
+    assert lookup_test("Serum Creatinine").key == lookup_test("Creatinine").key
+
+
+def test_other_specimens_are_not_blood_tests():
+    # The catalog's ranges are for blood; a urine glucose checked against them would be misread
+    assert lookup_test("Glucose (Urine)") is None
+    assert lookup_test("Calcium (24h Urine)") is None
+    assert lookup_test("Protein, CSF") is None
+    assert lookup_test("Glucose (Fasting)") is not None
@@ -0,0 +1,23 @@
+"""Template interpretations of lab results (app/ocr/lab_interpretation.py)."""
+from app.models.medical_models import MedicalTestResult, NormalRange
+from app.ocr.lab_interpretation import lookup_interpretation
+
+
+def result(name, value, unit, low, high):
+    return MedicalTestResult(name=name, value=value, unit=unit, normalRange=NormalRange(min=low, max=high))
+
+
+def test_template_answers_result_in_catalog_unit():
+    text = lookup_interpretation(result("Glucose", 110, "mg/dl", 70, 100))
+    assert text and "above the normal range" in text
+
+
+def test_no_template_for_other_units():
+    # 5.5 mmol/L is normal, but the glucose templates are written for mg/dL
+    assert lookup_interpretation(result("Glucose", 5.5, "mmol/L", 3.9, 5.6)) is None
+
+
+def test_no_template_for_placeholder_percentage_range():
+    # An HbA1c of 6.0% is high, but "normal" against the 0-100 range given to percentages without one
+    assert lookup_interpretation(result("HbA1c", 6.0, "%", 0.0, 100.0)) is None
+    assert "above the normal range" in lookup_interpretation(result("HbA1c", 6.0, "%", 4.0, 5.6))
@@ -0,0 +1,22 @@
+"""Rule-based lab report parser (app/ocr/lab_parser.py)."""
+from app.ocr.lab_parser import parse_lab_report, parse_line
+
+
+def test_result_rows_are_parsed():
+    result, confidence = parse_line("WBC 11.2 H 10^3/uL (4-10)")
+    assert (result.name, result.value, result.unit) == ("WBC", 11.2, "10^3/uL")
+    assert (result.normalRange.min, result.normalRange.max) == (4.0, 10.0)
+    assert confidence == 1.0
+
+
+def test_header_rows_are_not_results():
+    report = parse_lab_report("Mr John Smith 45 Y M\nBed No 12\nRoom 204\nHemoglobin 13.5 g/dL 12.0 - 16.0")
+    assert [result.name for result in report.results] == ["Hemoglobin"]
+    assert report.unparsed_lines == []
+
+
+def test_unconfident_rows_go_to_the_ai():
+    # A number after a name with no range, no unit and no catalog match is as likely a header as a result
+    report = parse_lab_report("Clinic Block 3\nHemoglobin 13.5 g/dL 12.0 - 16.0")
+    assert [result.name for result in report.results] == ["Hemoglobin"]
+    assert report.unparsed_lines == ["Clinic Block 3"]
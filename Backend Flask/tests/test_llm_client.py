@@ -0,0 +1,72 @@
+"""Concurrency slots and retries of the shared LLM client (app/utils/llm_client.py)."""
+import gc
+import time
+import pytest
+from app.utils.llm_client import LLMClient, LLMDeadlineExceeded, StubBackend, StubResponse
+
+
+class FailingStream:
+    """Backend whose streams fail after the first chunk."""
+
+    def __init__(self):
+        self.calls = 0
+
+    def generate(self, prompt, stream, timeout):
+        self.calls += 1
+
+        def chunks():
+            yield StubResponse("partial ")
+            raise ConnectionError("stream dropped")
+        return chunks()
+
+
+def single_slot_client(backend=None):
+    return LLMClient(backend or StubBackend(latency=0), rate_per_minute=60000, burst=100, max_concurrency=1,
+                     deadline=1.0)
+
+
+def next_call_gets_a_slot(client):
+    client.generate_content("Hello", deadline=time.monotonic() + 0.2)
+    return client.stats()["in_flight"] == 0
+
+
+def test_stream_read_to_the_end_frees_its_slot():
+    client = single_slot_client()
+    text = "".join(chunk.text for chunk in client.generate_content("Hello", stream=True))
+    assert text
+    assert next_call_gets_a_slot(client)
+
+
+def test_stream_never_read_frees_its_slot():
+    client = single_slot_client()
+    client.generate_content("Hello", stream=True)  # Dropped without iterating
+    gc.collect()
+    assert next_call_gets_a_slot(client)
+
+
+def test_closed_stream_frees_its_slot():
+    client = single_slot_client()
+    stream = client.generate_content("Hello", stream=True)
+    next(stream)
+    stream.close()
+    assert list(stream) == []
+    assert next_call_gets_a_slot(client)
+
+
+def test_open_stream_holds_its_slot():
+    client = single_slot_client()
+    stream = client.generate_content("Hello", stream=True)
+    with pytest.raises(LLMDeadlineExceeded):
+        client.generate_content("Hello", deadline=time.monotonic() + 0.1)
+    stream.close()
+
+
+def test_errors_while_streaming_are_raised_not_retried():
+    backend = FailingStream()
+    client = single_slot_client(backend)
+    stream = client.generate_content("Hello", stream=True)
+    assert next(stream).text == "partial "
+    with pytest.raises(ConnectionError):
+        next(stream)
+    assert backend.calls == 1
+    assert client.stats()["in_flight"] == 0
@@ -0,0 +1,15 @@
+"""Local medical-topic classification of chat messages (app/chatbot/local_classifier.py)."""
+from app.chatbot.local_classifier import LocalClassifier
+
+classifier = LocalClassifier(threshold=0.8)
+
+
+def test_everyday_words_are_left_to_the_llm():
+    for message in ("It's cold outside today", "My heart belongs to my family", "I'm sick of this weather",
+                    "The pressure at work is a lot"):
+        assert classifier.classify(message).is_medical is None, message
+
+
+def test_medical_messages_are_classified_locally():
+    for message in ("I have a headache", "I have a sore throat", "My blood pressure is high", "Cold and fever since Monday"):
+        assert classifier.classify(message).is_medical is True, message